@@ -37,6 +37,7 @@ DEFAULTS = {
     "premis_agent": os.getenv("PREMIS_AGENT", "Gerenciador de Arquivos — Orquestração"),
     "ui_theme": os.getenv("UI_THEME", "flatly"),
     "jobstore_path": "./jobs_db.json",
+    "jobstore_backend": os.getenv("JOBSTORE_BACKEND", "json"),
 }
 
 
@@ -50,6 +51,38 @@ class AppConfig:
     premis_log: str = "./logs/premis_events.jsonl"
     premis_agent: str = "Gerenciador de Arquivos — Orquestração"
     jobstore_path: str = "./jobs_db.json"
+    jobstore_backend: str = "json"  # "json" | "sqlite"
+    worker_id: str = ""             # vazio = gerado (host:pid:aleatório)
+    job_lease_seconds: int = 300    # prazo do lease de um job em execução
+    job_exec_mode: str = "warm"     # "warm" (main(argv) em processo quente) | "subprocess"
+    worker_concurrency: int = 1     # jobs executados ao mesmo tempo pelo worker
+    # limite de jobs simultâneos por tipo (tipo ausente ou 0 = só o limite geral)
+    job_type_limits: dict = field(default_factory=dict)
+    job_max_attempts: int = 3       # tentativas até um job recuperado após queda ir para 'error' (0 = sem limite)
+    # tempo limite (segundos de relógio) por tipo de job; tipo ausente ou 0 = sem limite
+    job_timeouts: dict = field(default_factory=dict)
+    job_kill_grace_s: int = 30      # após o SIGTERM (cancelamento/tempo limite), prazo até o SIGKILL
+    device_max_jobs: int = 0        # jobs pesados de E/S simultâneos por disco/servidor (0 = sem limite)
+    # limite por dispositivo (chave de core/devices.py, ex.: {"disk:sdb": 2, "net:nas01": 1}), sobre device_max_jobs
+    device_job_limits: dict = field(default_factory=dict)
+    # tipos de job sujeitos aos limites por dispositivo
+    io_heavy_types: list = field(default_factory=lambda: ["HASH_MANIFEST", "VERIFY_FIXITY", "REPLICATE",
+                                                          "BUILD_BAG", "BUILD_SIP", "DUPLICATE_FINDER"])
+    # novas tentativas automáticas por tipo ("*" = demais tipos), ver core/job_retry.py
+    job_retry: dict = field(default_factory=dict)
+    # nice/ionice e teto de banda (MB/s, com janelas de horário) por tipo ("*" = demais), ver core/io_policy.py
+    job_io: dict = field(default_factory=dict)
+    # tipos cujo resultado é reaproveitado quando as entradas não mudaram (core/job_cache.py)
+    job_cache_types: list = field(default_factory=list)
+    # divisão de jobs grandes em partes paralelas (HASH_MANIFEST/VERIFY_FIXITY), ver core/job_shards.py
+    job_shards: dict = field(default_factory=dict)
+    # retenção: dias após a conclusão até o job ir para o arquivo morto (0 = manter)
+    job_retention_days: dict = field(default_factory=lambda: {"done": 30, "canceled": 30, "error": 0, "timeout": 0})
+    compaction_interval_s: int = 3600  # intervalo entre compactações feitas pelo worker
+    job_log_max_entries: int = 5000    # entradas de log guardadas por job (as mais recentes; 0 = sem limite)
+    job_log_tail_lines: int = 200      # últimas linhas de stdout/stderr mantidas em memória (fim do stderr = error_msg)
+    api_listen: str = ""  # API HTTP local (core/job_api.py): "127.0.0.1:8765" ou "unix:/caminho"; vazio = desligada
+    api_token: str = ""   # se preenchido, a API exige "Authorization: Bearer <token>"
     ui_theme: str = "flatly"
 
     # Caminho do arquivo de configuração carregado
@@ -66,6 +99,13 @@ class AppConfig:
         cfg.premis_log = os.getenv("PREMIS_LOG", cfg.premis_log)
         cfg.premis_agent = os.getenv("PREMIS_AGENT", cfg.premis_agent)
         cfg.jobstore_path = os.getenv("JOBSTORE_PATH", cfg.jobstore_path)
+        cfg.jobstore_backend = os.getenv("JOBSTORE_BACKEND", cfg.jobstore_backend)
+        cfg.worker_id = os.getenv("WORKER_ID", cfg.worker_id)
+        cfg.job_lease_seconds = int(os.getenv("JOB_LEASE_SECONDS", cfg.job_lease_seconds))
+        cfg.worker_concurrency = int(os.getenv("WORKER_CONCURRENCY", cfg.worker_concurrency))
+        cfg.job_exec_mode = os.getenv("JOB_EXEC_MODE", cfg.job_exec_mode)
+        cfg.api_listen = os.getenv("API_LISTEN", cfg.api_listen)
+        cfg.api_token = os.getenv("API_TOKEN", cfg.api_token)
         cfg.ui_theme = os.getenv("UI_THEME", cfg.ui_theme)
         return cfg
 
@@ -0,0 +1,140 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/devices.py
+"""
+Dispositivo de armazenamento por trás dos caminhos de um job, para o Worker
+não pôr dois jobs pesados de E/S no mesmo disco (cfg.device_max_jobs).
+
+A chave do dispositivo de um caminho (ou do ancestral mais próximo que existe,
+para destinos ainda não criados) é:
+  - "disk:<nome>" no Linux, para dispositivos de bloco: o disco inteiro
+    (partições sda1/sda2 dividem o mesmo braço de leitura), via /sys/dev/block;
+  - "net:<servidor>" para montagens de rede (NFS, SMB/CIFS...): montagens do
+    mesmo servidor dividem o mesmo NAS, via /proc/self/mountinfo;
+  - "dev:<st_dev>" nos demais casos (outros sistemas, dispositivos virtuais).
+
+Os resultados ficam em cache por CACHE_TTL_S, pois a consulta roda a cada
+tentativa de pegar um job.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_TTL_S = 300.0
+
+# chaves de params com os caminhos de entrada/saída pesados de um job
+PATH_KEYS = ("raiz", "fonte", "destinos", "src", "dst", "destino")
+
+# tipos em que 'saida' recebe os dados inteiros (nos demais é só um relatório/manifesto)
+TYPE_PATH_KEYS: Dict[str, Tuple[str, ...]] = {
+    "BUILD_SIP": PATH_KEYS + ("saida",),
+}
+
+_NET_FSTYPES = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "sshfs", "fuse.sshfs", "glusterfs", "ceph", "9p")
+
+_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+_cache_lock = threading.Lock()
+
+
+def job_paths(params: Dict[str, Any], job_type: Optional[str] = None) -> List[str]:
+    """Caminhos de params nas chaves do tipo (TYPE_PATH_KEYS ou PATH_KEYS; destinos pode ser lista)."""
+    out: List[str] = []
+    for k in TYPE_PATH_KEYS.get(job_type, PATH_KEYS):
+        v = params.get(k)
+        for p in (v if isinstance(v, (list, tuple)) else [v]):
+            if p:
+                out.append(str(p))
+    return out
+
+
+def job_devices(params: Dict[str, Any], job_type: Optional[str] = None) -> List[str]:
+    """Chaves (sem repetição) dos dispositivos usados por um job."""
+    keys = (device_key(p) for p in job_paths(params, job_type))
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def device_key(path: str) -> Optional[str]:
+    """Chave do dispositivo de 'path' (ver docstring do módulo); None se nada do caminho existe."""
+    now = time.monotonic()
+    with _cache_lock:
+        hit = _cache.get(path)
+        if hit and now - hit[0] < CACHE_TTL_S:
+            return hit[1]
+    key = _resolve(path)
+    with _cache_lock:
+        _cache[path] = (now, key)
+    return key
+
+
+def _resolve(path: str) -> Optional[str]:
+    p = Path(path).expanduser().absolute()
+    for cand in (p, *p.parents):
+        try:
+            dev = os.stat(cand).st_dev
+            break
+        except OSError:
+            continue
+    else:
+        return None
+    if hasattr(os, "major"):
+        major, minor = os.major(dev), os.minor(dev)
+        disk = _block_disk(major, minor)
+        if disk:
+            return f"disk:{disk}"
+        server = _net_server(major, minor)
+        if server:
+            return f"net:{server}"
+    return f"dev:{dev}"
+
+
+def _block_disk(major: int, minor: int) -> Optional[str]:
+    """Disco inteiro de um dispositivo de bloco (sda1 -> sda); None se não for bloco."""
+    sys_path = Path(f"/sys/dev/block/{major}:{minor}")
+    try:
+        real = sys_path.resolve(strict=True)
+    except OSError:
+        return None
+    if (real / "partition").exists():
+        real = real.parent
+    return real.name
+
+
+def _net_server(major: int, minor: int) -> Optional[str]:
+    """Servidor de uma montagem de rede ('nas01' de nas01:/export ou //nas01/share)."""
+    try:
+        lines = Path("/proc/self/mountinfo").read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return None
+    want = f"{major}:{minor}"
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 10 or fields[2] != want or "-" not in fields:
+            continue
+        sep = fields.index("-")
+        fstype, source = fields[sep + 1], fields[sep + 2]
+        if fstype not in _NET_FSTYPES:
+            return None
+        if source.startswith("//"):
+            return source[2:].split("/", 1)[0].lower()
+        if ":" in source:
+            return source.split(":", 1)[0].lower()
+        return source.lower()
+    return None
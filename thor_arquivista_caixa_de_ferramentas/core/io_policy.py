@@ -0,0 +1,206 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/io_policy.py
+"""
+Prioridade de CPU/E-S e limite de banda por tipo de job (cfg.job_io).
+
+  "job_io": {
+    "REPLICATE": {"nice": 10, "ionice": "idle", "max_mb_s": 0,
+                  "windows": [{"from": "08:00", "to": "19:00", "days": [0, 1, 2, 3, 4], "max_mb_s": 40}]},
+    "*": {"ionice": "best-effort:7"}
+  }
+
+- nice: incremento de nice do processo do job (0..19);
+- ionice: classe de E/S — "idle" (só usa o disco ocioso) ou "best-effort[:0-7]";
+  aplicada via ioprio_set no Linux e ignorada nos demais sistemas;
+- max_mb_s: teto de leitura/cópia em MB/s (0 = sem limite), aplicado pelos
+  scripts (scripts/pd_throttle.py) num token bucket dentro dos laços de
+  hash_files, verify_fixity, replicate_storage e build_bag;
+- windows: janelas de horário local com outro teto (ex.: devagar no expediente,
+  sem limite à noite); days: 0 = segunda ... 6 = domingo (ausente = todos).
+
+A chave "*" vale para os tipos sem política própria. O limite segue para o
+script na variável THOR_IO_LIMIT (ver env()).
+"""
+from __future__ import annotations
+
+import ctypes
+import functools
+import json
+import os
+import platform
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+ENV_LIMIT = "THOR_IO_LIMIT"
+
+_KEYS = {"nice", "ionice", "max_mb_s", "windows"}
+_WINDOW_KEYS = {"from", "to", "days", "max_mb_s"}
+_HHMM = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d$")
+
+# ioprio_set(2): número da syscall por arquitetura (Linux)
+_IOPRIO_SET_NR = {"x86_64": 251, "amd64": 251, "i386": 289, "i686": 289, "aarch64": 30, "arm64": 30,
+                  "riscv64": 30, "armv7l": 314, "ppc64le": 273, "ppc64": 273, "s390x": 282}
+_IOPRIO_CLASS = {"best-effort": 2, "idle": 3}
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+
+
+def _parse_ionice(spec: Optional[str]) -> Optional[int]:
+    """'idle' | 'best-effort[:n]' -> valor de ioprio; None = não alterar."""
+    if not spec:
+        return None
+    cls, _, level = str(spec).strip().lower().partition(":")
+    if cls not in _IOPRIO_CLASS:
+        raise ValueError(f"ionice inválido: {spec!r} (use 'idle' ou 'best-effort[:0-7]')")
+    data = 0
+    if level:
+        if cls != "best-effort" or not level.isdigit() or not 0 <= int(level) <= 7:
+            raise ValueError(f"ionice inválido: {spec!r} (nível de best-effort entre 0 e 7)")
+        data = int(level)
+    elif cls == "best-effort":
+        data = 4
+    return (_IOPRIO_CLASS[cls] << _IOPRIO_CLASS_SHIFT) | data
+
+
+def _parse_window(w: Any) -> Dict[str, Any]:
+    if not isinstance(w, dict) or set(w) - _WINDOW_KEYS:
+        raise ValueError(f"janela inválida: {w!r} (chaves: from, to, days, max_mb_s)")
+    for k in ("from", "to"):
+        if not _HHMM.match(str(w.get(k, ""))):
+            raise ValueError(f"janela inválida: '{k}' deve ser HH:MM ({w!r})")
+    days = w.get("days")
+    if days is not None and (not isinstance(days, list) or not all(isinstance(d, int) and 0 <= d <= 6 for d in days)):
+        raise ValueError(f"janela inválida: 'days' deve ser uma lista de 0 (segunda) a 6 (domingo) ({w!r})")
+    mb_s = float(w.get("max_mb_s") or 0)
+    if mb_s < 0:
+        raise ValueError(f"janela inválida: max_mb_s negativo ({w!r})")
+    return {"from": w["from"], "to": w["to"], "days": days, "max_mb_s": mb_s}
+
+
+class IoPolicy:
+    """Política de E/S de um tipo de job (ver docstring do módulo)."""
+
+    def __init__(self, nice: int = 0, ionice: Optional[str] = None, max_mb_s: float = 0,
+                 windows: Optional[List[Dict[str, Any]]] = None):
+        if not 0 <= int(nice) <= 19:
+            raise ValueError("nice deve estar entre 0 e 19")
+        if float(max_mb_s) < 0:
+            raise ValueError("max_mb_s não pode ser negativo")
+        self.nice = int(nice)
+        self.ionice = ionice
+        self.ioprio = _parse_ionice(ionice)
+        self.max_mb_s = float(max_mb_s)
+        self.windows = [_parse_window(w) for w in windows or ()]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IoPolicy":
+        unknown = set(data) - _KEYS
+        if unknown:
+            raise ValueError(f"chave(s) desconhecida(s) na política de E/S: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    @property
+    def throttled(self) -> bool:
+        return bool(self.max_mb_s or any(w["max_mb_s"] for w in self.windows))
+
+    def env(self) -> Dict[str, str]:
+        """Variáveis de ambiente do job (limite de banda para scripts/pd_throttle.py)."""
+        if not self.throttled:
+            return {}
+        return {ENV_LIMIT: json.dumps({"max_mb_s": self.max_mb_s, "windows": self.windows})}
+
+    def describe(self) -> str:
+        """Resumo para o log do job, ex.: 'nice 10, ionice idle, até 40 MB/s 08:00-19:00'."""
+        parts = []
+        if self.nice:
+            parts.append(f"nice {self.nice}")
+        if self.ionice:
+            parts.append(f"ionice {self.ionice}")
+        if self.max_mb_s:
+            parts.append(f"até {self.max_mb_s:g} MB/s")
+        for w in self.windows:
+            lim = f"até {w['max_mb_s']:g} MB/s" if w["max_mb_s"] else "sem limite"
+            parts.append(f"{lim} {w['from']}-{w['to']}")
+        return ", ".join(parts)
+
+
+def io_policies(conf: Optional[Dict[str, Any]]) -> Dict[str, IoPolicy]:
+    """{job_type | "*": IoPolicy} a partir de cfg.job_io; ValueError se inválido."""
+    out: Dict[str, IoPolicy] = {}
+    for jtype, data in (conf or {}).items():
+        if not isinstance(data, dict):
+            raise ValueError(f"job_io[{jtype!r}] deve ser um objeto")
+        try:
+            out[jtype] = IoPolicy.from_dict(data)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"job_io[{jtype!r}]: {e}") from e
+    return out
+
+
+def apply_priority(policy: IoPolicy, pid: int = 0) -> bool:
+    """
+    Aplica nice e classe de E/S ao processo pid (0 = o próprio processo; chamar
+    antes de o script criar threads, que herdam os valores). False se algo não
+    pôde ser aplicado (sistema sem suporte, permissão).
+    """
+    ok = True
+    if policy.nice and hasattr(os, "setpriority"):
+        try:
+            current = os.getpriority(os.PRIO_PROCESS, pid)
+            os.setpriority(os.PRIO_PROCESS, pid, min(19, current + policy.nice))
+        except OSError:
+            ok = False
+    if policy.ioprio is not None:
+        ok = _ioprio_set(pid, policy.ioprio) and ok
+    return ok
+
+
+def priority_hook(policy: IoPolicy) -> Callable[[], None]:
+    """
+    preexec_fn de subprocess.Popen (POSIX): aplica a política no filho antes do
+    exec, para o script já nascer com nice/ionice (e suas threads herdarem).
+    A syscall e a mensagem são preparadas aqui, no pai; no filho só restam as
+    chamadas de sistema e, se falharem, um aviso no stderr (já ligado ao pipe).
+    """
+    _ioprio_syscall()
+    warn = f"[aviso] prioridade de E/S não aplicada por completo ({policy.describe()})\n".encode("utf-8")
+
+    def hook() -> None:
+        if not apply_priority(policy):
+            os.write(2, warn)
+    return hook
+
+
+@functools.lru_cache(maxsize=None)
+def _ioprio_syscall() -> Optional[tuple]:
+    """(número de ioprio_set, libc.syscall) neste sistema ou None; resolvido uma vez."""
+    nr = _IOPRIO_SET_NR.get(platform.machine().lower())
+    if not nr or not platform.system() == "Linux":
+        return None
+    try:
+        return nr, ctypes.CDLL(None, use_errno=True).syscall
+    except (OSError, AttributeError):
+        return None
+
+
+def _ioprio_set(pid: int, ioprio: int) -> bool:
+    sc = _ioprio_syscall()
+    if sc is None:
+        return False
+    nr, syscall = sc
+    return syscall(nr, _IOPRIO_WHO_PROCESS, pid, ioprio) == 0
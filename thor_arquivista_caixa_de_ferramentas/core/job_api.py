@@ -0,0 +1,482 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_api.py
+"""
+API HTTP/JSON local da fila de jobs, só com a biblioteca padrão (http.server),
+para sistemas de ingestão enfileirarem e acompanharem jobs sem mexer no
+jobs_db.json nem na interface gráfica.
+
+  POST /jobs                       um job {"job_type", "params", "priority", "depends_on"}
+                                   ou um lote {"jobs": [...]} (ref/depends_on como em add_jobs)
+                                   -> 201 {"ids": [...]}
+  GET  /jobs?status=&job_type=&limit=&after_id=&params=1
+                                   listagem, do mais recente (limit padrão 100, máx. 1000)
+  GET  /jobs/<id>                  o job
+  GET  /jobs/<id>/logs?offset=&limit=
+                                   linhas de log {"ts", "level", "msg"}
+  GET  /jobs/<id>/logs?follow=1    as linhas em streaming (uma por linha, NDJSON) até o job terminar
+  POST /jobs/<id>/cancel           pending/waiting -> canceled; running -> encerra o script
+  GET  /status                     contagens por status e estado do worker deste processo
+  POST /worker/pause | /worker/resume
+  GET  /stats/resources?job_type=&status=&since=&until=
+                                   uso de recursos agregado por tipo (core.job_resources)
+  GET  /schedules                  agendamentos recorrentes (core.job_schedule)
+  POST /schedules                  cria um agendamento -> 201 {"id", "next_run"}
+  POST /schedules/<id>/enable | /disable | /delete
+
+Erros: {"error": "..."} com 400 (pedido inválido), 401, 404 ou 409.
+
+Escuta em cfg.api_listen: "127.0.0.1:8765" (TCP) ou "unix:/run/thor/api.sock".
+Com cfg.api_token, todo pedido precisa de "Authorization: Bearer <token>";
+escutar fora da loopback sem token é recusado. Não exponha a API fora da
+máquina sem um proxy com TLS.
+
+Envios simultâneos são juntados numa única chamada a add_jobs (uma gravação
+da base para vários pedidos, ver _Submitter): sob carga, centenas de envios
+por segundo custam poucas gravações e o lock da fila fica livre para o worker.
+Cada pedido é validado antes (core.job_import.validate_jobs) e recebe só os
+próprios ids ou o próprio erro.
+
+Uso via linha de comando (sem worker; pause/resume exigem o worker no mesmo processo):
+  python -m core.job_api --config preservacao_app.json [--listen 127.0.0.1:8765]
+"""
+from __future__ import annotations
+
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import queue
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from core.config import AppConfig
+from core.job_import import validate_jobs
+from core.job_resources import resource_stats
+from core.job_schedule import new_schedule, set_enabled
+
+DEFAULT_LISTEN = "127.0.0.1:8765"
+MAX_BODY = 32 * 1024 * 1024   # bytes por pedido
+MAX_COMMIT_JOBS = 5000        # jobs por gravação conjunta
+FOLLOW_POLL_S = 0.5           # intervalo de leitura do log em ?follow=1
+LIST_LIMIT, LIST_MAX = 100, 1000
+FINAL_STATUSES = ("done", "error", "canceled", "timeout")
+
+_JOB_PATH = re.compile(r"^/jobs/([^/]+)(/logs|/cancel)?$")
+_SCHEDULE_PATH = re.compile(r"^/schedules/([^/]+)/(enable|disable|delete)$")
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+
+
+def parse_listen(listen: str) -> Tuple[str, Any]:
+    """'host:porta' | 'porta' | 'unix:/caminho' -> ('tcp', (host, porta)) | ('unix', caminho)."""
+    listen = (listen or DEFAULT_LISTEN).strip()
+    if listen.startswith("unix:"):
+        return "unix", listen[5:]
+    host, _, port = listen.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"api_listen inválido: {listen!r} (use host:porta ou unix:/caminho)")
+    return "tcp", (host.strip("[]") or "127.0.0.1", int(port))
+
+
+def _is_loopback(host: str) -> bool:
+    """True se host só aceita conexões desta máquina (localhost, 127.0.0.0/8, ::1)."""
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # nome de máquina: pode resolver para uma interface externa
+
+
+def job_specs(body: Any) -> List[Dict[str, Any]]:
+    """Corpo de POST /jobs -> specs de add_jobs; ApiError(400) se malformado."""
+    items = body.get("jobs") if isinstance(body, dict) and "jobs" in body else [body]
+    if not isinstance(items, list) or not items:
+        raise ApiError(400, "'jobs' deve ser uma lista não vazia")
+    specs = []
+    for i, obj in enumerate(items, 1):
+        if not isinstance(obj, dict) or not obj.get("job_type"):
+            raise ApiError(400, f"item {i}: 'job_type' ausente")
+        if not isinstance(obj.get("params") or {}, dict):
+            raise ApiError(400, f"item {i}: 'params' deve ser um objeto")
+        deps = obj.get("depends_on") or []
+        deps = [deps] if isinstance(deps, (str, int)) else deps
+        for d in deps:
+            # índices fora do próprio lote apontariam para o lote de outro pedido na gravação conjunta
+            if isinstance(d, int) and not isinstance(d, bool) and not 0 <= d < i - 1:
+                raise ApiError(400, f"item {i}: depends_on {d} não é um item anterior do lote")
+        try:
+            priority = int(obj.get("priority") or 0)
+        except (TypeError, ValueError):
+            raise ApiError(400, f"item {i}: 'priority' deve ser inteiro") from None
+        specs.append({"job_type": str(obj["job_type"]), "params": obj.get("params") or {},
+                      "priority": priority, "ref": obj.get("ref"), "depends_on": list(deps)})
+    return specs
+
+
+class _Submitter:
+    """
+    Enfileira os lotes dos pedidos numa thread só: o que chegou enquanto a
+    gravação anterior estava em andamento vai junto na próxima (group commit),
+    sem espera extra quando a API está ociosa. Se o lote conjunto falha (ex.:
+    dependência desconhecida num pedido), cada pedido é regravado sozinho para
+    o erro voltar só a quem o causou.
+    """
+
+    def __init__(self, jobstore: Any):
+        self.jobstore = jobstore
+        self._q: "queue.Queue[Tuple[List[Dict[str, Any]], Future]]" = queue.Queue()
+        threading.Thread(target=self._loop, daemon=True, name="api-submit").start()
+
+    def submit(self, specs: List[Dict[str, Any]]) -> List[str]:
+        fut: Future = Future()
+        self._q.put((specs, fut))
+        return fut.result()
+
+    def _loop(self) -> None:
+        while True:
+            batch = [self._q.get()]
+            n = len(batch[0][0])
+            while n < MAX_COMMIT_JOBS:
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+                n += len(item[0])
+            self._commit(batch)
+
+    def _commit(self, batch: List[Tuple[List[Dict[str, Any]], Future]]) -> None:
+        if len(batch) > 1:
+            try:
+                ids = self.jobstore.add_jobs(_merge([specs for specs, _ in batch]))
+            except Exception:
+                pass  # regrava pedido a pedido, abaixo
+            else:
+                self._log(ids, [s for specs, _ in batch for s in specs])
+                pos = 0
+                for specs, fut in batch:
+                    fut.set_result(ids[pos:pos + len(specs)])
+                    pos += len(specs)
+                return
+        for specs, fut in batch:
+            try:
+                ids = self.jobstore.add_jobs(specs)
+            except Exception as e:
+                fut.set_exception(e)
+                continue
+            self._log(ids, specs)
+            fut.set_result(ids)
+
+    def _log(self, ids: List[str], specs: List[Dict[str, Any]]) -> None:
+        try:
+            self.jobstore.add_logs([(jid, f"Enfileirado {s['job_type']} (API)") for jid, s in zip(ids, specs)])
+        except Exception:
+            pass  # o job já está na fila; o log é só informativo
+
+
+def _merge(batches: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Lotes de vários pedidos -> um lote: índices deslocados e refs prefixados pelo pedido."""
+    out: List[Dict[str, Any]] = []
+    for n, specs in enumerate(batches):
+        base = len(out)
+        refs = {str(s["ref"]) for s in specs if s.get("ref") not in (None, "")}
+        for s in specs:
+            s = dict(s)
+            s["depends_on"] = [d + base if isinstance(d, int) and not isinstance(d, bool)
+                               else f"{n}:{d}" if str(d) in refs else d
+                               for d in s.get("depends_on") or ()]
+            if s.get("ref") not in (None, ""):
+                s["ref"] = f"{n}:{s['ref']}"
+            out.append(s)
+    return out
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ThorArquivista"
+    protocol_version = "HTTP/1.1"  # conexões persistentes: o cliente reaproveita o socket entre envios
+
+    # ---------- roteamento ----------
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def _dispatch(self, method: str) -> None:
+        api: JobApi = self.server.api  # type: ignore[attr-defined]
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if api.token and not hmac.compare_digest(self.headers.get("Authorization", ""), f"Bearer {api.token}"):
+                raise ApiError(401, "token ausente ou inválido")
+            path = url.path.rstrip("/") or "/"
+            m = _JOB_PATH.match(path)
+            ms = _SCHEDULE_PATH.match(path)
+            if path == "/jobs" and method == "POST":
+                self._send(201, {"ids": api.enqueue(job_specs(self._body()))})
+            elif path == "/jobs" and method == "GET":
+                self._send(200, {"jobs": api.list(query)})
+            elif path == "/status" and method == "GET":
+                self._send(200, api.status())
+            elif path in ("/worker/pause", "/worker/resume") and method == "POST":
+                self._send(200, api.pause(path.endswith("pause")))
+            elif m and method == "GET" and not m.group(2):
+                self._send(200, api.job(m.group(1)))
+            elif m and method == "GET" and m.group(2) == "/logs":
+                if query.get("follow") in ("1", "true"):
+                    self._follow(api, m.group(1), int(query.get("offset") or 0))
+                else:
+                    self._send(200, {"logs": api.logs(m.group(1), query)})
+            elif m and method == "POST" and m.group(2) == "/cancel":
+                self._send(200, api.cancel(m.group(1)))
+            elif path == "/stats/resources" and method == "GET":
+                self._send(200, resource_stats(api.jobstore, job_type=query.get("job_type") or None,
+                                               status=query.get("status", "done") or None,
+                                               since=query.get("since") or None, until=query.get("until") or None))
+            elif path == "/schedules" and method == "GET":
+                self._send(200, {"schedules": api.jobstore.list_schedules()})
+            elif path == "/schedules" and method == "POST":
+                self._send(201, api.add_schedule(self._body()))
+            elif ms and method == "POST":
+                self._send(200, api.schedule_action(ms.group(1), ms.group(2)))
+            else:
+                raise ApiError(404, f"rota desconhecida: {method} {url.path}")
+        except ApiError as e:
+            self._send(e.status, {"error": str(e)})
+        except ValueError as e:
+            self._send(400, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            self._send(500, {"error": f"falha interna: {e}"})
+
+    # ---------- E/S ----------
+    def _body(self) -> Any:
+        try:
+            n = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            raise ApiError(400, "Content-Length inválido") from None
+        if n <= 0 or n > MAX_BODY:
+            raise ApiError(400, f"corpo ausente ou maior que {MAX_BODY} bytes")
+        try:
+            return json.loads(self.rfile.read(n))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ApiError(400, f"JSON inválido ({e})") from None
+
+    def _send(self, status: int, obj: Any) -> None:
+        data = json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _follow(self, api: "JobApi", job_id: str, offset: int) -> None:
+        """NDJSON até o job terminar; sem Content-Length, a resposta acaba ao fechar a conexão."""
+        api.job(job_id)  # 404 antes de começar o streaming
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        while not api.stopping.is_set():
+            entries = api.jobstore.get_logs(job_id, offset)
+            offset += len(entries)
+            if entries:
+                self.wfile.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries).encode("utf-8"))
+                self.wfile.flush()
+            job = api.jobstore.get_job(job_id)
+            if (job is None or job.get("status") in FINAL_STATUSES) and not entries:
+                break
+            time.sleep(FOLLOW_POLL_S)
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass  # centenas de pedidos por segundo: sem uma linha de stderr por pedido
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer em IPv4 ou IPv6 conforme o host, sem alterar a classe da stdlib."""
+
+    def __init__(self, address: Tuple[str, int], handler: Any):
+        self.address_family = socket.AF_INET6 if ":" in address[0] else socket.AF_INET
+        super().__init__(address, handler)
+
+
+class JobApi:
+    """
+    Servidor da API (ver docstring do módulo) diante de um JobStore e,
+    opcionalmente, do Worker do mesmo processo (pause/resume, cancelamento imediato).
+    start() sobe o servidor numa thread; stop() o encerra.
+    """
+
+    def __init__(self, cfg: AppConfig, jobstore: Any, worker: Any = None, listen: Optional[str] = None):
+        self.cfg = cfg
+        self.jobstore = jobstore
+        self.worker = worker
+        self.token = getattr(cfg, "api_token", "") or ""
+        self.kind, self.address = parse_listen(listen or getattr(cfg, "api_listen", "") or DEFAULT_LISTEN)
+        self.stopping = threading.Event()
+        self._submitter = _Submitter(jobstore)
+        self._server: Optional[socketserver.BaseServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- ciclo de vida ----------
+    def start(self) -> None:
+        """Sobe o servidor; ValueError se o endereço TCP não é loopback e não há api_token."""
+        if self.kind == "tcp" and not self.token and not _is_loopback(self.address[0]):
+            raise ValueError(f"api_listen {self.address[0]!r} aceita conexões de outras máquinas: "
+                             "defina api_token (ou use 127.0.0.1 / unix:/caminho)")
+        if self.kind == "unix":
+            if os.path.exists(self.address):
+                os.unlink(self.address)  # socket de uma execução anterior
+            server: socketserver.BaseServer = _UnixHTTPServer(self.address, _Handler)
+        else:
+            server = _TCPHTTPServer(self.address, _Handler)
+            self.address = server.server_address[:2]  # porta 0 = escolhida pelo sistema
+        server.api = self  # type: ignore[attr-defined]
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, daemon=True, name="job-api")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.stopping.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if self.kind == "unix" and os.path.exists(self.address):
+                os.unlink(self.address)
+
+    @property
+    def url(self) -> str:
+        if self.kind == "unix":
+            return f"unix:{self.address}"
+        host, port = self.address
+        return f"http://{f'[{host}]' if ':' in host else host}:{port}"
+
+    # ---------- operações ----------
+    def enqueue(self, specs: List[Dict[str, Any]]) -> List[str]:
+        validate_jobs(specs, self.cfg)
+        return self._submitter.submit(specs)
+
+    def list(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        limit = min(LIST_MAX, max(1, int(query.get("limit") or LIST_LIMIT)))
+        return self.jobstore.list_jobs(query.get("status") or None, job_type=query.get("job_type") or None,
+                                       limit=limit, offset=int(query.get("offset") or 0),
+                                       after_id=query.get("after_id") or None,
+                                       include_params=query.get("params") in ("1", "true"))
+
+    def job(self, job_id: str) -> Dict[str, Any]:
+        job = self.jobstore.get_job(job_id)
+        if job is None:
+            raise ApiError(404, f"job não encontrado: {job_id}")
+        return job
+
+    def logs(self, job_id: str, query: Dict[str, str]) -> List[Dict[str, str]]:
+        self.job(job_id)
+        limit = query.get("limit")
+        return self.jobstore.get_logs(job_id, int(query.get("offset") or 0), int(limit) if limit else None)
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        status = self.job(job_id)["status"]
+        if status in ("pending", "waiting"):
+            ok = self.jobstore.cancel_job(job_id)
+        elif status == "running":
+            ok = (self.worker.cancel_running(job_id) if self.worker is not None
+                  else self.jobstore.cancel_running(job_id))
+        else:
+            raise ApiError(409, f"job já terminou ({status})")
+        return {"ok": bool(ok), "status": self.job(job_id)["status"]}
+
+    def add_schedule(self, data: Any) -> Dict[str, Any]:
+        if not isinstance(data, dict):
+            raise ApiError(400, "o agendamento deve ser um objeto")
+        spec, next_run = new_schedule(data, self.cfg)
+        return {"id": self.jobstore.add_schedule(spec, next_run), "next_run": next_run}
+
+    def schedule_action(self, schedule_id: str, action: str) -> Dict[str, Any]:
+        ok = (self.jobstore.delete_schedule(schedule_id) if action == "delete"
+              else set_enabled(self.jobstore, schedule_id, action == "enable"))
+        if not ok:
+            raise ApiError(404, f"agendamento não encontrado: {schedule_id}")
+        return self.jobstore.get_schedule(schedule_id) or {"ok": True}
+
+    def status(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"counts": self.jobstore.counts_by_status(), "worker": None}
+        if self.worker is not None:
+            out["worker"] = {"id": self.worker.worker_id, "alive": self.worker.is_alive(),
+                             "paused": self.worker.is_paused(), "concurrency": self.worker.concurrency,
+                             "active": self.worker.active_jobs()}
+        return out
+
+    def pause(self, paused: bool) -> Dict[str, Any]:
+        if self.worker is None:
+            raise ApiError(409, "não há worker neste processo (rode a API com o worker: python -m core.worker --api)")
+        self.worker.pause() if paused else self.worker.resume()
+        return {"paused": self.worker.is_paused()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.jobstore import open_jobstore
+
+    ap = argparse.ArgumentParser(description="API HTTP/JSON da fila de jobs (sem worker).")
+    ap.add_argument("--config", default="preservacao_app.json", help="Configuração do app (JSON).")
+    ap.add_argument("--listen", default=None, help=f"host:porta ou unix:/caminho (padrão: api_listen ou {DEFAULT_LISTEN}).")
+    args = ap.parse_args(argv)
+
+    try:
+        cfg = AppConfig.from_env(AppConfig.from_file(args.config))
+        api = JobApi(cfg, open_jobstore(cfg), listen=args.listen)
+        api.start()
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 2
+    print(f"[INFO] API da fila em {api.url}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
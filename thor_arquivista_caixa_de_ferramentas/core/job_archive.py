@@ -0,0 +1,148 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_archive.py
+"""
+Arquivo morto de jobs finalizados, particionado por data e comprimido.
+
+Layout:
+  <jobs_db>.archive/AAAA-MM-DD.jsonl.gz   (data = updated_at do job, UTC)
+
+Cada linha: {"job": {...}, "logs": [{ts, level, msg}, ...]}
+A saída completa dos jobs arquivados (core.job_output) vai para
+  <jobs_db>.archive/output/<_id>.log.gz
+Novas remessas do mesmo dia são acrescentadas como novos membros gzip
+(o arquivo continua legível por gzip.open/zcat).
+
+Busca pela linha de comando:
+  python -m core.job_archive jobs_db.archive --status error --de 2025-01-01 --texto "manifest"
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+class JobArchive:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self.output_dir = self.root / "output"
+
+    def append(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """
+        Grava entradas {"job": ..., "logs": [...]} nas partições do dia de updated_at.
+        Retorna quantas foram gravadas. Os arquivos são sincronizados em disco
+        antes do retorno, para que o chamador possa remover os jobs da base viva.
+        """
+        by_day: Dict[str, List[str]] = {}
+        for e in entries:
+            day = str(e["job"].get("updated_at") or e["job"].get("created_at") or "")[:10] or "sem-data"
+            by_day.setdefault(day, []).append(json.dumps(e, ensure_ascii=False) + "\n")
+        if not by_day:
+            return 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        n = 0
+        for day, lines in by_day.items():
+            with open(self.root / f"{day}.jsonl.gz", "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                    gz.write("".join(lines).encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+            n += len(lines)
+        return n
+
+    def partitions(self, date_from: str = "", date_to: str = "") -> List[Path]:
+        """Partições (ordenadas) cujo dia está em [date_from, date_to] (AAAA-MM-DD, inclusivo)."""
+        if not self.root.is_dir():
+            return []
+        out = []
+        for p in sorted(self.root.glob("*.jsonl.gz")):
+            day = p.name[:10]
+            if date_from and day < date_from[:10]:
+                continue
+            if date_to and day > date_to[:10]:
+                continue
+            out.append(p)
+        return out
+
+    def search(
+        self,
+        *,
+        job_id: Optional[str] = None,
+        job_type: Optional[str] = None,
+        status: Optional[str] = None,
+        text: Optional[str] = None,
+        date_from: str = "",
+        date_to: str = "",
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Percorre as partições do período e devolve as entradas que casam com os filtros.
+        'text' procura (sem diferenciar maiúsculas) nos params, error_msg e mensagens de log.
+        """
+        needle = (text or "").lower()
+        found = 0
+        for p in self.partitions(date_from, date_to):
+            with gzip.open(p, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if needle and needle not in line.lower():
+                        continue  # filtro barato antes de decodificar
+                    try:
+                        entry = json.loads(line)
+                    except Exception:
+                        continue
+                    job = entry.get("job") or {}
+                    if job_id and job.get("_id") != job_id:
+                        continue
+                    if job_type and job.get("job_type") != job_type:
+                        continue
+                    if status and job.get("status") != status:
+                        continue
+                    yield entry
+                    found += 1
+                    if limit is not None and found >= limit:
+                        return
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Busca jobs no arquivo morto (jsonl.gz por dia).")
+    ap.add_argument("pasta", help="Pasta do arquivo morto (ex.: jobs_db.archive).")
+    ap.add_argument("--id", dest="job_id", default=None)
+    ap.add_argument("--tipo", dest="job_type", default=None)
+    ap.add_argument("--status", default=None)
+    ap.add_argument("--texto", dest="text", default=None)
+    ap.add_argument("--de", dest="date_from", default="", help="AAAA-MM-DD")
+    ap.add_argument("--ate", dest="date_to", default="", help="AAAA-MM-DD")
+    ap.add_argument("--limite", dest="limit", type=int, default=100)
+    ap.add_argument("--logs", action="store_true", help="Inclui os logs de cada job.")
+    args = ap.parse_args(argv)
+
+    archive = JobArchive(args.pasta)
+    for entry in archive.search(job_id=args.job_id, job_type=args.job_type, status=args.status,
+                                text=args.text, date_from=args.date_from, date_to=args.date_to,
+                                limit=args.limit):
+        if not args.logs:
+            entry = {"job": entry.get("job")}
+        print(json.dumps(entry, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_cache.py
+"""
+Cache de resultados de jobs por impressão digital das entradas.
+
+A impressão digital (fingerprint) de um job combina:
+  - job_type e params, sem as chaves de saída (o mesmo trabalho gravado em
+    outro caminho é o mesmo resultado) nem as que só mudam a exibição;
+  - uma impressão barata de cada entrada: caminho relativo, tamanho e mtime
+    de cada arquivo da árvore (só stat, nenhum byte é lido). As saídas do
+    próprio job (e seus .part) ficam de fora, pois é comum gravá-las dentro
+    da árvore de entrada (ex.: raiz/manifest-sha256.txt).
+
+Um job concluído guarda o fingerprint e o resumo das saídas ('outputs':
+{chave: {path, size, sha256}}). Um job novo com o mesmo fingerprint cuja
+saída anterior continua íntegra (mesmo sha256) é concluído na hora pelo
+Worker, apontando para ela (cache_of) — copiada, se o job pediu outro caminho.
+
+Só tipos com entradas/saídas conhecidas (CACHE_IO) podem usar o cache, e só
+se listados em cfg.job_cache_types. params {"cache": false} força a execução.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CHUNK = 1024 * 1024
+
+# job_type -> (chaves de params com entradas, chaves de params com saídas)
+CACHE_IO: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "HASH_MANIFEST": (("raiz",), ("saida",)),
+    "FORMAT_IDENTIFY": (("raiz",), ("saida",)),
+}
+
+# DUPLICATE_FINDER: por 'modo' (os que só dependem de arquivos gerados pela máquina)
+_DUPLICATE_IO: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "inventario": (("raiz",), ("inventario",)),
+    "duplicatas": (("inventario",), ("duplicatas",)),
+}
+
+# chaves de params que não alteram o resultado
+_IGNORED_PARAMS = ("cache", "progress", "mostrar_progresso")
+
+
+def cache_io(job_type: str, params: Dict[str, Any]) -> Optional[Tuple[List[str], List[str]]]:
+    """(chaves de entrada, chaves de saída presentes em params) ou None se o job não é cacheável."""
+    if job_type == "DUPLICATE_FINDER":
+        io = _DUPLICATE_IO.get(params.get("modo"))
+    else:
+        io = CACHE_IO.get(job_type)
+    if io is None:
+        return None
+    inputs, outputs = io
+    if not all(params.get(k) for k in inputs):
+        return None
+    outs = [k for k in outputs if params.get(k)]
+    return (list(inputs), outs) if outs else None
+
+
+def tree_fingerprint(path: str | Path, skip: Iterable[str | Path] = ()) -> Optional[str]:
+    """
+    sha256 de (caminho relativo, tamanho, mtime_ns) de cada arquivo sob 'path'
+    (ou do próprio arquivo), em ordem de nome. None se o caminho não existe.
+    Arquivos em 'skip' (e seus irmãos .part) são ignorados.
+    """
+    h = hashlib.sha256()
+    try:
+        root = Path(path).resolve()
+        ignored = set()
+        for p in skip:
+            p = str(Path(p).resolve())
+            ignored.update((p, p + ".part"))
+        if root.is_file():
+            st = root.stat()
+            h.update(f"{st.st_size}\0{st.st_mtime_ns}".encode())
+            return h.hexdigest()
+        if not root.is_dir():
+            return None
+    except OSError:
+        return None
+    stack = [(root, "")]
+    while stack:
+        d, rel = stack.pop()
+        try:
+            with os.scandir(d) as it:
+                entries = sorted(it, key=lambda e: e.name, reverse=True)
+        except OSError as e:
+            h.update(f"{rel}\0!{e.errno}\n".encode())
+            continue
+        subdirs = []
+        for e in reversed(entries):
+            name = f"{rel}/{e.name}" if rel else e.name
+            if e.path in ignored:
+                continue
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    subdirs.append((Path(e.path), name))
+                    continue
+                st = e.stat()
+                h.update(f"{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+            except OSError as err:
+                h.update(f"{name}\0!{err.errno}\n".encode("utf-8", "surrogateescape"))
+        stack.extend(reversed(subdirs))  # próximo a sair da pilha = primeiro em ordem de nome
+    return h.hexdigest()
+
+
+def job_fingerprint(job_type: str, params: Dict[str, Any]) -> Optional[str]:
+    """Fingerprint do job (ver docstring do módulo) ou None se não é cacheável / falta entrada."""
+    io = cache_io(job_type, params)
+    if io is None:
+        return None
+    inputs, outputs = io
+    skip = [params[k] for k in outputs]
+    trees: Dict[str, str] = {}
+    for k in inputs:
+        fp = tree_fingerprint(params[k], skip)
+        if fp is None:
+            return None
+        trees[k] = fp
+    key = {
+        "job_type": job_type,
+        "params": {k: v for k, v in params.items() if k not in outputs and k not in _IGNORED_PARAMS},
+        "outputs": sorted(outputs),
+        "inputs": trees,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+
+def file_digest(path: str | Path) -> Optional[Dict[str, Any]]:
+    """{path, size, sha256} de um arquivo de saída; None se não existe."""
+    p = Path(path)
+    h = hashlib.sha256()
+    try:
+        size = p.stat().st_size
+        with p.open("rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return {"path": str(p), "size": size, "sha256": h.hexdigest()}
+
+
+def output_digests(job_type: str, params: Dict[str, Any]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Resumo das saídas de um job concluído ({chave: file_digest}); None se alguma faltar."""
+    io = cache_io(job_type, params)
+    if io is None:
+        return None
+    out: Dict[str, Dict[str, Any]] = {}
+    for k in io[1]:
+        d = file_digest(params[k])
+        if d is None:
+            return None
+        out[k] = d
+    return out
+
+
+def reuse_outputs(job_type: str, params: Dict[str, Any],
+                  cached: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Reaproveita as saídas de um job anterior para 'params': confere que cada uma
+    ainda tem o mesmo sha256 e, se o job pediu outro caminho, copia para lá
+    (<destino>.part + replace). Retorna os outputs do job novo ou None se
+    alguma saída anterior sumiu ou mudou (o job deve ser executado).
+    """
+    io = cache_io(job_type, params)
+    if io is None or set(io[1]) != set(cached or {}):
+        return None
+    for k in io[1]:
+        now = file_digest(cached[k]["path"])
+        if now is None or now["sha256"] != cached[k].get("sha256"):
+            return None
+    out: Dict[str, Dict[str, Any]] = {}
+    for k in io[1]:
+        src, dst = Path(cached[k]["path"]), Path(params[k])
+        if _same_path(src, dst):
+            out[k] = dict(cached[k])
+            continue
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(dst.name + ".part")
+        try:
+            shutil.copy2(src, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        out[k] = {**cached[k], "path": str(dst)}
+    return out
+
+
+def _same_path(a: Path, b: Path) -> bool:
+    try:
+        return a.resolve() == b.resolve()
+    except OSError:
+        return False
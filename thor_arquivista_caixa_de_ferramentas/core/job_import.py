@@ -0,0 +1,166 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_import.py
+"""
+Importação de jobs em lote a partir de CSV ou JSONL.
+
+JSONL (um job por linha):
+  {"job_type": "VERIFY_FIXITY", "params": {"raiz": "...", "manifesto": "..."}, "priority": 0}
+
+CSV (cabeçalho obrigatório):
+  - job_type            (obrigatória)
+  - priority            (opcional)
+  - params              (opcional, objeto JSON)
+  - ref, depends_on     (opcionais) grafo de jobs: depends_on lista, separados
+                        por ';', refs de linhas anteriores ou _id de jobs já na fila
+  - demais colunas      -> viram chaves de params (células vazias são ignoradas;
+                           valores iniciados por '[' ou '{' e true/false são lidos como JSON)
+
+Uso via linha de comando:
+  python -m core.job_import jobs.csv --config preservacao_app.json
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.config import AppConfig
+from core.scripts_map import get_scripts_map
+
+
+def read_jobs_file(path: str | Path) -> List[Dict[str, Any]]:
+    """Lê um arquivo .csv ou .jsonl e devolve specs {job_type, params, priority, ref, depends_on}."""
+    p = Path(path)
+    if p.suffix.lower() == ".csv":
+        return _read_csv(p)
+    return _read_jsonl(p)
+
+
+def validate_jobs(specs: List[Dict[str, Any]], cfg: AppConfig) -> None:
+    """
+    Confere job_type e parâmetros obrigatórios montando o argv de cada job.
+    Lança ValueError indicando o item problemático (nada é enfileirado).
+    """
+    scripts = get_scripts_map()
+    for i, spec in enumerate(specs, 1):
+        jtype = spec.get("job_type")
+        if jtype not in scripts:
+            raise ValueError(f"item {i}: job_type não suportado: {jtype!r}")
+        _, arg_builder = scripts[jtype]
+        try:
+            arg_builder(spec.get("params") or {}, cfg)
+        except KeyError as e:
+            raise ValueError(f"item {i} ({jtype}): parâmetro obrigatório ausente: {e}") from e
+        except ValueError as e:
+            raise ValueError(f"item {i}: {e}") from e
+
+
+def enqueue_from_file(jobstore, path: str | Path, cfg: Optional[AppConfig] = None) -> List[str]:
+    """Valida e enfileira todos os jobs do arquivo numa única gravação. Retorna os ids."""
+    specs = read_jobs_file(path)
+    if cfg is not None:
+        validate_jobs(specs, cfg)
+    ids = jobstore.add_jobs(specs)
+    jobstore.add_logs([(jid, f"Enfileirado {s['job_type']} (importado de {Path(path).name})")
+                       for jid, s in zip(ids, specs)])
+    return ids
+
+
+# ------------- Internos -------------
+def _read_jsonl(p: Path) -> List[Dict[str, Any]]:
+    specs: List[Dict[str, Any]] = []
+    with p.open("r", encoding="utf-8") as f:
+        for ln, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{p.name}:{ln}: JSON inválido ({e})") from e
+            if not isinstance(obj, dict) or not obj.get("job_type"):
+                raise ValueError(f"{p.name}:{ln}: 'job_type' ausente")
+            specs.append({
+                "job_type": str(obj["job_type"]),
+                "params": obj.get("params") or {},
+                "priority": int(obj.get("priority") or 0),
+                "ref": obj.get("ref"),
+                "depends_on": obj.get("depends_on") or [],
+            })
+    return specs
+
+
+def _read_csv(p: Path) -> List[Dict[str, Any]]:
+    specs: List[Dict[str, Any]] = []
+    with p.open("r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or "job_type" not in reader.fieldnames:
+            raise ValueError(f"{p.name}: cabeçalho sem a coluna 'job_type'")
+        for ln, row in enumerate(reader, 2):
+            jtype = (row.pop("job_type") or "").strip()
+            if not jtype:
+                continue
+            priority = (row.pop("priority", "") or "").strip()
+            ref = (row.pop("ref", "") or "").strip()
+            depends_on = [d.strip() for d in (row.pop("depends_on", "") or "").split(";") if d.strip()]
+            params_json = (row.pop("params", "") or "").strip()
+            try:
+                params = json.loads(params_json) if params_json else {}
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{p.name}:{ln}: coluna 'params' não é JSON válido ({e})") from e
+            for k, v in row.items():
+                if k and v not in (None, ""):
+                    params[k] = _cell_value(v)
+            specs.append({"job_type": jtype, "params": params, "priority": int(priority or 0),
+                          "ref": ref or None, "depends_on": depends_on})
+    return specs
+
+
+def _cell_value(v: str) -> Any:
+    s = v.strip()
+    if s[:1] in ("[", "{") or s.lower() in ("true", "false"):
+        try:
+            return json.loads(s.lower() if s.lower() in ("true", "false") else s)
+        except json.JSONDecodeError:
+            pass
+    return v
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.jobstore import open_jobstore
+
+    ap = argparse.ArgumentParser(description="Enfileira jobs em lote a partir de CSV ou JSONL.")
+    ap.add_argument("arquivo", help="Arquivo .csv ou .jsonl com os jobs.")
+    ap.add_argument("--config", default="preservacao_app.json", help="Configuração do app (JSON).")
+    args = ap.parse_args(argv)
+
+    cfg = AppConfig.from_file(args.config)
+    try:
+        ids = enqueue_from_file(open_jobstore(cfg), args.arquivo, cfg)
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 2
+    print(f"{len(ids)} job(s) enfileirado(s).")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
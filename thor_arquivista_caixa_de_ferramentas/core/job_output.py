@@ -0,0 +1,201 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_output.py
+"""
+Saída completa (stdout/stderr) dos jobs, comprimida, fora do JobStore.
+
+Layout:
+  <jobs_db>.output/<_id>.log.gz   ->   "[stdout] linha" / "[stderr] linha"
+
+O JobStore guarda só as últimas linhas (ring buffer) de cada stream; o arquivo
+.gz tem tudo e é lido em páginas (read(job_id, offset, limit)), sem carregar
+a saída inteira na memória. Cada nova execução do job sobrescreve o arquivo.
+
+Enquanto o job roda, LiveLog copia as linhas para o log do job no JobStore em
+lotes (a cada LIVE_BATCH_LINES linhas ou LIVE_FLUSH_S segundos), para o
+operador acompanhar a saída ao vivo; o próprio log é limitado pelo JobStore
+(log_max_entries).
+"""
+from __future__ import annotations
+
+import gzip
+import re
+import shutil
+import threading
+import traceback
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Deque, Dict, IO, List, Optional
+
+STREAMS = ("stdout", "stderr")
+LIVE_BATCH_LINES = 500  # linhas acumuladas antes de gravar um lote no log
+LIVE_FLUSH_S = 1.0      # intervalo máximo entre gravações enquanto há saída
+_PREFIX = re.compile(r"\s*\[([A-Za-z]+)\]")
+
+
+class JobOutput:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.log.gz"
+
+    def exists(self, job_id: str) -> bool:
+        return self.path(job_id).exists()
+
+    def writer(self, job_id: str, *, tail_lines: int = 200, live: Optional["LiveLog"] = None) -> "OutputWriter":
+        """Abre (truncando) o arquivo de saída do job para gravação."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        return OutputWriter(self.path(job_id), tail_lines=tail_lines, live=live)
+
+    def read(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[str]:
+        """Lê linhas da saída completa (sem o '\\n' final), em páginas via offset/limit."""
+        p = self.path(job_id)
+        if not p.exists():
+            return []
+        stop = None if limit is None else max(0, offset) + max(0, limit)
+        lines: List[str] = []
+        try:
+            with gzip.open(p, "rt", encoding="utf-8", errors="replace") as f:
+                for line in islice(f, max(0, offset), stop):
+                    lines.append(line.rstrip("\n"))
+        except EOFError:
+            pass  # arquivo ainda sendo gravado (membro gzip incompleto): fica o que já foi lido
+        return lines
+
+    def remove(self, job_id: str) -> None:
+        self.path(job_id).unlink(missing_ok=True)
+
+    def move_to(self, job_id: str, dest_dir: str | Path) -> None:
+        """Move a saída do job para outra pasta (ex.: arquivo morto), se existir."""
+        p = self.path(job_id)
+        if p.exists():
+            Path(dest_dir).mkdir(parents=True, exist_ok=True)
+            shutil.move(str(p), str(Path(dest_dir) / p.name))
+
+
+class OutputWriter:
+    """
+    Grava linhas de stdout/stderr no .gz e mantém as últimas 'tail_lines' de cada
+    stream na memória. Thread-safe: um leitor por stream pode chamar pump().
+    Com live, cada linha também segue para o log do job (em lotes).
+    """
+
+    def __init__(self, path: Path, *, tail_lines: int = 200, live: Optional["LiveLog"] = None):
+        self.path = path
+        self.live = live
+        self._gz: IO[str] = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+        self._lock = threading.Lock()
+        self._tails: Dict[str, Deque[str]] = {s: deque(maxlen=max(1, tail_lines)) for s in STREAMS}
+        self.lines: Dict[str, int] = {s: 0 for s in STREAMS}
+
+    def write(self, stream: str, line: str) -> None:
+        line = line.rstrip("\r\n")
+        with self._lock:
+            self._gz.write(f"[{stream}] {line}\n")
+            self._tails[stream].append(line)
+            self.lines[stream] += 1
+        if self.live is not None:
+            self.live.add(stream, line)
+
+    def pump(self, pipe: IO[str], stream: str) -> None:
+        """Consome um pipe linha a linha até o EOF."""
+        for line in pipe:
+            self.write(stream, line)
+
+    def tail(self, stream: str) -> str:
+        with self._lock:
+            return "\n".join(self._tails[stream])
+
+    def dropped(self, stream: str) -> int:
+        """Linhas do stream que ficaram só no arquivo (fora do ring buffer)."""
+        with self._lock:
+            return self.lines[stream] - len(self._tails[stream])
+
+    def close(self) -> None:
+        if self.live is not None:
+            self.live.close()
+        with self._lock:
+            if not self._gz.closed:
+                self._gz.close()
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class LiveLog:
+    """
+    Copia a saída de um job em execução para o log do JobStore (add_logs) em
+    lotes: ao juntar batch_lines linhas ou a cada flush_s segundos (thread
+    própria). No máximo batch_lines linhas ficam em memória; se o JobStore
+    estiver lento, quem chama add() espera a gravação do lote.
+    O nível vem do prefixo da linha ([ERRO], [WARN]/[AVISO], [INFO]/[OK]);
+    sem prefixo, INFO — os scripts também escrevem progresso normal em stderr.
+    """
+
+    PREFIX_LEVELS = {"ERRO": "ERROR", "ERROR": "ERROR", "WARN": "WARN", "AVISO": "WARN",
+                     "INFO": "INFO", "OK": "INFO"}
+
+    def __init__(self, store: Any, job_id: str, *, batch_lines: int = LIVE_BATCH_LINES,
+                 flush_s: float = LIVE_FLUSH_S):
+        self.store = store
+        self.job_id = job_id
+        self.batch_lines = max(1, int(batch_lines))
+        self._buf: List[tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # mantém a ordem dos lotes entre threads
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._timer_loop, args=(max(0.05, float(flush_s)),),
+                                       daemon=True, name=f"livelog-{job_id[:8]}")
+        self._timer.start()
+
+    def add(self, stream: str, line: str) -> None:
+        with self._lock:
+            self._buf.append((self.job_id, line, self.level(line)))
+            full = len(self._buf) >= self.batch_lines
+        if full:
+            self.flush()
+
+    @classmethod
+    def level(cls, line: str) -> str:
+        """Nível de log de uma linha de saída, pelo prefixo '[XXX]'."""
+        m = _PREFIX.match(line)
+        return cls.PREFIX_LEVELS.get(m.group(1).upper(), "INFO") if m else "INFO"
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buf = self._buf, []
+            if batch:
+                self.store.add_logs(batch)
+
+    def _timer_loop(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()  # lote perdido; a saída completa segue no .gz
+
+    def close(self) -> None:
+        if not self._closed.is_set():
+            self._closed.set()
+            self._timer.join()
+        self.flush()
@@ -0,0 +1,174 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_progress.py
+"""
+Lado do Worker do protocolo de progresso dos scripts (scripts/pd_progress.py).
+
+O script escreve linhas JSON {"phase", "files_done", "files_total",
+"bytes_done", "bytes_total"} num canal dedicado, separado de stdout/stderr:
+  - POSIX: um pipe cujo descritor vai em THOR_PROGRESS_FD
+  - Windows (sem herança de fd simples): socket local em THOR_PROGRESS_SOCKET
+
+ProgressTracker transforma essas linhas no registro 'progress' do job, com
+percentual, vazão e ETA calculados numa janela dos últimos RATE_WINDOW_S
+segundos:
+  {"phase", "files_done", "files_total", "bytes_done", "bytes_total",
+   "percent", "bytes_per_s", "files_per_s", "eta_s", "updated_at"}
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+# mesmos nomes usados por scripts/pd_progress.py
+ENV_FD = "THOR_PROGRESS_FD"
+ENV_SOCKET = "THOR_PROGRESS_SOCKET"
+RATE_WINDOW_S = 30.0
+
+
+class ProgressChannel:
+    """
+    Canal de progresso de um job. child_fd (POSIX) deve ser herdado pelo
+    processo do job; env vai para o ambiente dele. Depois de iniciar o
+    processo, chamar child_started(); reader() devolve as linhas até o EOF
+    (para consumir numa thread) e close() encerra o canal.
+    """
+
+    def __init__(self):
+        self._sock: Optional[socket.socket] = None
+        self._closed = threading.Event()
+        if os.name == "posix":
+            self._read_fd, self.child_fd = os.pipe()
+            self.env = {ENV_FD: str(self.child_fd)}
+        else:
+            self._read_fd, self.child_fd = None, None
+            self._sock = socket.create_server(("127.0.0.1", 0))
+            self._sock.settimeout(0.5)
+            self.env = {ENV_SOCKET: f"127.0.0.1:{self._sock.getsockname()[1]}"}
+
+    def child_started(self) -> None:
+        """Fecha no Worker a ponta de escrita (só o processo do job a mantém aberta)."""
+        if self.child_fd is not None:
+            os.close(self.child_fd)
+            self.child_fd = None
+
+    def reader(self) -> Iterator[str]:
+        if self._read_fd is not None:
+            fd, self._read_fd = self._read_fd, None
+            return open(fd, "r", encoding="utf-8", errors="replace")
+        return self._accept_lines()
+
+    def _accept_lines(self) -> Iterator[str]:
+        while not self._closed.is_set():  # socket: espera a conexão do script
+            try:
+                conn, _ = self._sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            with conn, conn.makefile("r", encoding="utf-8", errors="replace") as f:
+                yield from f
+            return
+
+    def close(self) -> None:
+        """Encerra o canal (o processo do job terminou)."""
+        self._closed.set()
+        self.child_started()
+        if self._read_fd is not None:  # reader() nunca foi chamado
+            os.close(self._read_fd)
+            self._read_fd = None
+        if self._sock is not None:
+            self._sock.close()
+
+
+class ProgressTracker:
+    """Consome as linhas de progresso de um job e chama on_update(progress)."""
+
+    def __init__(self, on_update: Callable[[Dict[str, Any]], None]):
+        self.on_update = on_update
+        self.last: Optional[Dict[str, Any]] = None
+        self._phase: Optional[str] = None
+        self._samples: Deque[tuple] = deque()  # (t, bytes_done, files_done)
+
+    def pump(self, lines: Iterator[str]) -> None:
+        """Consome as linhas até o EOF (fecha o leitor ao terminar)."""
+        try:
+            for line in lines:
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue  # linha truncada/estranha: ignora
+                if isinstance(msg, dict):
+                    self.feed(msg, now=time.monotonic())
+        finally:
+            close = getattr(lines, "close", None)
+            if close:
+                close()
+
+    def feed(self, msg: Dict[str, Any], *, now: float) -> Dict[str, Any]:
+        phase = str(msg.get("phase") or "")
+        files_done, files_total = _int(msg.get("files_done")), _int(msg.get("files_total"))
+        bytes_done, bytes_total = _int(msg.get("bytes_done")), _int(msg.get("bytes_total"))
+        if phase != self._phase:
+            self._phase = phase
+            self._samples.clear()
+        self._samples.append((now, bytes_done or 0, files_done or 0))
+        while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW_S:
+            self._samples.popleft()
+
+        t0, b0, f0 = self._samples[0]
+        dt = now - t0
+        bps = (bytes_done or 0) - b0
+        fps = (files_done or 0) - f0
+        bytes_per_s = bps / dt if dt > 0 else None
+        files_per_s = fps / dt if dt > 0 else None
+
+        percent = eta = None
+        if bytes_total:
+            percent = 100.0 * (bytes_done or 0) / bytes_total
+            if bytes_per_s:
+                eta = max(0.0, (bytes_total - (bytes_done or 0)) / bytes_per_s)
+        elif files_total:
+            percent = 100.0 * (files_done or 0) / files_total
+            if files_per_s:
+                eta = max(0.0, (files_total - (files_done or 0)) / files_per_s)
+
+        self.last = {
+            "phase": phase,
+            "files_done": files_done, "files_total": files_total,
+            "bytes_done": bytes_done, "bytes_total": bytes_total,
+            "percent": None if percent is None else round(min(percent, 100.0), 1),
+            "bytes_per_s": None if bytes_per_s is None else round(bytes_per_s),
+            "files_per_s": None if files_per_s is None else round(files_per_s, 2),
+            "eta_s": None if eta is None else round(eta),
+            "updated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        }
+        self.on_update(self.last)
+        return self.last
+
+
+def _int(v: Any) -> Optional[int]:
+    try:
+        return None if v is None else int(v)
+    except (TypeError, ValueError):
+        return None
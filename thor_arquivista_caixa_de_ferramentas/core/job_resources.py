@@ -0,0 +1,322 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_resources.py
+"""
+Contabilidade de recursos por job: tempo de relógio, CPU de usuário/sistema,
+pico de memória (RSS) e bytes lidos/gravados, com a vazão derivada. O Worker
+grava o resumo no campo 'resources' do job (e de cada tentativa em
+attempt_history):
+
+  {"wall_s": 812.4, "cpu_user_s": 95.1, "cpu_sys_s": 40.3, "cpu_pct": 16.7,
+   "max_rss_mb": 58.2, "read_bytes": 52613349376, "write_bytes": 1048576,
+   "rchar": 52630126592, "wchar": 2103296, "read_mb_s": 64.78, "write_mb_s": 0.0, "exact": true}
+
+- read_bytes/write_bytes: o que chegou ao armazenamento (/proc/<pid>/io);
+  rchar/wchar: tudo o que o script leu/gravou (read/write), inclusive o que
+  veio do cache de páginas. read_mb_s/write_mb_s = vazão do job, a partir de
+  rchar/wchar (ou de read_bytes/write_bytes, onde não há rchar);
+- cpu_pct = (usuário + sistema) / relógio: perto de 100 (ou acima, com várias
+  threads) = limitado por CPU; baixo = esperando E/S;
+- CPU, E/S e pico de RSS incluem os subprocessos que o script esperou terminar.
+
+Fontes: no processo quente (core.script_runner), o próprio filho manda os
+números finais ao terminar main() (getrusage e /proc/self/io); em subprocess,
+o Worker recolhe o filho com os.wait4 (reap()), lendo antes /proc/<pid>/io do
+processo já encerrado: exact = true. Se o filho quente morre por sinal, valem
+as amostras de /proc/<pid> que o Worker tira a cada poucos segundos (exact =
+false; perde o último intervalo). Fora do Linux sobra o tempo de relógio (e a
+rusage, onde há wait4/getrusage).
+
+Agregados por tipo (capacidade, regressões): resource_stats(), também via
+  python -m core.job_resources --config preservacao_app.json [--tipo T] [--desde AAAA-MM-DD] [--json]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import AppConfig
+
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_IO_KEYS = ("rchar", "wchar", "read_bytes", "write_bytes")
+
+# métricas agregadas por resource_stats; as de TOTAL_METRICS também somadas
+METRICS = ("wall_s", "cpu_user_s", "cpu_sys_s", "cpu_pct", "max_rss_mb",
+           "rchar", "wchar", "read_bytes", "write_bytes", "read_mb_s", "write_mb_s")
+TOTAL_METRICS = ("wall_s", "cpu_user_s", "cpu_sys_s", "rchar", "wchar", "read_bytes", "write_bytes")
+
+
+def proc_usage(pid: int | str) -> Optional[Dict[str, float]]:
+    """
+    Uso acumulado de um processo vivo via /proc (Linux): cpu_user_s, cpu_sys_s,
+    max_rss_kb e os contadores de /proc/<pid>/io. None se indisponível.
+    """
+    base = Path("/proc", str(pid))
+    try:
+        stat = (base / "stat").read_text()
+    except OSError:
+        return None
+    # campos após "(comm)": estado é o 3º do stat; utime/stime/cutime/cstime são o 14º a 17º
+    f = stat[stat.rindex(")") + 2:].split()
+    out: Dict[str, float] = {"cpu_user_s": (int(f[11]) + int(f[13])) / _CLK_TCK,
+                             "cpu_sys_s": (int(f[12]) + int(f[14])) / _CLK_TCK}
+    try:
+        for line in (base / "status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                out["max_rss_kb"] = float(line.split()[1])
+                break
+    except OSError:
+        pass
+    out.update(_read_io(base / "io"))
+    return out
+
+
+def self_usage() -> Dict[str, float]:
+    """No processo do job, ao terminar: getrusage (próprio + filhos esperados) e /proc/self/io."""
+    import resource
+
+    return _rusage_usage(_read_io(Path("/proc/self/io")),
+                         resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN))
+
+
+def reap(proc: subprocess.Popen, timeout: Optional[float] = None) -> Tuple[int, Optional[Dict[str, float]]]:
+    """
+    Espera o fim de um subprocess.Popen e o recolhe com os.wait4; retorna
+    (código de saída, uso final): rusage do processo (e dos filhos que ele
+    esperou) mais /proc/<pid>/io, lido antes de recolher o processo encerrado.
+    Uso None sem wait4 (Windows) ou se outra thread recolheu o processo antes.
+    Levanta subprocess.TimeoutExpired como Popen.wait.
+    """
+    if not (hasattr(os, "wait4") and hasattr(os, "waitid")) or proc.returncode is not None:
+        return proc.wait(timeout), None
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.0005
+    try:
+        # WNOWAIT: espera o fim sem recolher, para /proc/<pid> continuar legível
+        while os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT | (os.WNOHANG if deadline else 0)) is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(proc.args, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        io = _read_io(Path("/proc", str(proc.pid), "io"))
+        _, status, ru = os.wait4(proc.pid, 0)
+    except ChildProcessError:  # recolhido por proc.poll() de outra thread
+        return proc.wait(), None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, _rusage_usage(io, ru)
+
+
+def _rusage_usage(io: Dict[str, float], *rusages: Any) -> Dict[str, float]:
+    """Uso no formato de proc_usage a partir de rusages somadas e dos contadores de E/S."""
+    rss_unit = 1 / 1024 if sys.platform == "darwin" else 1  # macOS informa bytes; Linux, KiB
+    out: Dict[str, float] = {"cpu_user_s": sum(r.ru_utime for r in rusages),
+                             "cpu_sys_s": sum(r.ru_stime for r in rusages),
+                             "max_rss_kb": max(r.ru_maxrss for r in rusages) * rss_unit}
+    if not io:  # sem /proc: blocos de 512 bytes da rusage
+        io = {"read_bytes": sum(r.ru_inblock for r in rusages) * 512,
+              "write_bytes": sum(r.ru_oublock for r in rusages) * 512}
+    out.update(io)
+    return out
+
+
+def _read_io(path: Path) -> Dict[str, float]:
+    try:
+        lines = path.read_text().splitlines()
+    except OSError:
+        return {}
+    out = {}
+    for line in lines:
+        key, _, value = line.partition(":")
+        if key in _IO_KEYS:
+            out[key] = float(value)
+    return out
+
+
+class ResourceMeter:
+    """
+    Medição de um job: relógio desde a criação, amostras de /proc/<pid> (sample(),
+    chamado periodicamente pelo Worker) e o resumo final (finish()).
+    """
+
+    def __init__(self) -> None:
+        self.t0 = time.monotonic()
+        self.pid: Optional[int] = None
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, pid: Optional[int]) -> None:
+        self.pid = pid
+
+    def sample(self) -> None:
+        if self.pid is None:
+            return
+        usage = proc_usage(self.pid)
+        if usage:
+            with self._lock:
+                # contadores só crescem: o máximo protege de uma leitura do processo já zumbi
+                self._last = {k: max(v, self._last.get(k, 0)) for k, v in usage.items()}
+
+    def finish(self, final: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Resumo do job; final = números exatos informados pelo próprio processo, se
+        houver. Sem eles, vale a última amostra: o processo já foi recolhido e o
+        pid pode ter sido reaproveitado, então não é lido de novo.
+        """
+        with self._lock:
+            usage = dict(final or self._last)
+        return summarize(time.monotonic() - self.t0, usage, exact=final is not None)
+
+
+def summarize(wall_s: float, usage: Dict[str, float], *, exact: bool) -> Dict[str, Any]:
+    """Campo 'resources' a partir do tempo de relógio e do uso bruto (ver docstring do módulo)."""
+    out: Dict[str, Any] = {"wall_s": round(wall_s, 3)}
+    if "cpu_user_s" in usage:
+        out["cpu_user_s"] = round(usage["cpu_user_s"], 3)
+        out["cpu_sys_s"] = round(usage["cpu_sys_s"], 3)
+        if wall_s > 0:
+            out["cpu_pct"] = round((usage["cpu_user_s"] + usage["cpu_sys_s"]) / wall_s * 100, 1)
+    if usage.get("max_rss_kb"):
+        out["max_rss_mb"] = round(usage["max_rss_kb"] / 1024, 1)
+    for k in ("read_bytes", "write_bytes", "rchar", "wchar"):
+        if k in usage:
+            out[k] = int(usage[k])
+    if wall_s > 0:
+        for logical, disk, rate in (("rchar", "read_bytes", "read_mb_s"), ("wchar", "write_bytes", "write_mb_s")):
+            n = out.get(logical, out.get(disk))
+            if n is not None:
+                out[rate] = round(n / 1e6 / wall_s, 2)
+    out["exact"] = exact
+    return out
+
+
+def describe(res: Optional[Dict[str, Any]]) -> str:
+    """
+    Linha curta para o log, ex.:
+    '812.4 s, CPU 135.4 s (16.7%), pico 58.2 MB, lidos 52.6 GB (64.8 MB/s; 52.6 GB do disco)'.
+    """
+    if not res:
+        return ""
+    parts = [f"{res['wall_s']:.1f} s"]
+    if "cpu_pct" in res:
+        parts.append(f"CPU {res['cpu_user_s'] + res['cpu_sys_s']:.1f} s ({res['cpu_pct']:g}%)")
+    if "max_rss_mb" in res:
+        parts.append(f"pico {res['max_rss_mb']:g} MB")
+    for logical, disk, label, rate in (("rchar", "read_bytes", "lidos", "read_mb_s"),
+                                       ("wchar", "write_bytes", "gravados", "write_mb_s")):
+        n = res.get(logical, res.get(disk))
+        if not n:
+            continue
+        extra = [f"{res[rate]:.1f} MB/s"] if rate in res else []
+        if logical in res and disk in res:
+            extra.append(f"{_human(res[disk])} do disco")
+        parts.append(f"{label} {_human(n)}" + (f" ({'; '.join(extra)})" if extra else ""))
+    return ", ".join(parts) + ("" if res.get("exact") else " (amostrado)")
+
+
+def _human(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1000:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1000
+    return f"{n:.1f} TB"
+
+
+def resource_stats(jobstore: Any, *, job_type: Optional[str] = None, status: Optional[str] = "done",
+                   since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Agregados de 'resources' por job_type, nos jobs com esse status terminados
+    entre since e until (prefixos ISO em UTC, ex.: "2025-06-01"):
+      {tipo: {"jobs": n, "wall_s": {"total", "mean", "p50", "p95", "max"}, "cpu_pct": {...}, ...}}
+    Para comparar períodos (regressões), chame com intervalos diferentes.
+    """
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    for job in jobstore.list_jobs(status, job_type=job_type, include_params=False):
+        res = job.get("resources")
+        ended = str(job.get("updated_at") or "")
+        if not res or (since and ended < since) or (until and ended >= until):
+            continue
+        by_metric = samples.setdefault(job["job_type"], {})
+        by_metric.setdefault("_jobs", []).append(1)
+        for m in METRICS:
+            if isinstance(res.get(m), (int, float)):
+                by_metric.setdefault(m, []).append(float(res[m]))
+    out: Dict[str, Dict[str, Any]] = {}
+    for jtype, by_metric in sorted(samples.items()):
+        entry: Dict[str, Any] = {"jobs": len(by_metric.pop("_jobs"))}
+        for m, values in by_metric.items():
+            values.sort()
+            stats = {"mean": round(sum(values) / len(values), 3), "p50": _percentile(values, 50),
+                     "p95": _percentile(values, 95), "max": values[-1]}
+            if m in TOTAL_METRICS:
+                stats["total"] = round(sum(values), 3)
+            entry[m] = stats
+        out[jtype] = entry
+    return out
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Percentil por vizinho mais próximo de uma lista já ordenada."""
+    k = math.ceil(pct / 100 * len(values)) - 1
+    return values[max(0, min(len(values) - 1, k))]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.jobstore import open_jobstore
+
+    ap = argparse.ArgumentParser(description="Uso de recursos dos jobs, agregado por tipo.")
+    ap.add_argument("--config", default="preservacao_app.json", help="Configuração do app (JSON).")
+    ap.add_argument("--tipo", default=None, help="Só este job_type.")
+    ap.add_argument("--status", default="done", help="Status dos jobs considerados (padrão: done; 'todos' = qualquer).")
+    ap.add_argument("--desde", default=None, help="Jobs terminados a partir desta data/hora UTC (AAAA-MM-DD[THH:MM]).")
+    ap.add_argument("--ate", default=None, help="Jobs terminados antes desta data/hora UTC.")
+    ap.add_argument("--json", action="store_true", help="Saída em JSON com todas as métricas.")
+    args = ap.parse_args(argv)
+
+    try:
+        cfg = AppConfig.from_env(AppConfig.from_file(args.config))
+        stats = resource_stats(open_jobstore(cfg), job_type=args.tipo,
+                               status=None if args.status == "todos" else args.status,
+                               since=args.desde, until=args.ate)
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return 0
+    print(f"{'tipo':22} {'jobs':>5} {'tempo p50':>10} {'tempo p95':>10} {'CPU% p50':>9} "
+          f"{'RSS p95':>9} {'lidos':>10} {'MB/s p50':>9}")
+    for jtype, s in stats.items():
+        def get(m: str, k: str, default: float = 0.0) -> float:
+            return (s.get(m) or {}).get(k, default)
+        print(f"{jtype:22} {s['jobs']:>5} {get('wall_s', 'p50'):>9.1f}s {get('wall_s', 'p95'):>9.1f}s "
+              f"{get('cpu_pct', 'p50'):>9.1f} {get('max_rss_mb', 'p95'):>6.1f} MB "
+              f"{_human(get('rchar', 'total', get('read_bytes', 'total'))):>10} "
+              f"{get('read_mb_s', 'p50'):>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
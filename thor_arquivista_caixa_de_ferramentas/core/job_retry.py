@@ -0,0 +1,113 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_retry.py
+"""
+Políticas de nova tentativa automática por tipo de job (cfg.job_retry).
+
+Cada política diz quantas execuções um job pode ter, quais falhas são
+transitórias (códigos de saída e/ou expressões regulares procuradas no fim do
+stderr) e quanto esperar entre tentativas: backoff exponencial com jitter,
+para que muitos jobs que falharam juntos (ex.: compartilhamento NFS/SMB fora
+do ar) não voltem todos no mesmo instante.
+
+  "job_retry": {
+    "REPLICATE": {"max_attempts": 5, "backoff_s": 30, "max_backoff_s": 1800,
+                  "exit_codes": [5], "patterns": ["Stale file handle", "Input/output error"]},
+    "*": {"max_attempts": 3, "patterns": ["Connection (reset|timed out)"]}
+  }
+
+A chave "*" vale para os tipos sem política própria. Sem exit_codes nem
+patterns, qualquer erro é considerado transitório. Cancelamentos nunca são
+repetidos; tempo limite só com "retry_timeout": true.
+"""
+from __future__ import annotations
+
+import random
+import re
+from typing import Any, Dict, Iterable, Optional
+
+_KEYS = {"max_attempts", "backoff_s", "backoff_factor", "max_backoff_s", "jitter",
+         "exit_codes", "patterns", "retry_timeout"}
+
+
+class RetryPolicy:
+    """Política de novas tentativas de um tipo de job (ver docstring do módulo)."""
+
+    def __init__(self, max_attempts: int = 3, backoff_s: float = 30.0, backoff_factor: float = 2.0,
+                 max_backoff_s: float = 3600.0, jitter: float = 0.5,
+                 exit_codes: Iterable[int] = (), patterns: Iterable[str] = (),
+                 retry_timeout: bool = False):
+        if int(max_attempts) < 1:
+            raise ValueError("max_attempts deve ser >= 1")
+        if float(backoff_s) < 0 or float(max_backoff_s) < 0 or float(backoff_factor) < 1:
+            raise ValueError("backoff inválido: backoff_s/max_backoff_s >= 0 e backoff_factor >= 1")
+        if not 0 <= float(jitter) <= 1:
+            raise ValueError("jitter deve estar entre 0 e 1")
+        self.max_attempts = int(max_attempts)
+        self.backoff_s = float(backoff_s)
+        self.backoff_factor = float(backoff_factor)
+        self.max_backoff_s = float(max_backoff_s)
+        self.jitter = float(jitter)
+        self.exit_codes = frozenset(int(c) for c in exit_codes)
+        try:
+            self.patterns = [re.compile(p) for p in patterns]
+        except re.error as e:
+            raise ValueError(f"padrão de nova tentativa inválido: {e}") from e
+        self.retry_timeout = bool(retry_timeout)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RetryPolicy":
+        unknown = set(data) - _KEYS
+        if unknown:
+            raise ValueError(f"chave(s) desconhecida(s) na política de nova tentativa: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+    def is_transient(self, status: str, rc: Optional[int], error: str) -> bool:
+        """A falha (status 'error' ou 'timeout', código de saída, fim do stderr) merece nova tentativa?"""
+        if status == "timeout":
+            return self.retry_timeout
+        if status != "error":
+            return False
+        if not self.exit_codes and not self.patterns:
+            return True
+        if rc is not None and rc in self.exit_codes:
+            return True
+        return any(p.search(error or "") for p in self.patterns)
+
+    def should_retry(self, attempt: int, status: str, rc: Optional[int], error: str) -> bool:
+        return attempt < self.max_attempts and self.is_transient(status, rc, error)
+
+    def delay(self, attempt: int) -> float:
+        """
+        Espera antes da tentativa attempt + 1: backoff_s * backoff_factor^(attempt-1),
+        limitada a max_backoff_s, com até 'jitter' (fração) sorteada para menos.
+        """
+        base = min(self.max_backoff_s, self.backoff_s * self.backoff_factor ** max(0, attempt - 1))
+        return base * (1.0 - self.jitter * random.random())
+
+
+def retry_policies(conf: Optional[Dict[str, Any]]) -> Dict[str, RetryPolicy]:
+    """{job_type | "*": RetryPolicy} a partir de cfg.job_retry; ValueError se inválido."""
+    out: Dict[str, RetryPolicy] = {}
+    for jtype, data in (conf or {}).items():
+        if not isinstance(data, dict):
+            raise ValueError(f"job_retry[{jtype!r}] deve ser um objeto")
+        try:
+            out[jtype] = RetryPolicy.from_dict(data)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"job_retry[{jtype!r}]: {e}") from e
+    return out
@@ -0,0 +1,359 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_schedule.py
+"""
+Agendamentos recorrentes (estilo cron) guardados no JobStore: auditorias de
+fixidez, sincronização de réplicas etc. entram na fila sozinhos, de
+preferência nas janelas de menor uso.
+
+  {"name": "fixidez semanal", "job_type": "VERIFY_FIXITY",
+   "params": {"raiz": "/acervo", "manifesto": "/acervo/manifest.sha256"},
+   "cron": "0 2 * * 6",                 # ou "interval_s": 86400
+   "windows": [{"from": "22:00", "to": "06:00", "days": [0, 1, 2, 3, 4, 5, 6]}],
+   "catch_up": "once", "overlap": "skip", "priority": 5}
+
+- cron: minuto hora dia mês dia-da-semana, no horário local (*, a-b, */n,
+  a-b/n, listas; nomes jan..dec e sun..sat; 0 ou 7 = domingo; @hourly,
+  @daily, @weekly, @monthly, @yearly). Com dia e dia-da-semana restritos,
+  basta um dos dois coincidir, como no cron;
+- interval_s: alternativa ao cron, a cada N segundos (a primeira execução
+  ocorre um intervalo após a criação);
+- windows: janelas de horário permitidas, no formato de job_io (from/to HH:MM,
+  from > to atravessa a meia-noite; days: 0 = segunda ... 6 = domingo). Uma
+  execução prevista fora delas é adiada para a abertura da próxima janela;
+  várias adiadas para a mesma abertura viram uma só;
+- catch_up: o que fazer com execuções perdidas (worker parado):
+  "once" (padrão) enfileira uma só; "skip" descarta as perdidas (roda só se a
+  mais recente atrasou até MISFIRE_GRACE_S); "all" enfileira todas (até
+  MAX_CATCH_UP), encadeadas por depends_on salvo com overlap "allow";
+- overlap: se a execução anterior ainda está na fila ou rodando: "skip"
+  (padrão) pula esta; "delay" espera a anterior terminar e então enfileira;
+  "allow" enfileira mesmo assim.
+
+O Worker chama run_due() periodicamente. Vários workers na mesma fila não
+duplicam execuções: JobStore.fire_schedule só enfileira se next_run ainda for
+o previsto (compare-and-set) e grava o próximo na mesma operação.
+
+Uso via linha de comando:
+  python -m core.job_schedule add agendamento.json [--config preservacao_app.json]
+  python -m core.job_schedule list | enable ID | disable ID | rm ID
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import AppConfig
+from core.job_import import validate_jobs
+from core.jobstore import ISO
+
+CATCH_UP = ("once", "skip", "all")
+OVERLAP = ("skip", "delay", "allow")
+ACTIVE = ("pending", "waiting", "running")
+MISFIRE_GRACE_S = 300   # atraso tolerado antes de uma execução contar como perdida
+MAX_CATCH_UP = 100      # execuções perdidas enfileiradas de uma vez com catch_up "all"
+
+# chaves da definição; as demais (next_run, last_run...) são estado, mantidas pelo JobStore
+SPEC_KEYS = ("name", "job_type", "params", "priority", "cron", "interval_s", "windows", "catch_up", "overlap")
+
+_ALIASES = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@midnight": "0 0 * * *", "@weekly": "0 0 * * 0",
+            "@monthly": "0 0 1 * *", "@yearly": "0 0 1 1 *", "@annually": "0 0 1 1 *"}
+_MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun",
+                                       "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_DOWS = {d: i for i, d in enumerate(("sun", "mon", "tue", "wed", "thu", "fri", "sat"))}
+_FIELDS = (("minuto", 0, 59, {}), ("hora", 0, 23, {}), ("dia", 1, 31, {}),
+           ("mês", 1, 12, _MONTHS), ("dia da semana", 0, 7, _DOWS))
+_WINDOW_KEYS = {"from", "to", "days"}
+_HHMM = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d$")
+
+
+class CronExpr:
+    """Expressão cron de 5 campos (ver docstring do módulo)."""
+
+    def __init__(self, expr: str):
+        self.expr = str(expr).strip()
+        fields = _ALIASES.get(self.expr.lower(), self.expr).split()
+        if len(fields) != 5:
+            raise ValueError(f"expressão cron inválida: {expr!r} (5 campos: minuto hora dia mês dia-da-semana)")
+        parsed = [_parse_field(f, *spec) for f, spec in zip(fields, _FIELDS)]
+        self.minutes, self.hours = sorted(parsed[0]), sorted(parsed[1])
+        self.days, self.months = parsed[2], parsed[3]
+        self.dows = frozenset(d % 7 for d in parsed[4])
+        self._any_day, self._any_dow = fields[2] == "*", fields[4] == "*"
+        self.next_after(datetime.now())  # ex.: "0 0 31 2 *" nunca ocorre
+
+    def next_after(self, t: datetime) -> datetime:
+        """Primeira ocorrência estritamente depois de t (datetimes locais, sem fuso)."""
+        t = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        for _ in range(366 * 8):
+            if t.month in self.months and self._day_ok(t):
+                for h in self.hours:
+                    if h < t.hour:
+                        continue
+                    for m in self.minutes:
+                        if h == t.hour and m < t.minute:
+                            continue
+                        return t.replace(hour=h, minute=m)
+            t = (t + timedelta(days=1)).replace(hour=0, minute=0)
+        raise ValueError(f"expressão cron sem ocorrência: {self.expr!r}")
+
+    def _day_ok(self, t: datetime) -> bool:
+        dom = t.day in self.days
+        dow = (t.weekday() + 1) % 7 in self.dows  # cron: 0 = domingo
+        if self._any_day or self._any_dow:
+            return dom and dow
+        return dom or dow
+
+
+def _parse_field(text: str, label: str, lo: int, hi: int, names: Dict[str, int]) -> frozenset:
+    def value(v: str) -> int:
+        v = v.strip().lower()
+        n = names.get(v[:3]) if v[:3] in names else (int(v) if v.isdigit() else None)
+        if n is None or not lo <= n <= hi:
+            raise ValueError(f"cron: {label} inválido: {text!r} (de {lo} a {hi})")
+        return n
+
+    out = set()
+    for part in text.split(","):
+        rng, _, step = part.partition("/")
+        if step and (not step.isdigit() or int(step) < 1):
+            raise ValueError(f"cron: passo inválido em {label}: {text!r}")
+        if rng == "*":
+            a, b = lo, hi
+        elif "-" in rng:
+            a, b = (value(x) for x in rng.split("-", 1))
+        else:
+            a = b = value(rng)
+            if step:
+                b = hi  # "5/15" = de 5 em diante, de 15 em 15
+        if a > b:
+            raise ValueError(f"cron: intervalo invertido em {label}: {text!r}")
+        out.update(range(a, b + 1, int(step or 1)))
+    return frozenset(out)
+
+
+def _parse_window(w: Any) -> Tuple[int, int, Optional[frozenset]]:
+    if not isinstance(w, dict) or set(w) - _WINDOW_KEYS:
+        raise ValueError(f"janela inválida: {w!r} (chaves: from, to, days)")
+    for k in ("from", "to"):
+        if not _HHMM.match(str(w.get(k, ""))):
+            raise ValueError(f"janela inválida: '{k}' deve ser HH:MM ({w!r})")
+    days = w.get("days")
+    if days is not None and (not isinstance(days, list) or not all(isinstance(d, int) and 0 <= d <= 6 for d in days)):
+        raise ValueError(f"janela inválida: 'days' deve ser uma lista de 0 (segunda) a 6 (domingo) ({w!r})")
+    start, end = (int(w[k][:-3]) * 60 + int(w[k][-2:]) for k in ("from", "to"))
+    return start, end, frozenset(days) if days is not None else None
+
+
+class Schedule:
+    """Definição de um agendamento (ver docstring do módulo); next_due calcula as ocorrências."""
+
+    def __init__(self, job_type: str, params: Optional[Dict[str, Any]] = None, *, name: str = "",
+                 priority: int = 0, cron: Optional[str] = None, interval_s: float = 0,
+                 windows: Optional[List[Dict[str, Any]]] = None, catch_up: str = "once", overlap: str = "skip"):
+        if bool(cron) == bool(interval_s):
+            raise ValueError("informe 'cron' ou 'interval_s' (apenas um)")
+        if interval_s and float(interval_s) < 60:
+            raise ValueError("interval_s deve ser de pelo menos 60 segundos")
+        if catch_up not in CATCH_UP:
+            raise ValueError(f"catch_up inválido: {catch_up!r} (use {', '.join(CATCH_UP)})")
+        if overlap not in OVERLAP:
+            raise ValueError(f"overlap inválido: {overlap!r} (use {', '.join(OVERLAP)})")
+        if not isinstance(params or {}, dict):
+            raise ValueError("'params' deve ser um objeto")
+        self.job_type = str(job_type)
+        self.params = dict(params or {})
+        self.name = str(name or job_type)
+        self.priority = int(priority or 0)
+        self.cron = CronExpr(cron) if cron else None
+        self.interval_s = float(interval_s or 0)
+        self.windows = list(windows or [])
+        self._windows = [_parse_window(w) for w in self.windows]
+        self.catch_up = catch_up
+        self.overlap = overlap
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Schedule":
+        """Definição a partir de um dict (chaves de estado do JobStore são ignoradas)."""
+        if not isinstance(data, dict) or not data.get("job_type"):
+            raise ValueError("agendamento sem 'job_type'")
+        spec = {k: data[k] for k in SPEC_KEYS if data.get(k) is not None}
+        return cls(spec.pop("job_type"), spec.pop("params", None), **spec)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "job_type": self.job_type, "params": self.params, "priority": self.priority,
+                "cron": self.cron.expr if self.cron else None, "interval_s": self.interval_s or None,
+                "windows": self.windows, "catch_up": self.catch_up, "overlap": self.overlap}
+
+    def next_due(self, after: datetime) -> datetime:
+        """Próxima ocorrência depois de 'after', já adiada para dentro das janelas."""
+        t = self.cron.next_after(after) if self.cron else after + timedelta(seconds=self.interval_s)
+        return self._in_window(t)
+
+    def plan(self, due: datetime, now: datetime) -> Tuple[int, datetime]:
+        """
+        Para uma ocorrência prevista em 'due' (<= now): quantas execuções
+        enfileirar agora (catch_up) e a próxima ocorrência depois de now.
+        """
+        missed = [due]
+        t = self.next_due(due)
+        while t <= now:
+            if len(missed) <= MAX_CATCH_UP:
+                missed.append(t)
+            t = self.next_due(t)
+        if self.catch_up == "all":
+            return min(len(missed), MAX_CATCH_UP), t
+        if self.catch_up == "skip" and (now - missed[-1]).total_seconds() > MISFIRE_GRACE_S:
+            return 0, t
+        return 1, t
+
+    def _in_window(self, t: datetime) -> datetime:
+        """t, se estiver numa janela permitida; senão, a abertura da próxima."""
+        if not self._windows or self._inside(t):
+            return t
+        day = t.replace(hour=0, minute=0, second=0, microsecond=0)
+        candidates = []
+        for d in range(8):
+            base = day + timedelta(days=d)
+            candidates += [base] + [base + timedelta(minutes=start) for start, _, _ in self._windows]
+        return min(c for c in candidates if c > t and self._inside(c))
+
+    def _inside(self, t: datetime) -> bool:
+        minute = t.hour * 60 + t.minute
+        for start, end, days in self._windows:
+            if days is not None and t.weekday() not in days:
+                continue
+            if (start <= minute < end) if start <= end else (minute >= start or minute < end):
+                return True
+        return False
+
+
+def to_iso(t: datetime) -> str:
+    """Datetime local (sem fuso) -> instante UTC no formato do JobStore."""
+    return t.astimezone(timezone.utc).strftime(ISO)
+
+
+def from_iso(s: str) -> datetime:
+    """Instante UTC do JobStore -> datetime local (sem fuso)."""
+    return datetime.strptime(s, ISO).replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def new_schedule(data: Dict[str, Any], cfg: AppConfig) -> Tuple[Dict[str, Any], str]:
+    """
+    Valida uma definição (inclusive os parâmetros do job, como na importação) e
+    devolve (definição normalizada, next_run) para JobStore.add_schedule.
+    """
+    sched = Schedule.from_dict(data)
+    try:
+        validate_jobs([{"job_type": sched.job_type, "params": sched.params}], cfg)
+    except ValueError as e:
+        raise ValueError(str(e).replace("item 1", "agendamento", 1)) from e
+    return sched.to_dict(), to_iso(sched.next_due(datetime.now()))
+
+
+def set_enabled(jobstore: Any, schedule_id: str, enabled: bool) -> bool:
+    """
+    Ativa/desativa um agendamento. Ao reativar, ele recomeça da próxima
+    ocorrência, sem recuperar o período inativo. False se não existe.
+    """
+    sched = jobstore.get_schedule(schedule_id)
+    if sched is None:
+        return False
+    fields: Dict[str, Any] = {"enabled": enabled, "error": None}
+    if enabled:
+        fields["next_run"] = to_iso(Schedule.from_dict(sched).next_due(datetime.now()))
+    return jobstore.update_schedule(schedule_id, **fields)
+
+
+def run_due(jobstore: Any, now: Optional[datetime] = None) -> List[Tuple[Dict[str, Any], List[str]]]:
+    """
+    Enfileira as execuções vencidas (chamado pelo Worker). Retorna
+    [(agendamento, ids enfileirados)] dos que dispararam ou foram pulados.
+    """
+    now = now or datetime.now()
+    now_iso = to_iso(now)
+    out = []
+    for s in jobstore.list_schedules():
+        if not s.get("enabled") or not s.get("next_run") or s["next_run"] > now_iso:
+            continue
+        try:
+            sched = Schedule.from_dict(s)
+        except ValueError as e:
+            jobstore.update_schedule(s["_id"], enabled=False, error=f"definição inválida: {e}")
+            continue
+        prev = jobstore.get_job(s["last_job_id"]) if s.get("last_job_id") else None
+        busy = prev is not None and prev.get("status") in ACTIVE
+        if busy and sched.overlap == "delay":
+            continue  # tenta de novo quando a execução anterior terminar
+        runs, nxt = sched.plan(from_iso(s["next_run"]), now)
+        if busy and sched.overlap == "skip":
+            runs = 0
+        chain = sched.overlap != "allow"
+        specs = [{"job_type": sched.job_type, "params": sched.params, "priority": sched.priority,
+                  "depends_on": [i - 1] if i and chain else []}
+                 for i in range(runs)]
+        ids = jobstore.fire_schedule(s["_id"], s["next_run"], to_iso(nxt), specs)
+        if ids is None:
+            continue  # outro worker disparou esta ocorrência
+        jobstore.add_logs([(jid, f"Enfileirado {sched.job_type} pelo agendamento '{sched.name}' "
+                                 f"(previsto para {from_iso(s['next_run']):%Y-%m-%d %H:%M})") for jid in ids])
+        out.append((s, ids))
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.jobstore import open_jobstore
+
+    ap = argparse.ArgumentParser(description="Agendamentos recorrentes da fila de jobs.")
+    ap.add_argument("--config", default="preservacao_app.json", help="Configuração do app (JSON).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("add", help="Cria um agendamento a partir de um arquivo JSON.").add_argument("arquivo")
+    sub.add_parser("list", help="Lista os agendamentos.")
+    for cmd in ("enable", "disable", "rm"):
+        sub.add_parser(cmd).add_argument("id")
+    args = ap.parse_args(argv)
+
+    try:
+        cfg = AppConfig.from_env(AppConfig.from_file(args.config))
+        store = open_jobstore(cfg)
+        if args.cmd == "add":
+            spec, next_run = new_schedule(json.loads(Path(args.arquivo).read_text(encoding="utf-8")), cfg)
+            sid = store.add_schedule(spec, next_run)
+            print(f"{sid}  próxima execução: {from_iso(next_run):%Y-%m-%d %H:%M}")
+        elif args.cmd == "list":
+            for s in store.list_schedules():
+                when = f"{from_iso(s['next_run']):%Y-%m-%d %H:%M}" if s.get("next_run") else "-"
+                state = "ativo" if s.get("enabled") else "inativo"
+                rule = s.get("cron") or f"a cada {s.get('interval_s'):g} s"
+                error = f"  [{s['error']}]" if s.get("error") else ""
+                print(f"{s['_id']}  {state:8} {when}  {s.get('name')} ({s.get('job_type')}, {rule}){error}")
+        elif not (store.delete_schedule(args.id) if args.cmd == "rm"
+                  else set_enabled(store, args.id, args.cmd == "enable")):
+            raise ValueError(f"agendamento não encontrado: {args.id}")
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,216 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/job_shards.py
+"""
+Divisão automática de jobs grandes de HASH_MANIFEST e VERIFY_FIXITY em partes
+paralelas (cfg.job_shards).
+
+  "job_shards": {
+    "HASH_MANIFEST": {"max_shards": 8},
+    "VERIFY_FIXITY": {"max_shards": 8, "min_lines": 100000}
+  }
+
+- HASH_MANIFEST: por subárvore do primeiro nível da raiz. As pastas (e o
+  conjunto dos arquivos soltos na raiz) são repartidas em rodízio por até
+  max_shards partes; cada parte é um job HASH_MANIFEST com params subpastas /
+  arquivos_raiz que grava um manifesto parcial, com caminhos relativos à raiz;
+- VERIFY_FIXITY: por faixas de linhas do manifesto, com pelo menos min_lines
+  entradas por parte; cada parte verifica o seu pedaço e grava contagens e
+  listas em JSON (verify_fixity.py --resultado-json).
+
+O job original fica 'waiting', dependendo das partes (JobStore.split_job), que
+são jobs comuns da fila: rodam em paralelo em qualquer vaga ou máquina. Quando
+todas concluem, ele volta a 'pending' e, na nova execução, o Worker roda
+scripts/merge_shards.py, que junta as partes na mesma saída do script original
+(manifesto ordenado pelo caminho; relatório e código de saída de fixidez). Uma
+parte que falha cancela a junção como qualquer dependência; só ela precisa ser
+reenfileirada (ou volta sozinha, com cfg.job_retry), e a junção volta a esperar.
+
+params "shards": N sobrepõe max_shards num job (0 ou 1 = não dividir), mesmo
+para um tipo ausente de cfg.job_shards. As partes ficam numa pasta de trabalho
+ao lado da saída (HASH_MANIFEST) ou do manifesto (VERIFY_FIXITY) — visível a
+todas as máquinas que veem a saída —, apagada pela junção.
+"""
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+SHARDABLE = ("HASH_MANIFEST", "VERIFY_FIXITY")
+MERGE_SCRIPT = "merge_shards.py"
+
+_KEYS = {"max_shards", "min_lines"}
+
+
+class ShardPolicy:
+    """Divisão de um tipo de job (ver docstring do módulo)."""
+
+    def __init__(self, max_shards: int = 8, min_lines: int = 100000):
+        if int(max_shards) < 0:
+            raise ValueError("max_shards não pode ser negativo")
+        if int(min_lines) < 1:
+            raise ValueError("min_lines deve ser >= 1")
+        self.max_shards = int(max_shards)
+        self.min_lines = int(min_lines)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ShardPolicy":
+        unknown = set(data) - _KEYS
+        if unknown:
+            raise ValueError(f"chave(s) desconhecida(s) na política de divisão: {', '.join(sorted(unknown))}")
+        return cls(**data)
+
+
+def shard_policies(conf: Optional[Dict[str, Any]]) -> Dict[str, ShardPolicy]:
+    """{job_type: ShardPolicy} a partir de cfg.job_shards; ValueError se inválido."""
+    out: Dict[str, ShardPolicy] = {}
+    for jtype, data in (conf or {}).items():
+        if jtype not in SHARDABLE:
+            raise ValueError(f"job_shards[{jtype!r}]: tipo não divisível (use {', '.join(SHARDABLE)})")
+        if not isinstance(data, dict):
+            raise ValueError(f"job_shards[{jtype!r}] deve ser um objeto")
+        try:
+            out[jtype] = ShardPolicy.from_dict(data)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"job_shards[{jtype!r}]: {e}") from e
+    return out
+
+
+def plan_shards(job: Dict[str, Any], policy: Optional[ShardPolicy]) -> Optional[Tuple[List[Dict[str, Any]],
+                                                                                       Dict[str, Any]]]:
+    """
+    (itens para JobStore.split_job, info da divisão) ou None se o job não deve
+    ser dividido (parte de outro job, tipo sem política, pequeno demais).
+    Grava na pasta de trabalho o que as partes precisam (manifestos parciais
+    de VERIFY_FIXITY).
+    """
+    params = job.get("params") or {}
+    jtype = job.get("job_type")
+    if jtype not in SHARDABLE or params.get("shard_of"):
+        return None
+    if params.get("shards") is not None:
+        policy = ShardPolicy(int(params["shards"] or 0), policy.min_lines if policy else 100000)
+    if policy is None or policy.max_shards < 2:
+        return None
+    if jtype == "HASH_MANIFEST":
+        return _plan_hash(job, policy)
+    return _plan_fixity(job, policy)
+
+
+def merge_command(job: Dict[str, Any]) -> Optional[Tuple[str, List[str]]]:
+    """
+    (script, argv) da junção, se o job já foi dividido e todas as partes estão
+    prontas; None = executar (ou dividir) normalmente — por exemplo, um job
+    reenfileirado depois de uma junção concluída, cuja pasta de trabalho já
+    foi apagada, é dividido de novo.
+    """
+    info = job.get("shards") or {}
+    parts = info.get("parts") or []
+    if not parts or not all(os.path.isfile(p) for p in parts):
+        return None
+    p = job.get("params") or {}
+    if job.get("job_type") == "HASH_MANIFEST":
+        args = ["manifesto", "--saida", p["saida"]]
+    else:
+        args = ["fixidez", "--raiz", p["raiz"], "--manifesto", p["manifesto"],
+                *(["--report-extras"] if p.get("report_extras") else [])]
+    return MERGE_SCRIPT, [*args, "--partes", *parts, "--limpar", info["work"]]
+
+
+def _work_dir(base: str, job_id: str) -> Path:
+    work = Path(f"{base}.shards-{job_id[:8]}")
+    shutil.rmtree(work, ignore_errors=True)  # sobra de uma divisão anterior deste job
+    work.mkdir(parents=True)
+    return work
+
+
+def _shard_params(params: Dict[str, Any], job_id: str, **extra: Any) -> Dict[str, Any]:
+    out = {k: v for k, v in params.items() if k != "shards"}
+    out.update(extra, shard_of=job_id)
+    return out
+
+
+def _plan_hash(job: Dict[str, Any], policy: ShardPolicy):
+    params = job["params"]
+    raiz = Path(params["raiz"])
+    hidden_ok = not params.get("ignore_hidden")
+    dirs: List[str] = []
+    loose = False
+    with os.scandir(raiz) as it:
+        for e in it:
+            if not hidden_ok and e.name.startswith("."):
+                continue
+            if e.is_dir():
+                if not e.is_symlink():  # hash_files.py não desce em links (os.walk sem followlinks)
+                    dirs.append(e.name)
+            else:
+                loose = True
+    units: List[Optional[str]] = ([None] if loose else []) + sorted(dirs)  # None = arquivos soltos
+    n = min(policy.max_shards, len(units))
+    if n < 2:
+        return None
+    work = _work_dir(params["saida"], job["_id"])
+    specs, parts = [], []
+    for i in range(n):
+        group = units[i::n]
+        out = (work / f"parte-{i:03d}.txt").as_posix()
+        parts.append(out)
+        specs.append({
+            "job_type": "HASH_MANIFEST",
+            "priority": job.get("priority") or 0,
+            "params": _shard_params(params, job["_id"], saida=out, subpastas=[u for u in group if u is not None],
+                                    arquivos_raiz=None in group),
+        })
+    return specs, {"work": work.as_posix(), "parts": parts, "by": "subpasta"}
+
+
+def _manifest_lines(path: Path):
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip() and not line.lstrip().startswith("#"):
+                yield line if line.endswith("\n") else line + "\n"
+
+
+def _plan_fixity(job: Dict[str, Any], policy: ShardPolicy):
+    params = job["params"]
+    mani = Path(params["manifesto"])
+    total = sum(1 for _ in _manifest_lines(mani))
+    n = min(policy.max_shards, total // policy.min_lines)
+    if n < 2:
+        return None
+    per = -(-total // n)
+    work = _work_dir(params["manifesto"], job["_id"])
+    specs, parts = [], []
+    lines = _manifest_lines(mani)
+    for i in range(n):
+        # mesmo nome do manifesto original: verify_fixity.py infere o algoritmo dele
+        part_mani = work / f"parte-{i:03d}" / mani.name
+        part_mani.parent.mkdir()
+        with part_mani.open("w", encoding="utf-8", newline="\n") as out:
+            for _, line in zip(range(per), lines):
+                out.write(line)
+        result = (work / f"parte-{i:03d}.json").as_posix()
+        parts.append(result)
+        specs.append({
+            "job_type": "VERIFY_FIXITY",
+            "priority": job.get("priority") or 0,
+            "params": _shard_params({k: v for k, v in params.items() if k != "report_extras"}, job["_id"],
+                                    manifesto=part_mani.as_posix(), resultado_json=result),
+        })
+    return specs, {"work": work.as_posix(), "parts": parts, "by": "linhas", "lines": total}
@@ -16,187 +16,1304 @@
 
 from __future__ import annotations
 
+import heapq
 import json
+import os
+import socket
+import time
 import uuid
 import threading
+from collections import deque
+from itertools import count, islice
 from pathlib import Path
-from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from core.job_archive import JobArchive
+from core.job_output import JobOutput
 
 
 ISO = "%Y-%m-%dT%H:%M:%S.%fZ"
 
+STATUSES = ("pending", "waiting", "running", "done", "error", "canceled", "timeout")
+FINISHED = ("done", "error", "canceled", "timeout")  # status finais (retenção/arquivo morto)
+FAILED = ("error", "canceled", "timeout")  # finais sem sucesso: cancelam os dependentes (depends_on)
+# estado de um agendamento (core.job_schedule) mantido pelo JobStore, além da definição
+SCHEDULE_STATE = ("enabled", "next_run", "last_run", "last_job_id", "last_skipped_at", "error")
+
+# pendentes copiados por vez para o accept de claim_next, avaliado fora dos locks de escrita
+CLAIM_PEEK = 32
+
+# extensões de jobstore_path que selecionam o backend SQLite automaticamente
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).strftime(ISO)
 
 
+def _norm_level(level: str) -> str:
+    level = str(level or "INFO").upper()
+    return level if level in ("INFO", "ERROR", "WARN", "WARNING", "DEBUG") else "INFO"
+
+
+def _iso_in(seconds: float) -> str:
+    """Instante UTC daqui a 'seconds' segundos (mesmo formato de _now_iso)."""
+    return (datetime.now(timezone.utc) + timedelta(seconds=seconds)).strftime(ISO)
+
+
+HOST = socket.gethostname()
+
+
+def _pid_alive(pid: int) -> bool:
+    """True se existe um processo com esse PID nesta máquina."""
+    if pid <= 0:
+        return False
+    if os.name == "nt":
+        import ctypes
+
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _orphan_reason(job: Dict[str, Any], stale_before: str) -> Optional[str]:
+    """
+    Motivo para recuperar um job 'running' cujo dono morreu, ou None:
+      - processo dono (owner_pid) nesta máquina não existe mais;
+      - job legado sem dono nem lease, parado desde antes de stale_before.
+    Donos em outras máquinas dependem do vencimento do lease.
+    """
+    pid = job.get("owner_pid")
+    if pid:
+        if job.get("owner_host") == HOST and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+            return f"processo {pid} em {HOST} encerrado"
+        return None
+    if not job.get("lease_expires_at") and (job.get("updated_at") or "") < stale_before:
+        return "job 'running' sem dono registrado"
+    return None
+
+
+def _retention_cutoffs(retention_days: Optional[Dict[str, float]]) -> Dict[str, str]:
+    """{status: dias} -> {status: instante ISO limite}; só status finais com dias > 0."""
+    out: Dict[str, str] = {}
+    for st, days in (retention_days or {}).items():
+        if st in FINISHED and days and float(days) > 0:
+            out[st] = _iso_in(-float(days) * 86400)
+    return out
+
+
+def _check_specs(specs: List[Dict[str, Any]]) -> List[int]:
+    """
+    Valida os itens de um lote antes de qualquer alteração na base (job_type
+    presente, priority inteira); retorna a prioridade de cada item. Lança ValueError.
+    """
+    priorities: List[int] = []
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not spec.get("job_type"):
+            raise ValueError(f"item {i + 1}: job_type ausente")
+        try:
+            priorities.append(int(spec.get("priority") or 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"item {i + 1}: priority inválida: {spec.get('priority')!r}") from None
+    return priorities
+
+
+def _resolve_depends_on(specs: List[Dict[str, Any]], ids: List[str],
+                        exists: Callable[[str], bool]) -> List[List[str]]:
+    """
+    depends_on de cada item de um lote -> lista de _id. Cada referência pode ser o
+    _id de um job já na base, o 'ref' de um item anterior do lote ou o índice
+    (int, base 0) de um item anterior. Só há referências para trás, então o grafo
+    é acíclico por construção. Lança ValueError se alguma não for encontrada.
+    """
+    refs: Dict[str, int] = {}
+    out: List[List[str]] = []
+    for i, spec in enumerate(specs):
+        raw = spec.get("depends_on") or ()
+        if isinstance(raw, (str, int)):
+            raw = [raw]
+        deps: List[str] = []
+        for d in raw:
+            if isinstance(d, int) and not isinstance(d, bool):
+                if not 0 <= d < i:
+                    raise ValueError(f"item {i + 1}: depends_on {d} não é um item anterior do lote")
+                deps.append(ids[d])
+            elif str(d) in refs:
+                deps.append(ids[refs[str(d)]])
+            elif exists(str(d)):
+                deps.append(str(d))
+            else:
+                raise ValueError(f"item {i + 1}: dependência desconhecida: {d!r}")
+        ref = spec.get("ref")
+        if ref not in (None, ""):
+            if str(ref) in refs:
+                raise ValueError(f"item {i + 1}: ref repetido no lote: {ref!r}")
+            refs[str(ref)] = i
+        out.append(list(dict.fromkeys(deps)))
+    return out
+
+
+def _deps_state(deps: Iterable[str], status_of: Callable[[str], Optional[str]]) -> tuple:
+    """
+    Status de um job com depends_on ao entrar (ou voltar) na fila:
+      ('pending', None)  todas as dependências concluíram ('done')
+      ('waiting', None)  alguma ainda não terminou
+      ('canceled', _id)  a dependência _id terminou sem sucesso (FAILED)
+    Dependência ausente da base (arquivada ou removida depois de propagar) conta como concluída.
+    """
+    waiting = False
+    for d in deps:
+        st = status_of(d)
+        if st is None or st == "done":
+            continue
+        if st in FAILED:
+            return "canceled", d
+        waiting = True
+    return ("waiting" if waiting else "pending"), None
+
+
+def _trim_marker(dropped: int, max_entries: int) -> Dict[str, str]:
+    """Entrada de log que substitui as linhas descartadas pelo limite por job."""
+    return {"ts": _now_iso(), "level": "WARN",
+            "msg": f"Log truncado: {dropped} entrada(s) antiga(s) descartada(s) (limite de {max_entries} por job)"}
+
+
+def _is_expired(job: Dict[str, Any], cutoffs: Dict[str, str]) -> bool:
+    cut = cutoffs.get(job.get("status"))
+    return bool(cut) and (job.get("updated_at") or "") < cut
+
+
+class _FileLock:
+    """
+    Lock exclusivo entre processos sobre um arquivo auxiliar (<jobs_db>.lock).
+    POSIX usa fcntl.lockf (funciona também em NFS); Windows usa msvcrt.locking.
+    Não é reentrante: cada aquisição deve ser liberada antes da próxima.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._fh = None
+
+    def acquire(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+                fh.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)  # bloqueia ~10 s por tentativa
+                        break
+                    except OSError:
+                        continue
+            else:
+                import fcntl
+                fcntl.lockf(fh, fcntl.LOCK_EX)
+        except BaseException:
+            fh.close()
+            raise
+        self._fh = fh
+
+    def release(self) -> None:
+        fh, self._fh = self._fh, None
+        if fh is None:
+            return
+        try:
+            if os.name == "nt":
+                import msvcrt
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.lockf(fh, fcntl.LOCK_UN)
+        finally:
+            fh.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+class _ChangeNotifier:
+    """
+    Contador de versão monotônico da base + espera por mudança.
+    No mesmo processo, quem grava chama bump() e acorda os que esperam
+    (threading.Condition). Entre processos, 'probe' devolve uma assinatura
+    barata da base (stat do arquivo, versão no banco), sondada a cada poll_s
+    enquanto alguém espera; se mudou, a versão avança.
+    """
+
+    def __init__(self, probe: Callable[[], Any], poll_s: float = 0.25):
+        self._probe = probe
+        self.poll_s = poll_s
+        self._cond = threading.Condition()
+        self._version = 0
+        self._seen: Any = None
+
+    def bump(self) -> None:
+        sig = self._probe()
+        with self._cond:
+            self._seen = sig
+            self._version += 1
+            self._cond.notify_all()
+
+    def current(self) -> int:
+        sig = self._probe()
+        with self._cond:
+            if sig != self._seen:
+                self._seen = sig
+                self._version += 1
+                self._cond.notify_all()
+            return self._version
+
+    def wait(self, since: Optional[int] = None, timeout: Optional[float] = None) -> int:
+        deadline = None if timeout is None else time.monotonic() + max(0.0, timeout)
+        if since is None:
+            since = self.current()
+        while True:
+            v = self.current()
+            if v != since:
+                return v
+            step = self.poll_s if deadline is None else min(self.poll_s, deadline - time.monotonic())
+            if step <= 0:
+                return v
+            with self._cond:
+                if self._version == since:
+                    self._cond.wait(step)
+
+
 class JobStore:
     """
     JobStore em arquivo JSON (portável, thread-safe).
 
     Estrutura:
       {
-        "jobs": [ { _id, job_type, status, params, created_at, updated_at, error_msg? }, ... ],
-        "logs": { "<_id>": [ { ts, level, msg }, ... ] }
+        "jobs": [ { _id, job_type, status, priority, params, created_at, updated_at, error_msg? }, ... ],
+        "schedules": [ { _id, <definição de core.job_schedule>, enabled, next_run, ... }, ... ]
       }
 
+    A base fica em cache na memória junto com índices (contagem por status e
+    um heap de pendentes por (priority, created_at) para cada job_type); o arquivo só é relido se
+    outra instância o alterou. Assim counts_by_status e pop_next_pending não
+    varrem nem ordenam a lista de jobs. Menor 'priority' = executa antes.
+
+    Logs ficam fora do JSON, em arquivos append-only por job (um JSON por linha):
+      <jobs_db>.logs/<_id>.jsonl   ->   { ts, level, msg }
+    Assim add_log não regrava a base; bases antigas com a seção "logs" embutida
+    são migradas para esses arquivos na abertura. Cada log guarda no máximo
+    log_max_entries entradas (as mais recentes; 0 = sem limite). A saída
+    completa dos scripts fica em <jobs_db>.output/<_id>.log.gz (self.output,
+    ver core.job_output).
+
+    Vários processos (GUI, worker headless, outras máquinas no mesmo
+    compartilhamento) podem usar a mesma base: toda escrita ocorre sob um lock
+    de arquivo (<jobs_db>.lock) e relê a base antes de alterá-la. Workers pegam
+    jobs com claim_next(worker_id), que grava um lease (worker_id,
+    lease_expires_at, heartbeat_at) renovado por renew_lease(); leases vencidos
+    voltam para 'pending' via requeue_expired_leases(). Todo claim grava também
+    o processo dono (owner_pid, owner_host) e incrementa 'attempts', para que
+    recover_orphaned() devolva à fila, sem esperar o lease, jobs cujo processo
+    morreu nesta máquina.
+
+    Retenção: archive_finished() move jobs finalizados antigos (e seus logs)
+    para o arquivo morto comprimido <jobs_db>.archive/AAAA-MM-DD.jsonl.gz
+    (ver core.job_archive), mantendo a base viva pequena.
+
+    Dependências: um job pode declarar depends_on (lista de _id); add_jobs aceita
+    um lote em forma de grafo, com 'ref' nos itens e depends_on apontando para
+    refs/índices de itens anteriores. O job fica 'waiting' até todas as
+    dependências terminarem 'done' e então vira 'pending' (ramos independentes
+    rodam em paralelo); se uma delas termina em error/canceled/timeout, os
+    dependentes vão em cascata para 'canceled' (blocked_by = _id da dependência).
+    Reenfileirar a dependência reativa os jobs cancelados por causa dela.
+
+    Progresso: enquanto o script roda, o worker grava em lote (set_progress) o
+    campo 'progress' do job (fase, arquivos/bytes feitos e totais, percentual,
+    vazão e ETA); o claim apaga o de execuções anteriores.
+
+    Estado volátil: progresso e heartbeats (renew_lease) mudam a cada poucos
+    segundos e não regravam a base. Ficam no arquivo lateral <jobs_db>.live.json
+    ({_id: {worker_id, attempts, progress, heartbeat_at, lease_expires_at}}, lock
+    próprio <jobs_db>.live.lock), que get_job/list_jobs e o vencimento de leases
+    sobrepõem ao job enquanto ele roda naquela mesma tentativa; ao sair de
+    'running', o último progresso é incorporado à base. Não altera a versão.
+
+    Recursos: set_status(resources=...) grava o uso de CPU, memória e E/S da
+    execução (core.job_resources); o claim apaga o de execuções anteriores.
+
+    Novas tentativas: retry_later devolve um job em execução para 'pending' com
+    run_after (instante a partir do qual o claim pode pegá-lo), guardando a
+    tentativa em attempt_history; set_status(attempt=...) registra a última.
+
+    Divisão em partes: split_job transforma um job em execução na junção de
+    jobs-parte recém-enfileirados (depends_on), ver core.job_shards.
+
+    Agendamentos: a seção "schedules" guarda as definições recorrentes
+    (core.job_schedule) com o estado delas (next_run, last_job_id...);
+    fire_schedule enfileira uma ocorrência e avança next_run na mesma gravação.
+
+    Cache de resultados: set_result grava no job o fingerprint das entradas e o
+    resumo das saídas; find_cached(fingerprint) devolve o job 'done' mais recente
+    com o mesmo fingerprint, para o worker reaproveitar (ver core.job_cache).
+
+    Notificação: version() é um contador que avança a cada mudança da base
+    (inclusive por outro processo); wait_for_change(since, timeout) bloqueia
+    até a versão sair de 'since'. Logs, progresso e heartbeats não alteram a versão.
+
     Status possíveis:
       - pending   : aguardando execução
-      - running   : em execução (marcado por pop_next_pending)
+      - waiting   : aguardando as dependências (depends_on) terminarem
+      - running   : em execução (marcado por pop_next_pending/claim_next)
       - done      : concluído com sucesso
       - error     : finalizado com erro
-      - canceled  : cancelado pelo usuário (apenas se estava pending)
+      - canceled  : cancelado pelo usuário (pending: cancel_job; running:
+                    cancel_running pede ao worker dono que encerre o processo;
+                    ou porque uma dependência falhou: blocked_by)
+      - timeout   : encerrado pelo worker ao passar do tempo limite do tipo
     """
 
-    def __init__(self, path: str | Path = "./jobs_db.json"):
+    def __init__(self, path: str | Path = "./jobs_db.json", *, log_max_entries: int = 5000):
         self.path = str(path)
+        self.logs_dir = Path(self.path).with_suffix(".logs")
+        self.archive = JobArchive(Path(self.path).with_suffix(".archive"))
+        self.output = JobOutput(Path(self.path).with_suffix(".output"))
+        self.log_max_entries = max(0, int(log_max_entries or 0))
+        self._log_lines: Dict[str, int] = {}  # entradas por arquivo de log (estimativa local)
         self._lock = threading.Lock()
+        self._flock = _FileLock(Path(self.path).with_suffix(".lock"))
+        self._log_lock = threading.Lock()
+        # estado volátil dos jobs em execução (progresso, heartbeat), fora da base
+        self.live_path = Path(self.path).with_suffix(".live.json")
+        self._live_flock = _FileLock(Path(self.path).with_suffix(".live.lock"))
+        self._live: Dict[str, Dict[str, Any]] = {}
+        self._live_sig: Optional[tuple] = None
+        # cache da base + índices, revalidados pela assinatura do arquivo
+        self._db: Optional[Dict[str, Any]] = None
+        self._sig: Optional[tuple] = None
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._pos: Dict[str, int] = {}  # _id -> posição em db["jobs"] (cursor de list_jobs)
+        self._counts: Dict[str, int] = {st: 0 for st in STATUSES}
+        # heaps de (priority, created_at, seq, _id) por job_type
+        self._pending: Dict[str, List[tuple]] = {}
+        self._delayed: List[tuple] = []  # heap de (run_after, seq, _id): pendentes à espera de nova tentativa
+        self._dependents: Dict[str, List[str]] = {}  # _id -> jobs com esse _id em depends_on
+        self._fingerprints: Dict[str, List[str]] = {}  # fingerprint -> _ids, do mais antigo ao mais novo
+        self._seq = count()  # desempate estável: ordem de inserção
+        self._changes = _ChangeNotifier(self._file_sig)
         self._ensure_file()
 
     # ------------- API pública -------------
-    def add_job(self, job_type: str, params: Dict[str, Any]) -> str:
+    def add_job(self, job_type: str, params: Dict[str, Any], *, priority: int = 0,
+                depends_on: Iterable[str] = ()) -> str:
+        """Enfileira um job; com depends_on (ids), ele só executa depois que todos concluírem."""
+        return self.add_jobs([{"job_type": job_type, "params": params, "priority": priority,
+                               "depends_on": list(depends_on or ())}])[0]
+
+    def add_jobs(self, jobs: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Enfileira vários jobs numa única gravação.
+        Cada item: {"job_type": str, "params": dict, "priority": int (opcional),
+                    "ref": str (opcional), "depends_on": [...] (opcional)}.
+        depends_on aceita _id de jobs existentes, 'ref' ou índice de itens anteriores
+        do lote (um grafo de jobs enviado de uma vez). Retorna os ids na mesma ordem.
+        """
+        specs = list(jobs)
+        if not specs:
+            return []
         with self._locked_rw(self) as db:
-            jid = str(uuid.uuid4())
-            now = _now_iso()
-            job = {
-                "_id": jid,
-                "job_type": job_type,
-                "status": "pending",
-                "params": params or {},
-                "created_at": now,
-                "updated_at": now,
-                "error_msg": None,
-            }
-            db["jobs"].append(job)
-            db["logs"].setdefault(jid, [])
-            return jid
+            return self._insert_jobs(db, specs)
 
     def add_log(self, job_id: str, msg: str, level: str = "INFO") -> None:
-        level = level.upper()
-        if level not in ("INFO", "ERROR", "WARN", "WARNING", "DEBUG"):
-            level = "INFO"
-        with self._locked_rw(self) as db:
-            logs = db["logs"].setdefault(job_id, [])
-            logs.append({"ts": _now_iso(), "level": level, "msg": str(msg)})
+        self.add_logs([(job_id, msg, level)])
 
-    def get_logs(self, job_id: str) -> List[Dict[str, str]]:
-        with self._locked_ro(self) as db:
-            return list(db["logs"].get(job_id, []))
+    def add_logs(self, entries: Iterable[tuple]) -> None:
+        """
+        Grava várias linhas de log de uma vez: itens (job_id, msg) ou (job_id, msg, level).
+        Cada arquivo de log é aberto uma única vez por chamada.
+        """
+        by_job: Dict[str, List[str]] = {}
+        for entry in entries:
+            job_id, msg = entry[0], entry[1]
+            level = _norm_level(entry[2] if len(entry) > 2 else "INFO")
+            line = json.dumps({"ts": _now_iso(), "level": level, "msg": str(msg)}, ensure_ascii=False)
+            by_job.setdefault(job_id, []).append(line + "\n")
+        if not by_job:
+            return
+        with self._log_lock:
+            self.logs_dir.mkdir(parents=True, exist_ok=True)
+            for job_id, lines in by_job.items():
+                p = self._log_path(job_id)
+                with p.open("a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                if self.log_max_entries:
+                    self._cap_log(job_id, p, len(lines))
+
+    def get_logs(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Lê os logs do job em ordem de gravação.
+        offset/limit permitem ler em páginas sem carregar o arquivo inteiro.
+        """
+        p = self._log_path(job_id)
+        if not p.exists():
+            return []
+        stop = None if limit is None else max(0, offset) + max(0, limit)
+        out: List[Dict[str, str]] = []
+        with p.open("r", encoding="utf-8") as f:
+            for line in islice(f, max(0, offset), stop):
+                try:
+                    out.append(json.loads(line))
+                except Exception:
+                    continue  # linha truncada (ex.: queda durante a gravação)
+        return out
 
-    def set_status(self, job_id: str, status: str, *, error_msg: Optional[str] = None) -> bool:
-        if status not in ("pending", "running", "done", "error", "canceled"):
+    def set_status(self, job_id: str, status: str, *, error_msg: Optional[str] = None,
+                   worker_id: Optional[str] = None, attempt: Optional[Dict[str, Any]] = None,
+                   resources: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Altera o status de um job. Com worker_id, só altera se o job ainda
+        pertence a esse worker (lease não foi perdido para outro processo).
+        attempt (opcional) é acrescentado ao histórico de tentativas (attempt_history);
+        resources (opcional) é o uso de recursos da execução (core.job_resources).
+        """
+        if status not in STATUSES:
             raise ValueError(f"status inválido: {status}")
         with self._locked_rw(self) as db:
-            job = self._find_job(db, job_id)
+            job = self._by_id.get(job_id)
             if not job:
                 return False
-            job["status"] = status
+            if worker_id is not None and (job.get("status") != "running" or job.get("worker_id") != worker_id):
+                return False
+            self._mark(job, status)
             job["updated_at"] = _now_iso()
             job["error_msg"] = (error_msg or None)
+            if status != "running":
+                job.pop("lease_expires_at", None)
+            if attempt:
+                job.setdefault("attempt_history", []).append(dict(attempt))
+            if resources:
+                job["resources"] = dict(resources)
             return True
 
-    def pop_next_pending(self) -> Optional[Dict[str, Any]]:
+    def retry_later(self, job_id: str, delay_s: float, *, error_msg: Optional[str] = None,
+                    attempt: Optional[Dict[str, Any]] = None, worker_id: str) -> bool:
         """
-        Retorna e marca como 'running' o job 'pending' mais antigo.
-        Se não houver pendentes, retorna None.
+        Devolve um job 'running' deste worker para 'pending', só elegível para o
+        claim depois de delay_s segundos (run_after). attempt vai para o histórico.
         """
         with self._locked_rw(self) as db:
-            jobs = db["jobs"]
-            pendentes = [j for j in jobs if j["status"] == "pending"]
-            if not pendentes:
+            job = self._by_id.get(job_id)
+            if not job or job.get("status") != "running" or job.get("worker_id") != worker_id:
+                return False
+            job["run_after"] = _iso_in(delay_s)
+            job["updated_at"] = _now_iso()
+            job["error_msg"] = (error_msg or None)
+            job.pop("lease_expires_at", None)
+            if attempt:
+                job.setdefault("attempt_history", []).append(dict(attempt))
+            self._mark(job, "pending")
+            return True
+
+    def split_job(self, job_id: str, shards: Iterable[Dict[str, Any]], *, info: Dict[str, Any],
+                  worker_id: str) -> Optional[List[str]]:
+        """
+        Divide um job 'running' deste worker em partes (core.job_shards): enfileira
+        os itens de shards (como em add_jobs), troca em depends_on as partes de uma
+        divisão anterior pelas novas e devolve o job para 'waiting', com
+        shards = {**info, "ids": [...]}; quando as partes concluem, ele volta à fila
+        para a junção. A divisão não conta como tentativa. None se o job não é
+        mais deste worker.
+        """
+        specs = list(shards)
+        with self._locked_rw(self) as db:
+            job = self._by_id.get(job_id)
+            if not job or job.get("status") != "running" or job.get("worker_id") != worker_id:
                 return None
-            pendentes.sort(key=lambda j: j.get("created_at", ""))
-            job = pendentes[0]
-            job["status"] = "running"
+            ids = self._insert_jobs(db, specs)
+            old = set((job.get("shards") or {}).get("ids") or ())
+            for d in old:
+                if job_id in self._dependents.get(d, ()):
+                    self._dependents[d].remove(job_id)
+            job["depends_on"] = [d for d in job.get("depends_on") or () if d not in old] + ids
+            for d in ids:
+                self._dependents.setdefault(d, []).append(job_id)
+            job["shards"] = {**info, "ids": ids}
+            job["attempts"] = max(0, int(job.get("attempts") or 0) - 1)
             job["updated_at"] = _now_iso()
-            return dict(job)  # cópia para o worker
+            job["error_msg"] = None
+            job.pop("lease_expires_at", None)
+            self._mark(job, self._ready_status(job)[0])
+            return ids
+
+    def set_status_many(self, job_ids: Iterable[str], status: str, *, error_msg: Optional[str] = None) -> int:
+        """Altera o status de vários jobs numa única gravação. Retorna quantos existiam."""
+        if status not in STATUSES:
+            raise ValueError(f"status inválido: {status}")
+        ids = list(job_ids)
+        if not ids:
+            return 0
+        with self._locked_rw(self) as db:
+            now = _now_iso()
+            n = 0
+            for jid in ids:
+                job = self._by_id.get(jid)
+                if not job:
+                    continue
+                self._mark(job, status)
+                job["updated_at"] = now
+                job["error_msg"] = (error_msg or None)
+                if status != "running":
+                    job.pop("lease_expires_at", None)
+                n += 1
+            return n
+
+    def pop_next_pending(self) -> Optional[Dict[str, Any]]:
+        """
+        Retorna e marca como 'running' o job 'pending' de menor (priority, created_at).
+        Se não houver pendentes, retorna None (sem regravar a base).
+        """
+        return self._claim(None, 0)
+
+    def claim_next(self, worker_id: str, lease_seconds: float = 300.0, *,
+                   exclude_types: Iterable[str] = (),
+                   accept: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Como pop_next_pending, mas registra o lease do worker no job:
+        worker_id, heartbeat_at e lease_expires_at (agora + lease_seconds).
+        exclude_types pula tipos que o worker não pode assumir agora (limite por tipo).
+        accept(job), se dado, é consultado na ordem da fila e pega o primeiro job
+        aceito (ex.: dispositivo de armazenamento livre); recebe cópias, fora dos
+        locks, e não deve alterar o job. Atômico entre processos.
+        """
+        return self._claim(worker_id, lease_seconds, frozenset(exclude_types), accept)
+
+    def renew_lease(self, job_id: str, worker_id: str, lease_seconds: float = 300.0) -> bool:
+        """
+        Heartbeat: estende o lease. False se o job não pertence mais ao worker.
+        Vai para o arquivo de estado volátil: não regrava a base nem avança a versão.
+        """
+        with self._locked_ro(self):
+            fields = {"heartbeat_at": _now_iso(), "lease_expires_at": _iso_in(lease_seconds)}
+            return self._update_live({job_id: fields}, worker_id) > 0
+
+    def set_progress(self, updates: Dict[str, Dict[str, Any]], *, worker_id: str) -> int:
+        """
+        Grava o campo 'progress' de vários jobs numa única escrita ({_id: progress},
+        ver core.job_progress). Só altera jobs 'running' deste worker; retorna quantos.
+        Vai para o arquivo de estado volátil: não regrava a base nem avança a versão
+        (o painel relê jobs em execução periodicamente).
+        """
+        if not updates:
+            return 0
+        with self._locked_ro(self):
+            return self._update_live({jid: {"progress": dict(p)} for jid, p in updates.items()}, worker_id)
 
-    def list_jobs(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    def set_result(self, job_id: str, *, fingerprint: str, outputs: Dict[str, Any],
+                   cache_of: Optional[str] = None, worker_id: str) -> bool:
+        """
+        Registra o resultado reaproveitável de um job 'running' deste worker
+        (ver core.job_cache): fingerprint das entradas, resumo das saídas e,
+        se veio do cache, o _id do job de origem.
+        """
+        with self._locked_rw(self) as db:
+            job = self._by_id.get(job_id)
+            if not job or job.get("status") != "running" or job.get("worker_id") != worker_id:
+                return False
+            job["fingerprint"] = fingerprint
+            job["outputs"] = dict(outputs)
+            if cache_of:
+                job["cache_of"] = cache_of
+            self._fingerprints.setdefault(fingerprint, []).append(job_id)
+            return True
+
+    def find_cached(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Job 'done' mais recente com esse fingerprint (cópia) ou None."""
+        with self._locked_ro(self):
+            for jid in reversed(self._fingerprints.get(fingerprint, ())):
+                job = self._by_id.get(jid)
+                if job and job.get("status") == "done" and job.get("fingerprint") == fingerprint:
+                    return dict(job)
+            return None
+
+    def requeue_expired_leases(self, *, max_attempts: int = 0) -> int:
+        """
+        Devolve para 'pending' os jobs 'running' cujo lease venceu. Retorna quantos.
+        Com max_attempts > 0, jobs que já somam essa quantidade de tentativas vão para 'error'.
+        """
+        now = _now_iso()
+        with self._locked_ro(self):
+            if not any(self._lease_expired(self._by_id[k], now) for k in self._running_ids()):
+                return 0
+        recovered: List[tuple] = []
+        with self._locked_rw(self) as db:
+            for jid in self._running_ids():
+                job = self._by_id[jid]
+                if self._lease_expired(job, now):
+                    recovered.append(self._recover(job, f"lease expirado (worker {job.get('worker_id')})",
+                                                   max_attempts))
+        self.add_logs(recovered)
+        return len(recovered)
+
+    def recover_orphaned(self, *, stale_seconds: float = 300.0, max_attempts: int = 0) -> int:
+        """
+        Recuperação após queda: devolve para 'pending' os jobs 'running' cujo processo
+        dono (owner_pid/owner_host, gravados no claim) morreu nesta máquina, e os
+        legados sem dono nem lease parados há mais de stale_seconds. Cada claim
+        incrementa 'attempts'; com max_attempts > 0, quem atingiu o limite vai para 'error'.
+        Retorna quantos jobs foram recuperados.
+        """
+        stale_before = _iso_in(-stale_seconds)
+        with self._locked_ro(self):
+            if not any(_orphan_reason(self._by_id[k], stale_before) for k in self._running_ids()):
+                return 0
+        recovered: List[tuple] = []
+        with self._locked_rw(self) as db:
+            for jid in self._running_ids():
+                job = self._by_id[jid]
+                reason = _orphan_reason(job, stale_before)
+                if reason:
+                    recovered.append(self._recover(job, reason, max_attempts))
+        self.add_logs(recovered)
+        return len(recovered)
+
+    def version(self) -> int:
+        """Versão atual da base (avança a cada alteração de jobs, local ou de outro processo)."""
+        return self._changes.current()
+
+    def wait_for_change(self, since: Optional[int] = None, timeout: Optional[float] = None) -> int:
+        """
+        Bloqueia até a versão ser diferente de 'since' (padrão: a versão atual)
+        ou até 'timeout' segundos. Retorna a versão corrente.
+        """
+        return self._changes.wait(since, timeout)
+
+    def notify_change(self) -> None:
+        """Avança a versão e acorda quem espera em wait_for_change (ex.: ao parar o worker)."""
+        self._changes.bump()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """O job com esse _id (cópia) ou None."""
+        with self._locked_ro(self):
+            job = self._by_id.get(job_id)
+            return self._with_live(job) if job else None
+
+    def list_jobs(self, status: Optional[str] = None, *, job_type: Optional[str] = None,
+                  limit: Optional[int] = None, offset: int = 0, after_id: Optional[str] = None,
+                  include_params: bool = True) -> List[Dict[str, Any]]:
+        """
+        Lista jobs do mais recente para o mais antigo.
+          - status / job_type : filtros
+          - limit / offset    : paginação por deslocamento
+          - after_id          : paginação por cursor — continua após o job com esse id
+                                (última linha da página anterior); [] se ele não existir mais
+          - include_params    : False omite 'params' (listagens leves)
+        A base é percorrida de trás para frente (ordem de inserção = created_at),
+        parando assim que a página estiver completa.
+        """
         with self._locked_ro(self) as db:
-            items = db["jobs"]
-            if status:
-                items = [j for j in items if j.get("status") == status]
-            return sorted(items, key=lambda j: j.get("created_at", ""), reverse=True)
+            jobs = db["jobs"]
+            start = len(jobs) - 1
+            if after_id is not None:
+                if after_id not in self._pos:
+                    return []
+                start = self._pos[after_id] - 1
+            out: List[Dict[str, Any]] = []
+            skip = max(0, offset)
+            for i in range(start, -1, -1):
+                j = jobs[i]
+                if status and j.get("status") != status:
+                    continue
+                if job_type and j.get("job_type") != job_type:
+                    continue
+                if skip:
+                    skip -= 1
+                    continue
+                item = self._with_live(j)
+                if not include_params:
+                    item.pop("params", None)
+                out.append(item)
+                if limit is not None and len(out) >= limit:
+                    break
+            return out
 
     def counts_by_status(self) -> Dict[str, int]:
-        with self._locked_ro(self) as db:
-            counts: Dict[str, int] = {"pending": 0, "running": 0, "done": 0, "error": 0, "canceled": 0}
-            for j in db["jobs"]:
-                st = j.get("status")
-                if st in counts:
-                    counts[st] += 1
-            return counts
+        with self._locked_ro(self):
+            return dict(self._counts)
 
     def clear_by_status(self, status: str) -> int:
         """
         Remove permanentemente jobs com determinado status.
         Retorna a quantidade removida. Também remove os logs desses jobs.
         """
-        if status not in ("pending", "running", "done", "error", "canceled"):
+        if status not in STATUSES:
             raise ValueError(f"status inválido: {status}")
         with self._locked_rw(self) as db:
             before = len(db["jobs"])
             to_remove_ids = {j["_id"] for j in db["jobs"] if j.get("status") == status}
+            if status != "done":  # dependentes à espera não teriam mais quem os libere
+                for jid in to_remove_ids:
+                    for dep in self._waiting_dependents(jid):
+                        if dep["_id"] not in to_remove_ids:
+                            self._block(dep, jid, "removida da fila")
+                            self._mark(dep, "canceled")
             db["jobs"] = [j for j in db["jobs"] if j["_id"] not in to_remove_ids]
-            for jid in to_remove_ids:
-                db["logs"].pop(jid, None)
+            self._forget_logs(to_remove_ids)
+            self._reindex()
             return before - len(db["jobs"])
 
     def requeue_from_status(self, status: str) -> int:
         """
-        Move jobs de um status para 'pending'.
-        Útil para reenfileirar 'error', 'done' ou 'canceled'.
+        Move jobs de um status para 'pending' ('waiting' se ainda houver dependências
+        por concluir; jobs com uma dependência que falhou ficam como estão).
+        Útil para reenfileirar 'error', 'done', 'canceled' ou 'timeout'.
         Retorna quantos foram alterados.
         """
-        if status not in ("error", "done", "canceled", "running", "pending"):
+        if status not in STATUSES:
             raise ValueError(f"status inválido para requeue: {status}")
         with self._locked_rw(self) as db:
             n = 0
             for j in db["jobs"]:
                 if j.get("status") == status:
-                    j["status"] = "pending"
+                    target, blocker = self._ready_status(j)
+                    if blocker:
+                        continue
+                    j.pop("blocked_by", None)
+                    j.pop("run_after", None)
                     j["updated_at"] = _now_iso()
                     j["error_msg"] = None
+                    j["attempts"] = 0
+                    self._mark(j, target)
                     n += 1
             return n
 
+    def archive_finished(self, retention_days: Dict[str, float], *, limit: int = 5000) -> int:
+        """
+        Move para o arquivo morto (self.archive) os jobs finalizados (FINISHED)
+        cujo updated_at é mais antigo que retention_days[status] dias.
+        Ex.: {"done": 30, "canceled": 30}; 0/None desativa o status.
+        No máximo 'limit' jobs por chamada. Retorna quantos foram arquivados.
+        """
+        cutoffs = _retention_cutoffs(retention_days)
+        if not cutoffs:
+            return 0
+        with self._locked_ro(self) as db:
+            if not any(_is_expired(j, cutoffs) for j in db["jobs"]):
+                return 0
+        with self._locked_rw(self) as db:
+            old = [j for j in db["jobs"] if _is_expired(j, cutoffs)][:limit]
+            if not old:
+                return 0
+            # grava (e sincroniza) o arquivo morto antes de remover da base viva
+            self.archive.append({"job": dict(j), "logs": self.get_logs(j["_id"])} for j in old)
+            ids = {j["_id"] for j in old}
+            db["jobs"] = [j for j in db["jobs"] if j["_id"] not in ids]
+            for jid in ids:
+                self.output.move_to(jid, self.archive.output_dir)
+            self._forget_logs(ids)
+            self._reindex()
+            return len(ids)
+
     def cancel_job(self, job_id: str) -> bool:
         """
-        Cancela um job se estiver 'pending'.
-        (Não cancela 'running' para evitar corrupção.)
+        Cancela um job se estiver 'pending' ou 'waiting' (os dependentes dele também
+        são cancelados). Jobs 'running': ver cancel_running.
         """
         with self._locked_rw(self) as db:
-            job = self._find_job(db, job_id)
+            job = self._by_id.get(job_id)
             if not job:
                 return False
-            if job["status"] != "pending":
+            if job["status"] not in ("pending", "waiting"):
                 return False
-            job["status"] = "canceled"
+            self._mark(job, "canceled")
             job["updated_at"] = _now_iso()
             return True
 
+    def cancel_running(self, job_id: str) -> bool:
+        """
+        Pede o cancelamento de um job 'running' (campo cancel_requested). O worker
+        dono, em qualquer processo, encerra o script e grava 'canceled'.
+        """
+        with self._locked_rw(self) as db:
+            job = self._by_id.get(job_id)
+            if not job or job.get("status") != "running":
+                return False
+            job["cancel_requested"] = True
+            return True
+
+    def cancel_requests(self, job_ids: Iterable[str]) -> List[str]:
+        """Entre job_ids, os 'running' com cancelamento pedido (consultado pelo worker)."""
+        with self._locked_ro(self):
+            return [jid for jid in job_ids
+                    if (self._by_id.get(jid) or {}).get("cancel_requested")
+                    and self._by_id[jid].get("status") == "running"]
+
+    # ------------- Agendamentos (core.job_schedule) -------------
+    def add_schedule(self, spec: Dict[str, Any], next_run: str) -> str:
+        """Guarda a definição de um agendamento recorrente, ativo a partir de next_run."""
+        sid = str(uuid.uuid4())
+        now = _now_iso()
+        with self._locked_rw(self) as db:
+            db.setdefault("schedules", []).append({
+                "_id": sid, **spec, "enabled": True, "next_run": next_run, "last_run": None,
+                "last_job_id": None, "last_skipped_at": None, "error": None, "created_at": now, "updated_at": now,
+            })
+        return sid
+
+    def list_schedules(self) -> List[Dict[str, Any]]:
+        with self._locked_ro(self) as db:
+            return [dict(s) for s in db.get("schedules", [])]
+
+    def get_schedule(self, schedule_id: str) -> Optional[Dict[str, Any]]:
+        with self._locked_ro(self) as db:
+            return next((dict(s) for s in db.get("schedules", []) if s["_id"] == schedule_id), None)
+
+    def update_schedule(self, schedule_id: str, spec: Optional[Dict[str, Any]] = None, **fields: Any) -> bool:
+        """Troca a definição (spec) e/ou campos de estado (SCHEDULE_STATE) de um agendamento."""
+        unknown = set(fields) - set(SCHEDULE_STATE)
+        if unknown:
+            raise ValueError(f"campo(s) de agendamento desconhecido(s): {', '.join(sorted(unknown))}")
+        with self._locked_rw(self) as db:
+            for sch in db.get("schedules", []):
+                if sch["_id"] == schedule_id:
+                    sch.update(spec or {}, **fields)
+                    sch["updated_at"] = _now_iso()
+                    return True
+            return False
+
+    def delete_schedule(self, schedule_id: str) -> bool:
+        with self._locked_rw(self) as db:
+            before = len(db.get("schedules", []))
+            db["schedules"] = [s for s in db.get("schedules", []) if s["_id"] != schedule_id]
+            return len(db["schedules"]) < before
+
+    def fire_schedule(self, schedule_id: str, due: str, next_run: str,
+                      jobs: Iterable[Dict[str, Any]]) -> Optional[List[str]]:
+        """
+        Dispara a ocorrência 'due' de um agendamento: se ele está ativo e next_run
+        ainda é 'due' (nenhum outro worker a disparou), enfileira jobs (como em
+        add_jobs; vazio = ocorrência pulada) e avança next_run, numa única gravação.
+        Retorna os ids, ou None se a ocorrência já não estava pendente.
+        """
+        specs = list(jobs)
+        with self._locked_rw(self) as db:
+            sch = next((s for s in db.get("schedules", []) if s["_id"] == schedule_id), None)
+            if sch is None or not sch.get("enabled") or sch.get("next_run") != due:
+                return None
+            ids = self._insert_jobs(db, specs) if specs else []
+            now = _now_iso()
+            sch["next_run"] = next_run
+            sch["updated_at"] = now
+            if ids:
+                sch["last_run"], sch["last_job_id"] = now, ids[-1]
+            else:
+                sch["last_skipped_at"] = now
+            return ids
+
     # ------------- Internos -------------
-    def _ensure_file(self) -> None:
-        p = Path(self.path)
-        if not p.exists():
-            p.parent.mkdir(parents=True, exist_ok=True)
-            data = {"jobs": [], "logs": {}}
-            tmp = p.with_suffix(p.suffix + ".tmp")
-            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    def _log_path(self, job_id: str) -> Path:
+        return self.logs_dir / f"{job_id}.jsonl"
+
+    def _cap_log(self, job_id: str, p: Path, added: int) -> None:
+        """
+        Mantém o log do job em no máximo log_max_entries entradas (ring buffer).
+        Só reescreve o arquivo ao passar 25% do limite, para amortizar o custo.
+        Chamado sob self._log_lock.
+        """
+        n = self._log_lines.get(job_id)
+        if n is None:
+            with p.open("rb") as f:
+                n = sum(1 for _ in f)
+        else:
+            n += added
+        limit = self.log_max_entries
+        if n > limit + limit // 4:
+            with p.open("r", encoding="utf-8") as f:
+                kept = deque(f, maxlen=max(1, limit - 1))
+            tmp = p.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                f.write(json.dumps(_trim_marker(n - len(kept), limit), ensure_ascii=False) + "\n")
+                f.writelines(kept)
             tmp.replace(p)
+            n = len(kept) + 1
+        self._log_lines[job_id] = n
+
+    def _forget_logs(self, job_ids: Iterable[str]) -> None:
+        """Remove logs e saída completa de jobs excluídos da base."""
+        for jid in job_ids:
+            self._log_path(jid).unlink(missing_ok=True)
+            self._log_lines.pop(jid, None)
+            self.output.remove(jid)
+
+    def _claim(self, worker_id: Optional[str], lease_seconds: float, exclude: frozenset = frozenset(),
+               accept: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        while True:
+            job_id = self._pick_pending(exclude, accept)
+            if job_id is None:
+                return None
+            job = self._take_pending(job_id, worker_id, lease_seconds)
+            if job is not None:
+                return job
+            # outro processo levou o candidato antes do lock de escrita: escolhe de novo
+
+    def _pick_pending(self, exclude: frozenset,
+                      accept: Optional[Callable[[Dict[str, Any]], bool]]) -> Optional[str]:
+        """
+        _id do próximo pendente para o claim. Com accept, os candidatos são copiados
+        em páginas de CLAIM_PEEK sob o lock de leitura e avaliados fora dele: accept
+        pode tocar o disco (Worker._device_free) e não deve segurar os locks.
+        """
+        skip = 0
+        while True:
+            with self._locked_ro(self):
+                if accept is None:
+                    job = next(self._iter_pending(exclude), None)
+                    return None if job is None else job["_id"]
+                page = [dict(j) for j in islice(self._iter_pending(exclude), skip, skip + CLAIM_PEEK)]
+            for job in page:
+                if accept(job):
+                    return job["_id"]
+            if len(page) < CLAIM_PEEK:
+                return None
+            skip += CLAIM_PEEK
+
+    def _take_pending(self, job_id: str, worker_id: Optional[str], lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Marca como 'running' o job escolhido por _pick_pending, se ele ainda está pendente e elegível."""
+        with self._locked_rw(self) as db:
+            job = self._by_id.get(job_id)
+            if job is None or job.get("status") != "pending" or (job.get("run_after") or "") > _now_iso():
+                return None
+            heap = self._pending.get(job.get("job_type")) or []
+            if heap and heap[0][-1] == job_id:
+                heapq.heappop(heap)  # fora do topo (accept): vira entrada obsoleta, descartada depois
+            self._mark(job, "running")
+            now = _now_iso()
+            job["updated_at"] = now
+            job["attempts"] = int(job.get("attempts") or 0) + 1
+            job["owner_pid"] = os.getpid()
+            job["owner_host"] = HOST
+            # progresso, pedido de cancelamento e resultado de uma execução anterior
+            for k in ("progress", "cancel_requested", "fingerprint", "outputs", "cache_of", "run_after", "resources"):
+                job.pop(k, None)
+            if worker_id is not None:
+                job["worker_id"] = worker_id
+                job["heartbeat_at"] = now
+                job["lease_expires_at"] = _iso_in(lease_seconds)
+            return dict(job)  # cópia para o worker
+
+    def _insert_jobs(self, db: Dict[str, Any], specs: List[Dict[str, Any]]) -> List[str]:
+        """Acrescenta os itens de add_jobs à base (sob o lock de escrita); retorna os ids."""
+        priorities = _check_specs(specs)
+        ids = [str(uuid.uuid4()) for _ in specs]
+        deps = _resolve_depends_on(specs, ids, lambda jid: jid in self._by_id)
+        now = _now_iso()
+        for jid, spec, dep, prio in zip(ids, specs, deps, priorities):
+            job = {
+                "_id": jid,
+                "job_type": spec["job_type"],
+                "status": None,
+                "priority": prio,
+                "params": spec.get("params") or {},
+                "created_at": now,
+                "updated_at": now,
+                "error_msg": None,
+            }
+            if dep:
+                job["depends_on"] = dep
+                for d in dep:
+                    self._dependents.setdefault(d, []).append(jid)
+            db["jobs"].append(job)
+            self._by_id[jid] = job
+            self._pos[jid] = len(db["jobs"]) - 1
+            status, blocker = self._ready_status(job)
+            if blocker:
+                self._block(job, blocker)
+            self._mark(job, status)
+        return ids
+
+    def _ready_status(self, job: Dict[str, Any]) -> tuple:
+        """(status, _id da dependência que falhou) para o job entrar na fila; ver _deps_state."""
+        return _deps_state(job.get("depends_on") or (), lambda d: (self._by_id.get(d) or {}).get("status"))
+
+    def _waiting_dependents(self, job_id: str) -> List[Dict[str, Any]]:
+        return [dep for dep in (self._by_id.get(d) for d in self._dependents.get(job_id, ()))
+                if dep is not None and dep.get("status") == "waiting"]
+
+    def _block(self, job: Dict[str, Any], blocker: str, why: Optional[str] = None) -> None:
+        """Prepara o cancelamento de um job porque a dependência 'blocker' falhou (ou saiu da base)."""
+        if why is None:
+            why = f"terminou em '{(self._by_id.get(blocker) or {}).get('status')}'"
+        job["blocked_by"] = blocker
+        job["error_msg"] = f"dependência {blocker} {why}"
+        job["updated_at"] = _now_iso()
+
+    def _propagate(self, job: Dict[str, Any]) -> None:
+        """
+        Reavalia os dependentes de um job cujo status mudou: libera ('pending') os que
+        estavam à espera dele, cancela em cascata se ele falhou e, se ele voltou à
+        fila, reativa ('waiting') os cancelados por causa dele.
+        """
+        for did in self._dependents.get(job["_id"], ()):
+            dep = self._by_id.get(did)
+            if dep is None:
+                continue
+            old = dep.get("status")
+            if old != "waiting" and not (old == "canceled" and dep.get("blocked_by")):
+                continue
+            new, blocker = self._ready_status(dep)
+            if new == old:
+                continue
+            if blocker:
+                self._block(dep, blocker)
+            else:
+                dep.pop("blocked_by", None)
+                dep["error_msg"] = None
+                dep["updated_at"] = _now_iso()
+            self._mark(dep, new)
+
+    def _recover(self, job: Dict[str, Any], reason: str, max_attempts: int) -> tuple:
+        """Tira um job 'running' do dono perdido; devolve a linha de log (job_id, msg, level)."""
+        attempts = int(job.get("attempts") or 0)
+        give_up = bool(max_attempts) and attempts >= max_attempts
+        self._mark(job, "error" if give_up else "pending")
+        job["updated_at"] = _now_iso()
+        for k in ("lease_expires_at", "owner_pid", "owner_host"):
+            job.pop(k, None)
+        if give_up:
+            job["error_msg"] = f"{reason}; abandonado após {attempts} tentativa(s)"
+            return job["_id"], f"Job recuperado ({reason}) e abandonado após {attempts} tentativa(s)", "ERROR"
+        job["error_msg"] = reason
+        return job["_id"], f"Job recuperado ({reason}); reenfileirado após {attempts} tentativa(s)", "WARN"
 
-        # valida estrutura básica
+    def _running_ids(self) -> List[str]:
+        if not self._counts.get("running"):
+            return []
+        return [jid for jid, j in self._by_id.items() if j.get("status") == "running"]
+
+    def _lease_expired(self, job: Dict[str, Any], now: str) -> bool:
+        exp = self._with_live(job).get("lease_expires_at")
+        return job.get("status") == "running" and bool(exp) and exp < now
+
+    def _file_sig(self, path: Optional[str | Path] = None) -> Optional[tuple]:
         try:
-            with p.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-            if "jobs" not in data or "logs" not in data:
-                raise ValueError("arquivo inválido")
+            st = os.stat(self.path if path is None else path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _load_live(self) -> Dict[str, Dict[str, Any]]:
+        """Estado volátil (<jobs_db>.live.json); relê o arquivo apenas se mudou."""
+        sig = self._file_sig(self.live_path)
+        if sig != self._live_sig:
+            try:
+                live = json.loads(self.live_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                live = {}
+            self._live, self._live_sig = (live if isinstance(live, dict) else {}), sig
+        return self._live
+
+    @staticmethod
+    def _live_matches(job: Dict[str, Any], e: Optional[Dict[str, Any]]) -> bool:
+        """True se a entrada do estado volátil é da execução atual do job (mesmo worker e tentativa)."""
+        return (bool(e) and job.get("status") == "running" and e.get("worker_id") == job.get("worker_id")
+                and e.get("attempts") == job.get("attempts"))
+
+    def _live_entry(self, job: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if job.get("status") != "running":
+            return None
+        e = self._load_live().get(job.get("_id"))
+        return e if self._live_matches(job, e) else None
+
+    def _with_live(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Cópia do job com o progresso e o lease mais recentes do estado volátil."""
+        out = dict(job)
+        e = self._live_entry(job)
+        if e:
+            out.update((k, v) for k, v in e.items() if k in ("progress", "heartbeat_at", "lease_expires_at"))
+        return out
+
+    def _update_live(self, updates: Dict[str, Dict[str, Any]], worker_id: str) -> int:
+        """
+        Acrescenta campos ao estado volátil de jobs 'running' deste worker
+        ({_id: campos}) e descarta as entradas de execuções que já acabaram.
+        Chamado com self._lock (via _locked_ro); retorna quantos jobs alterou.
+        """
+        with self._live_flock:
+            self._load()  # claims de outros processos gravados antes deste lock
+            live = {jid: e for jid, e in self._load_live().items()
+                    if jid in self._by_id and self._live_matches(self._by_id[jid], e)}
+            n = 0
+            for jid, fields in updates.items():
+                job = self._by_id.get(jid)
+                if not job or job.get("status") != "running" or job.get("worker_id") != worker_id:
+                    continue
+                live[jid] = {**live.get(jid, {}), **fields, "worker_id": worker_id, "attempts": job.get("attempts")}
+                n += 1
+            if n:
+                tmp = self.live_path.with_suffix(self.live_path.suffix + ".tmp")
+                tmp.write_text(json.dumps(live, ensure_ascii=False), encoding="utf-8")
+                tmp.replace(self.live_path)
+                self._live, self._live_sig = live, self._file_sig(self.live_path)
+            return n
+
+    def _load(self) -> Dict[str, Any]:
+        """Base em memória; relê o arquivo apenas se mudou desde a última leitura/gravação."""
+        sig = self._file_sig()
+        if self._db is not None and sig is not None and sig == self._sig:
+            return self._db
+        try:
+            with Path(self.path).open("r", encoding="utf-8") as f:
+                db = json.load(f)
         except Exception:
-            data = {"jobs": [], "logs": {}}
-            tmp = p.with_suffix(p.suffix + ".tmp")
-            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-            tmp.replace(p)
+            db = {"jobs": []}
+        self._db, self._sig = db, sig
+        self._reindex()
+        return db
+
+    def _store(self, db: Dict[str, Any]) -> None:
+        # gravação atômica
+        p = Path(self.path)
+        tmp = p.with_suffix(p.suffix + ".tmp")
+        tmp.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(p)
+        self._db, self._sig = db, self._file_sig()
+        self._changes.bump()
+
+    def _reindex(self) -> None:
+        jobs = (self._db or {}).get("jobs", [])
+        self._by_id = {j["_id"]: j for j in jobs if j.get("_id")}
+        self._pos = {j["_id"]: i for i, j in enumerate(jobs) if j.get("_id")}
+        self._counts = {st: 0 for st in STATUSES}
+        self._pending = {}
+        self._delayed = []
+        self._dependents = {}
+        self._fingerprints = {}
+        for j in jobs:
+            for d in j.get("depends_on") or ():
+                self._dependents.setdefault(d, []).append(j["_id"])
+            if j.get("fingerprint"):
+                self._fingerprints.setdefault(j["fingerprint"], []).append(j["_id"])
+            st = j.get("status")
+            if st in self._counts:
+                self._counts[st] += 1
+            if st == "pending":
+                if j.get("run_after"):
+                    self._delayed.append((j["run_after"], next(self._seq), j["_id"]))
+                else:
+                    self._pending.setdefault(j.get("job_type"), []).append(self._pending_key(j))
+        for heap in self._pending.values():
+            heapq.heapify(heap)
+        heapq.heapify(self._delayed)
+
+    def _mark(self, job: Dict[str, Any], status: str) -> None:
+        """Troca o status de um job mantendo contadores e heap de pendentes."""
+        old = job.get("status")
+        if old == "running" and status != "running":
+            # incorpora à base o último progresso/heartbeat do estado volátil
+            e = self._live_entry(job)
+            if e:
+                job.update((k, e[k]) for k in ("progress", "heartbeat_at") if k in e)
+        if old in self._counts:
+            self._counts[old] -= 1
+        job["status"] = status
+        self._counts[status] += 1
+        if status == "pending":
+            if job.get("run_after"):
+                heapq.heappush(self._delayed, (job["run_after"], next(self._seq), job["_id"]))
+            else:
+                heapq.heappush(self._pending.setdefault(job.get("job_type"), []), self._pending_key(job))
+        if old != status and job.get("_id") in self._dependents:
+            self._propagate(job)
+
+    def _iter_pending(self, exclude: frozenset = frozenset()) -> Iterator[Dict[str, Any]]:
+        """
+        Pendentes na ordem da fila, sob demanda: antes, passa para os heaps os
+        pendentes cujo run_after (nova tentativa) já chegou e descarta os topos
+        obsoletos (remoção preguiçosa); depois percorre os heaps dos tipos não
+        excluídos em ordem sem ordená-los inteiros (fronteira de nós: cada item
+        custa O(log n)). Consumir com o lock da base.
+        """
+        now = _now_iso()
+        while self._delayed and self._delayed[0][0] <= now:
+            run_after, _, jid = heapq.heappop(self._delayed)
+            job = self._by_id.get(jid)
+            if job is not None and job.get("status") == "pending" and job.get("run_after") == run_after:
+                heapq.heappush(self._pending.setdefault(job.get("job_type"), []), self._pending_key(job))
+        heaps = []
+        for jtype, heap in self._pending.items():
+            if jtype in exclude:
+                continue
+            while heap:
+                job = self._by_id.get(heap[0][-1])
+                if job is not None and job.get("status") == "pending":
+                    break
+                heapq.heappop(heap)
+            if heap:
+                heaps.append(heap)
+        frontier = [(heap[0], k, 0) for k, heap in enumerate(heaps)]
+        heapq.heapify(frontier)
+        seen = set()
+        while frontier:
+            entry, k, i = heapq.heappop(frontier)
+            heap = heaps[k]
+            for c in (2 * i + 1, 2 * i + 2):
+                if c < len(heap):
+                    heapq.heappush(frontier, (heap[c], k, c))
+            job = self._by_id.get(entry[-1])
+            if entry[-1] in seen or job is None or job.get("status") != "pending":
+                continue
+            seen.add(entry[-1])
+            yield job
+
+    def _pending_key(self, job: Dict[str, Any]) -> tuple:
+        return (int(job.get("priority") or 0), job.get("created_at", ""), next(self._seq), job["_id"])
+
+    def _ensure_file(self) -> None:
+        p = Path(self.path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with self._flock:
+            if not p.exists():
+                data = {"jobs": []}
+                tmp = p.with_suffix(p.suffix + ".tmp")
+                tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+                tmp.replace(p)
+
+            # valida estrutura básica
+            try:
+                with p.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if "jobs" not in data:
+                    raise ValueError("arquivo inválido")
+            except Exception:
+                data = {"jobs": []}
+                tmp = p.with_suffix(p.suffix + ".tmp")
+                tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+                tmp.replace(p)
+
+        # migra logs embutidos (formato antigo) para arquivos por job
+        if "logs" in data:
+            with self._locked_rw(self) as db:
+                for jid, entries in (db.pop("logs", None) or {}).items():
+                    if not entries:
+                        continue
+                    self.logs_dir.mkdir(parents=True, exist_ok=True)
+                    with self._log_path(jid).open("a", encoding="utf-8") as f:
+                        for e in entries:
+                            f.write(json.dumps(e, ensure_ascii=False) + "\n")
 
     class _locked_ro:
         def __init__(self, outer: "JobStore"):
@@ -206,10 +1323,10 @@ class JobStore:
         def __enter__(self):
             self.outer._lock.acquire()
             try:
-                with Path(self.outer.path).open("r", encoding="utf-8") as f:
-                    self._data = json.load(f)
-            except Exception:
-                self._data = {"jobs": [], "logs": {}}
+                self._data = self.outer._load()
+            except BaseException:
+                self.outer._lock.release()
+                raise
             return self._data
 
         def __exit__(self, exc_type, exc, tb):
@@ -223,25 +1340,56 @@ class JobStore:
         def __enter__(self):
             self.outer._lock.acquire()
             try:
-                with Path(self.outer.path).open("r", encoding="utf-8") as f:
-                    self._data = json.load(f)
-            except Exception:
-                self._data = {"jobs": [], "logs": {}}
+                self.outer._flock.acquire()  # exclusão entre processos; a base é relida já sob o lock
+                try:
+                    self._data = self.outer._load()
+                except BaseException:
+                    self.outer._flock.release()
+                    raise
+            except BaseException:
+                self.outer._lock.release()
+                raise
             return self._data
 
         def __exit__(self, exc_type, exc, tb):
-            # gravação atômica
-            p = Path(self.outer.path)
-            tmp = p.with_suffix(p.suffix + ".tmp")
             try:
-                tmp.write_text(json.dumps(self._data, ensure_ascii=False, indent=2), encoding="utf-8")
-                tmp.replace(p)
+                if exc_type is not None:
+                    # falhou no meio: não grava a mutação parcial; descarta o cache
+                    # para o próximo acesso reler do disco (equivale ao rollback)
+                    self.outer._db = self.outer._sig = None
+                else:
+                    self.outer._store(self._data)
             finally:
-                self.outer._lock.release()
+                try:
+                    self.outer._flock.release()
+                finally:
+                    self.outer._lock.release()
 
-    @staticmethod
-    def _find_job(db: Dict[str, Any], job_id: str) -> Optional[Dict[str, Any]]:
-        for j in db.get("jobs", []):
-            if j.get("_id") == job_id:
-                return j
-        return None
+
+def open_jobstore(cfg) -> Any:
+    """
+    Abre o JobStore conforme a configuração (AppConfig):
+      - jobstore_backend = "json"   -> JobStore (arquivo JSON, padrão)
+      - jobstore_backend = "sqlite" -> SqliteJobStore (WAL)
+
+    Um jobstore_path terminado em .db/.sqlite/.sqlite3 também seleciona SQLite.
+    Com SQLite e jobstore_path apontando para um .json, o banco é criado ao lado
+    (mesmo nome, extensão .sqlite3) e o JSON legado é migrado na primeira abertura.
+    """
+    path = Path(getattr(cfg, "jobstore_path", None) or "./jobs_db.json")
+    backend = (getattr(cfg, "jobstore_backend", None) or "json").strip().lower()
+    if path.suffix.lower() in SQLITE_SUFFIXES:
+        backend = "sqlite"
+
+    log_max = int(getattr(cfg, "job_log_max_entries", 5000) or 0)
+    if backend == "json":
+        return JobStore(path=path, log_max_entries=log_max)
+    if backend == "sqlite":
+        from core.jobstore_sqlite import SqliteJobStore
+
+        if path.suffix.lower() in SQLITE_SUFFIXES:
+            db_path, legacy = path, path.with_suffix(".json")
+        else:
+            db_path, legacy = path.with_suffix(".sqlite3"), path
+        return SqliteJobStore(db_path, migrate_from=legacy, log_max_entries=log_max)
+    raise ValueError(f"jobstore_backend inválido: {backend}")
@@ -0,0 +1,986 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/jobstore_sqlite.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from core.job_archive import JobArchive
+from core.job_output import JobOutput
+from core.jobstore import (
+    CLAIM_PEEK, FAILED, HOST, SCHEDULE_STATE, STATUSES, _ChangeNotifier, _check_specs, _deps_state, _iso_in, _norm_level, _now_iso,
+    _orphan_reason, _resolve_depends_on, _retention_cutoffs, _trim_marker,
+)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    _id        TEXT PRIMARY KEY,
+    job_type   TEXT NOT NULL,
+    status     TEXT NOT NULL,
+    priority   INTEGER NOT NULL DEFAULT 0,
+    params     TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    error_msg  TEXT,
+    worker_id        TEXT,
+    heartbeat_at     TEXT,
+    lease_expires_at TEXT,
+    owner_pid        INTEGER,
+    owner_host       TEXT,
+    attempts         INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs(status, created_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_created ON jobs(created_at);
+CREATE TABLE IF NOT EXISTS job_counts (
+    status TEXT PRIMARY KEY,
+    n      INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS logs (
+    seq    INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts     TEXT NOT NULL,
+    level  TEXT NOT NULL,
+    msg    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_logs_job ON logs(job_id, seq);
+CREATE TABLE IF NOT EXISTS job_deps (
+    job_id TEXT NOT NULL,
+    dep_id TEXT NOT NULL,
+    PRIMARY KEY (job_id, dep_id)
+);
+CREATE INDEX IF NOT EXISTS ix_job_deps_dep ON job_deps(dep_id);
+CREATE TABLE IF NOT EXISTS schedules (
+    _id             TEXT PRIMARY KEY,
+    spec            TEXT NOT NULL,
+    enabled         INTEGER NOT NULL DEFAULT 1,
+    next_run        TEXT,
+    last_run        TEXT,
+    last_job_id     TEXT,
+    last_skipped_at TEXT,
+    error           TEXT,
+    created_at      TEXT NOT NULL,
+    updated_at      TEXT NOT NULL
+);
+"""
+
+# Criados depois das colunas novas existirem (bases antigas recebem ALTER TABLE antes).
+_SCHEMA_INDEXES = """
+CREATE INDEX IF NOT EXISTS ix_jobs_pending_queue ON jobs(priority, created_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS ix_jobs_status_updated ON jobs(status, updated_at);
+CREATE INDEX IF NOT EXISTS ix_jobs_fingerprint ON jobs(fingerprint, updated_at) WHERE fingerprint IS NOT NULL;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_count_ins AFTER INSERT ON jobs BEGIN
+    INSERT OR IGNORE INTO job_counts (status, n) VALUES (NEW.status, 0);
+    UPDATE job_counts SET n = n + 1 WHERE status = NEW.status;
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_count_del AFTER DELETE ON jobs BEGIN
+    UPDATE job_counts SET n = n - 1 WHERE status = OLD.status;
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_count_upd AFTER UPDATE OF status ON jobs
+WHEN NEW.status <> OLD.status BEGIN
+    UPDATE job_counts SET n = n - 1 WHERE status = OLD.status;
+    INSERT OR IGNORE INTO job_counts (status, n) VALUES (NEW.status, 0);
+    UPDATE job_counts SET n = n + 1 WHERE status = NEW.status;
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_version_ins AFTER INSERT ON jobs BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_version_del AFTER DELETE ON jobs BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_version_upd AFTER UPDATE OF status ON jobs
+WHEN NEW.status <> OLD.status BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'version';
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_deps_done AFTER UPDATE OF status ON jobs
+WHEN NEW.status = 'done' AND OLD.status <> 'done' BEGIN
+    UPDATE jobs SET status = 'pending', updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+    WHERE status = 'waiting'
+      AND _id IN (SELECT job_id FROM job_deps WHERE dep_id = NEW._id)
+      AND NOT EXISTS (SELECT 1 FROM job_deps d JOIN jobs u ON u._id = d.dep_id
+                      WHERE d.job_id = jobs._id AND u.status <> 'done');
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_deps_failed AFTER UPDATE OF status ON jobs
+WHEN NEW.status IN ('error', 'canceled', 'timeout') AND OLD.status <> NEW.status BEGIN
+    UPDATE jobs SET status = 'canceled', blocked_by = NEW._id,
+        error_msg = printf('dependência %s terminou em ''%s''', NEW._id, NEW.status),
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+    WHERE status = 'waiting' AND _id IN (SELECT job_id FROM job_deps WHERE dep_id = NEW._id);
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_deps_revive AFTER UPDATE OF status ON jobs
+WHEN NEW.status IN ('pending', 'waiting', 'running') AND OLD.status IN ('error', 'canceled', 'timeout') BEGIN
+    UPDATE jobs SET status = 'waiting', blocked_by = NULL, error_msg = NULL,
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+    WHERE status = 'canceled' AND blocked_by IS NOT NULL
+      AND _id IN (SELECT job_id FROM job_deps WHERE dep_id = NEW._id)
+      AND NOT EXISTS (SELECT 1 FROM job_deps d JOIN jobs u ON u._id = d.dep_id
+                      WHERE d.job_id = jobs._id AND u.status IN ('error', 'canceled', 'timeout'));
+END;
+CREATE TRIGGER IF NOT EXISTS tg_jobs_deps_del AFTER DELETE ON jobs BEGIN
+    UPDATE jobs SET status = 'canceled', blocked_by = OLD._id,
+        error_msg = printf('dependência %s removida da fila', OLD._id),
+        updated_at = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+    WHERE OLD.status <> 'done' AND status = 'waiting'
+      AND _id IN (SELECT job_id FROM job_deps WHERE dep_id = OLD._id);
+    DELETE FROM job_deps WHERE job_id = OLD._id OR dep_id = OLD._id;
+END;
+"""
+
+# Colunas guardadas como texto JSON (decodificadas em _row_to_job)
+_JSON_COLUMNS = ("params", "progress", "depends_on", "outputs", "attempt_history", "shards", "resources")
+
+# Colunas acrescentadas depois da primeira versão do schema: nome -> DDL
+_ADDED_COLUMNS = {
+    "priority": "ALTER TABLE jobs ADD COLUMN priority INTEGER NOT NULL DEFAULT 0",
+    "worker_id": "ALTER TABLE jobs ADD COLUMN worker_id TEXT",
+    "heartbeat_at": "ALTER TABLE jobs ADD COLUMN heartbeat_at TEXT",
+    "lease_expires_at": "ALTER TABLE jobs ADD COLUMN lease_expires_at TEXT",
+    "owner_pid": "ALTER TABLE jobs ADD COLUMN owner_pid INTEGER",
+    "owner_host": "ALTER TABLE jobs ADD COLUMN owner_host TEXT",
+    "attempts": "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    "progress": "ALTER TABLE jobs ADD COLUMN progress TEXT",
+    "cancel_requested": "ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0",
+    "depends_on": "ALTER TABLE jobs ADD COLUMN depends_on TEXT",
+    "blocked_by": "ALTER TABLE jobs ADD COLUMN blocked_by TEXT",
+    "fingerprint": "ALTER TABLE jobs ADD COLUMN fingerprint TEXT",
+    "outputs": "ALTER TABLE jobs ADD COLUMN outputs TEXT",
+    "cache_of": "ALTER TABLE jobs ADD COLUMN cache_of TEXT",
+    "run_after": "ALTER TABLE jobs ADD COLUMN run_after TEXT",
+    "attempt_history": "ALTER TABLE jobs ADD COLUMN attempt_history TEXT",
+    "shards": "ALTER TABLE jobs ADD COLUMN shards TEXT",
+    "resources": "ALTER TABLE jobs ADD COLUMN resources TEXT",
+}
+
+
+class SqliteJobStore:
+    """
+    JobStore em SQLite (modo WAL), com a mesma API pública do JobStore JSON.
+
+    Tabelas:
+      - jobs       : uma linha por job (params serializado em JSON; o claim grava
+                     owner_pid/owner_host e incrementa attempts, ver recover_orphaned);
+                     índices em (status, created_at), created_at e índices
+                     parciais dos pendentes por (priority, created_at) e dos
+                     resultados reaproveitáveis por fingerprint (find_cached)
+      - job_counts : contagem por status, mantida por triggers
+      - logs       : linhas de log por job (job_id, ts, level, msg), no máximo
+                     log_max_entries por job (as mais recentes; 0 = sem limite)
+      - job_deps   : arestas do grafo de dependências (job_id depende de dep_id),
+                     indexadas por dep_id; triggers liberam 'waiting' -> 'pending'
+                     quando a última dependência conclui, cancelam em cascata
+                     quando uma falha e reativam os dependentes cancelados (blocked_by)
+                     quando ela é reenfileirada (recursive_triggers ligado em cada conexão)
+      - schedules  : agendamentos recorrentes (core.job_schedule): definição em
+                     JSON (spec) e estado em colunas; fire_schedule enfileira uma
+                     ocorrência e avança next_run na mesma transação
+      - meta       : chave/valor interno (ex.: migração do JSON legado e a
+                     'version', incrementada por triggers a cada job
+                     inserido/removido/com status alterado)
+
+    Cada thread usa sua própria conexão; o WAL permite leituras concorrentes
+    com uma escrita em andamento. Escritas usam BEGIN IMMEDIATE, o que também
+    serializa vários processos na mesma máquina (claim_next é atômico entre eles).
+    O WAL depende de memória compartilhada: para workers em várias máquinas
+    sobre um compartilhamento de rede, use o backend JSON (lock via lockf).
+
+    Retenção: archive_finished() move jobs finalizados antigos para o arquivo
+    morto <db>.archive/AAAA-MM-DD.jsonl.gz (ver core.job_archive).
+    A saída completa dos scripts fica em <db>.output/<_id>.log.gz (self.output).
+
+    split_job (core.job_shards) insere as partes e liga o job original a elas
+    em job_deps na mesma transação em que ele volta a 'waiting'.
+
+    version()/wait_for_change() seguem a 'version' de meta: o próprio processo
+    é acordado ao fim de cada transação que a alterou; outros processos a
+    percebem por sondagem barata (uma linha de meta).
+
+    Migração: se 'migrate_from' apontar para um jobs_db.json existente, os
+    jobs e logs são importados uma única vez (registrado em meta).
+    """
+
+    def __init__(self, path: str | Path = "./jobs_db.sqlite3", *, migrate_from: str | Path | None = None,
+                 log_max_entries: int = 5000):
+        self.path = str(path)
+        self.archive = JobArchive(Path(self.path).with_suffix(".archive"))
+        self.output = JobOutput(Path(self.path).with_suffix(".output"))
+        self.log_max_entries = max(0, int(log_max_entries or 0))
+        self._log_lines: Dict[str, int] = {}  # entradas por job (estimativa local)
+        self._local = threading.local()
+        self._changes = _ChangeNotifier(self._db_version)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+        if migrate_from:
+            self._migrate_json(Path(migrate_from))
+
+    # ------------- API pública -------------
+    def add_job(self, job_type: str, params: Dict[str, Any], *, priority: int = 0,
+                depends_on: Iterable[str] = ()) -> str:
+        """Enfileira um job; com depends_on (ids), ele só executa depois que todos concluírem."""
+        return self.add_jobs([{"job_type": job_type, "params": params, "priority": priority,
+                               "depends_on": list(depends_on or ())}])[0]
+
+    def add_jobs(self, jobs: Iterable[Dict[str, Any]]) -> List[str]:
+        """
+        Enfileira vários jobs numa única transação.
+        Cada item: {"job_type": str, "params": dict, "priority": int (opcional),
+                    "ref": str (opcional), "depends_on": [...] (opcional)}.
+        depends_on aceita _id de jobs existentes, 'ref' ou índice de itens anteriores
+        do lote (um grafo de jobs enviado de uma vez). Retorna os ids na mesma ordem.
+        """
+        specs = list(jobs)
+        if not specs:
+            return []
+        with self._tx() as con:
+            return self._insert_jobs(con, specs)
+
+    def add_log(self, job_id: str, msg: str, level: str = "INFO") -> None:
+        self.add_logs([(job_id, msg, level)])
+
+    def add_logs(self, entries: Iterable[tuple]) -> None:
+        """Grava várias linhas de log numa transação: itens (job_id, msg) ou (job_id, msg, level)."""
+        rows = [
+            (e[0], _now_iso(), _norm_level(e[2] if len(e) > 2 else "INFO"), str(e[1]))
+            for e in entries
+        ]
+        if not rows:
+            return
+        with self._tx() as con:
+            con.executemany("INSERT INTO logs (job_id, ts, level, msg) VALUES (?, ?, ?, ?)", rows)
+            if self.log_max_entries:
+                added: Dict[str, int] = {}
+                for r in rows:
+                    added[r[0]] = added.get(r[0], 0) + 1
+                for job_id, n in added.items():
+                    self._cap_log(con, job_id, n)
+
+    def get_logs(self, job_id: str, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Lê os logs do job em ordem de gravação (offset/limit para paginação)."""
+        rows = self._conn().execute(
+            "SELECT ts, level, msg FROM logs WHERE job_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+            (job_id, -1 if limit is None else max(0, limit), max(0, offset)),
+        ).fetchall()
+        return [{"ts": r["ts"], "level": r["level"], "msg": r["msg"]} for r in rows]
+
+    def set_status(self, job_id: str, status: str, *, error_msg: Optional[str] = None,
+                   worker_id: Optional[str] = None, attempt: Optional[Dict[str, Any]] = None,
+                   resources: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Altera o status de um job. Com worker_id, só altera se o job ainda
+        pertence a esse worker (lease não foi perdido para outro processo).
+        attempt (opcional) é acrescentado ao histórico de tentativas (attempt_history);
+        resources (opcional) é o uso de recursos da execução (core.job_resources).
+        """
+        if status not in STATUSES:
+            raise ValueError(f"status inválido: {status}")
+        sql = (
+            "UPDATE jobs SET status = ?, updated_at = ?, error_msg = ?, "
+            "lease_expires_at = CASE WHEN ? = 'running' THEN lease_expires_at END "
+            "WHERE _id = ?"
+        )
+        args: list = [status, _now_iso(), error_msg or None, status, job_id]
+        if worker_id is not None:
+            sql += " AND status = 'running' AND worker_id = ?"
+            args.append(worker_id)
+        with self._tx() as con:
+            ok = con.execute(sql, args).rowcount > 0
+            if ok and attempt:
+                self._append_attempt(con, job_id, attempt)
+            if ok and resources:
+                con.execute("UPDATE jobs SET resources = ? WHERE _id = ?",
+                            (json.dumps(resources, ensure_ascii=False), job_id))
+            return ok
+
+    def retry_later(self, job_id: str, delay_s: float, *, error_msg: Optional[str] = None,
+                    attempt: Optional[Dict[str, Any]] = None, worker_id: str) -> bool:
+        """
+        Devolve um job 'running' deste worker para 'pending', só elegível para o
+        claim depois de delay_s segundos (run_after). attempt vai para o histórico.
+        """
+        with self._tx() as con:
+            ok = con.execute(
+                "UPDATE jobs SET status = 'pending', run_after = ?, updated_at = ?, error_msg = ?, "
+                "lease_expires_at = NULL WHERE _id = ? AND status = 'running' AND worker_id = ?",
+                (_iso_in(delay_s), _now_iso(), error_msg or None, job_id, worker_id),
+            ).rowcount > 0
+            if ok and attempt:
+                self._append_attempt(con, job_id, attempt)
+            return ok
+
+    def split_job(self, job_id: str, shards: Iterable[Dict[str, Any]], *, info: Dict[str, Any],
+                  worker_id: str) -> Optional[List[str]]:
+        """
+        Divide um job 'running' deste worker em partes (core.job_shards): enfileira
+        os itens de shards (como em add_jobs), troca em depends_on as partes de uma
+        divisão anterior pelas novas e devolve o job para 'waiting', com
+        shards = {**info, "ids": [...]}; quando as partes concluem, o trigger de
+        dependências o devolve à fila para a junção. A divisão não conta como
+        tentativa. None se o job não é mais deste worker.
+        """
+        specs = list(shards)
+        with self._tx() as con:
+            row = con.execute(
+                "SELECT depends_on, shards FROM jobs WHERE _id = ? AND status = 'running' AND worker_id = ?",
+                (job_id, worker_id),
+            ).fetchone()
+            if row is None:
+                return None
+            ids = self._insert_jobs(con, specs)
+            old = set((json.loads(row["shards"]) if row["shards"] else {}).get("ids") or ())
+            depends_on = [d for d in json.loads(row["depends_on"] or "[]") if d not in old] + ids
+            con.executemany("DELETE FROM job_deps WHERE job_id = ? AND dep_id = ?", [(job_id, d) for d in old])
+            con.executemany("INSERT OR IGNORE INTO job_deps (job_id, dep_id) VALUES (?, ?)",
+                            [(job_id, d) for d in ids])
+            con.execute(
+                "UPDATE jobs SET status = 'waiting', depends_on = ?, shards = ?, attempts = MAX(attempts - 1, 0), "
+                "error_msg = NULL, lease_expires_at = NULL, updated_at = ? WHERE _id = ?",
+                (json.dumps(depends_on), json.dumps({**info, "ids": ids}, ensure_ascii=False), _now_iso(), job_id),
+            )
+            return ids
+
+    def set_status_many(self, job_ids: Iterable[str], status: str, *, error_msg: Optional[str] = None) -> int:
+        """Altera o status de vários jobs numa única transação. Retorna quantos existiam."""
+        if status not in STATUSES:
+            raise ValueError(f"status inválido: {status}")
+        now = _now_iso()
+        rows = [(status, now, error_msg or None, status, jid) for jid in job_ids]
+        if not rows:
+            return 0
+        with self._tx() as con:
+            return con.executemany(
+                "UPDATE jobs SET status = ?, updated_at = ?, error_msg = ?, "
+                "lease_expires_at = CASE WHEN ? = 'running' THEN lease_expires_at END "
+                "WHERE _id = ?",
+                rows,
+            ).rowcount
+
+    def pop_next_pending(self) -> Optional[Dict[str, Any]]:
+        """
+        Retorna e marca como 'running' o job 'pending' de menor (priority, created_at).
+        Se não houver pendentes, retorna None.
+        """
+        return self._claim(None, 0)
+
+    def claim_next(self, worker_id: str, lease_seconds: float = 300.0, *,
+                   exclude_types: Iterable[str] = (),
+                   accept: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Como pop_next_pending, mas registra o lease do worker no job:
+        worker_id, heartbeat_at e lease_expires_at (agora + lease_seconds).
+        exclude_types pula tipos que o worker não pode assumir agora (limite por tipo).
+        accept(job), se dado, é consultado na ordem da fila e pega o primeiro job
+        aceito (ex.: dispositivo de armazenamento livre); roda fora da transação
+        de escrita, sobre leituras de CLAIM_PEEK pendentes por vez. Atômico entre processos.
+        """
+        return self._claim(worker_id, lease_seconds, tuple(exclude_types), accept)
+
+    def renew_lease(self, job_id: str, worker_id: str, lease_seconds: float = 300.0) -> bool:
+        """Heartbeat: estende o lease. False se o job não pertence mais ao worker."""
+        with self._tx() as con:
+            return con.execute(
+                "UPDATE jobs SET heartbeat_at = ?, lease_expires_at = ? "
+                "WHERE _id = ? AND status = 'running' AND worker_id = ?",
+                (_now_iso(), _iso_in(lease_seconds), job_id, worker_id),
+            ).rowcount > 0
+
+    def set_progress(self, updates: Dict[str, Dict[str, Any]], *, worker_id: str) -> int:
+        """
+        Grava o campo 'progress' de vários jobs numa única transação ({_id: progress},
+        ver core.job_progress). Só altera jobs 'running' deste worker; retorna quantos.
+        Não avança a 'version' (o painel relê jobs em execução periodicamente).
+        """
+        if not updates:
+            return 0
+        with self._tx() as con:
+            n = 0
+            for job_id, progress in updates.items():
+                n += con.execute(
+                    "UPDATE jobs SET progress = ? WHERE _id = ? AND status = 'running' AND worker_id = ?",
+                    (json.dumps(progress, ensure_ascii=False), job_id, worker_id),
+                ).rowcount
+            return n
+
+    def set_result(self, job_id: str, *, fingerprint: str, outputs: Dict[str, Any],
+                   cache_of: Optional[str] = None, worker_id: str) -> bool:
+        """
+        Registra o resultado reaproveitável de um job 'running' deste worker
+        (ver core.job_cache): fingerprint das entradas, resumo das saídas e,
+        se veio do cache, o _id do job de origem.
+        """
+        with self._tx() as con:
+            return con.execute(
+                "UPDATE jobs SET fingerprint = ?, outputs = ?, cache_of = ? "
+                "WHERE _id = ? AND status = 'running' AND worker_id = ?",
+                (fingerprint, json.dumps(outputs, ensure_ascii=False), cache_of, job_id, worker_id),
+            ).rowcount > 0
+
+    def find_cached(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Job 'done' mais recente com esse fingerprint ou None."""
+        row = self._conn().execute(
+            "SELECT * FROM jobs WHERE fingerprint = ? AND status = 'done' ORDER BY updated_at DESC LIMIT 1",
+            (fingerprint,),
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def requeue_expired_leases(self, *, max_attempts: int = 0) -> int:
+        """
+        Devolve para 'pending' os jobs 'running' cujo lease venceu. Retorna quantos.
+        Com max_attempts > 0, jobs que já somam essa quantidade de tentativas vão para 'error'.
+        """
+        if not self._count("running"):
+            return 0
+        now = _now_iso()
+        with self._tx() as con:
+            rows = con.execute(
+                "SELECT _id, worker_id, attempts FROM jobs "
+                "WHERE status = 'running' AND lease_expires_at IS NOT NULL AND lease_expires_at < ?",
+                (now,),
+            ).fetchall()
+            return self._recover(con, [(r, f"lease expirado (worker {r['worker_id']})") for r in rows],
+                                 max_attempts)
+
+    def recover_orphaned(self, *, stale_seconds: float = 300.0, max_attempts: int = 0) -> int:
+        """
+        Recuperação após queda: devolve para 'pending' os jobs 'running' cujo processo
+        dono (owner_pid/owner_host, gravados no claim) morreu nesta máquina, e os
+        legados sem dono nem lease parados há mais de stale_seconds. Cada claim
+        incrementa 'attempts'; com max_attempts > 0, quem atingiu o limite vai para 'error'.
+        Retorna quantos jobs foram recuperados.
+        """
+        if not self._count("running"):
+            return 0
+        stale_before = _iso_in(-stale_seconds)
+        with self._tx() as con:
+            rows = con.execute(
+                "SELECT _id, owner_pid, owner_host, lease_expires_at, updated_at, attempts FROM jobs "
+                "WHERE status = 'running' AND (owner_host = ? OR owner_pid IS NULL)",
+                (HOST,),
+            ).fetchall()
+            found = [(r, _orphan_reason(dict(r), stale_before)) for r in rows]
+            return self._recover(con, [(r, why) for r, why in found if why], max_attempts)
+
+    def version(self) -> int:
+        """Versão atual da base (avança a cada alteração de jobs, local ou de outro processo)."""
+        return self._changes.current()
+
+    def wait_for_change(self, since: Optional[int] = None, timeout: Optional[float] = None) -> int:
+        """
+        Bloqueia até a versão ser diferente de 'since' (padrão: a versão atual)
+        ou até 'timeout' segundos. Retorna a versão corrente.
+        """
+        return self._changes.wait(since, timeout)
+
+    def notify_change(self) -> None:
+        """Avança a versão e acorda quem espera em wait_for_change (ex.: ao parar o worker)."""
+        self._changes.bump()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """O job com esse _id ou None."""
+        row = self._conn().execute("SELECT * FROM jobs WHERE _id = ?", (job_id,)).fetchone()
+        return None if row is None else self._row_to_job(row)
+
+    def list_jobs(self, status: Optional[str] = None, *, job_type: Optional[str] = None,
+                  limit: Optional[int] = None, offset: int = 0, after_id: Optional[str] = None,
+                  include_params: bool = True) -> List[Dict[str, Any]]:
+        """
+        Lista jobs do mais recente para o mais antigo.
+          - status / job_type : filtros
+          - limit / offset    : paginação por deslocamento
+          - after_id          : paginação por cursor (keyset em created_at, rowid) — continua
+                                após o job com esse id; [] se ele não existir mais
+          - include_params    : False omite 'params' (listagens leves)
+        """
+        con = self._conn()
+        where, args = [], []
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if job_type:
+            where.append("job_type = ?")
+            args.append(job_type)
+        if after_id is not None:
+            ref = con.execute("SELECT created_at, rowid FROM jobs WHERE _id = ?", (after_id,)).fetchone()
+            if ref is None:
+                return []
+            where.append("(created_at, rowid) < (?, ?)")
+            args += [ref[0], ref[1]]
+        cols = "*" if include_params else ", ".join(c for c in self._columns() if c != "params")
+        sql = f"SELECT {cols} FROM jobs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, rowid DESC LIMIT ? OFFSET ?"
+        args += [-1 if limit is None else max(0, limit), max(0, offset)]
+        return [self._row_to_job(r) for r in con.execute(sql, args)]
+
+    def counts_by_status(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {st: 0 for st in STATUSES}
+        for row in self._conn().execute("SELECT status, n FROM job_counts"):
+            if row["status"] in counts:
+                counts[row["status"]] = row["n"]
+        return counts
+
+    def clear_by_status(self, status: str) -> int:
+        """
+        Remove permanentemente jobs com determinado status.
+        Retorna a quantidade removida. Também remove os logs desses jobs.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"status inválido: {status}")
+        with self._tx() as con:
+            ids = [r[0] for r in con.execute("SELECT _id FROM jobs WHERE status = ?", (status,))]
+            con.execute(
+                "DELETE FROM logs WHERE job_id IN (SELECT _id FROM jobs WHERE status = ?)", (status,)
+            )
+            n = con.execute("DELETE FROM jobs WHERE status = ?", (status,)).rowcount
+        for jid in ids:
+            self._log_lines.pop(jid, None)
+            self.output.remove(jid)
+        return n
+
+    def requeue_from_status(self, status: str) -> int:
+        """
+        Move jobs de um status para 'pending' ('waiting' se ainda houver dependências
+        por concluir; jobs com uma dependência que falhou ficam como estão).
+        Útil para reenfileirar 'error', 'done', 'canceled' ou 'timeout'.
+        Retorna quantos foram alterados.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"status inválido para requeue: {status}")
+        failed = ", ".join(f"'{st}'" for st in FAILED)
+        with self._tx() as con:
+            return con.execute(
+                "UPDATE jobs SET status = CASE WHEN EXISTS (SELECT 1 FROM job_deps d JOIN jobs u ON u._id = d.dep_id "
+                "WHERE d.job_id = jobs._id AND u.status <> 'done') THEN 'waiting' ELSE 'pending' END, "
+                "updated_at = ?, error_msg = NULL, attempts = 0, blocked_by = NULL, run_after = NULL "
+                "WHERE status = ? AND NOT EXISTS (SELECT 1 FROM job_deps d JOIN jobs u ON u._id = d.dep_id "
+                f"WHERE d.job_id = jobs._id AND u.status IN ({failed}))",
+                (_now_iso(), status),
+            ).rowcount
+
+    def archive_finished(self, retention_days: Dict[str, float], *, limit: int = 5000) -> int:
+        """
+        Move para o arquivo morto (self.archive) os jobs finalizados (FINISHED)
+        cujo updated_at é mais antigo que retention_days[status] dias.
+        Ex.: {"done": 30, "canceled": 30}; 0/None desativa o status.
+        No máximo 'limit' jobs por chamada. Retorna quantos foram arquivados.
+        """
+        cutoffs = _retention_cutoffs(retention_days)
+        if not cutoffs:
+            return 0
+        with self._tx() as con:
+            rows: List[sqlite3.Row] = []
+            for st, cut in cutoffs.items():
+                rows += con.execute(
+                    "SELECT * FROM jobs WHERE status = ? AND updated_at < ? ORDER BY updated_at LIMIT ?",
+                    (st, cut, max(0, limit - len(rows))),
+                ).fetchall()
+            if not rows:
+                return 0
+            entries = []
+            for r in rows:
+                logs = con.execute(
+                    "SELECT ts, level, msg FROM logs WHERE job_id = ? ORDER BY seq", (r["_id"],)
+                ).fetchall()
+                entries.append({"job": self._row_to_job(r), "logs": [dict(l) for l in logs]})
+            # grava (e sincroniza) o arquivo morto antes de remover da base viva
+            self.archive.append(entries)
+            ids = [(r["_id"],) for r in rows]
+            con.executemany("DELETE FROM logs WHERE job_id = ?", ids)
+            con.executemany("DELETE FROM jobs WHERE _id = ?", ids)
+        for (jid,) in ids:
+            self._log_lines.pop(jid, None)
+            self.output.move_to(jid, self.archive.output_dir)
+        return len(ids)
+
+    def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancela um job se estiver 'pending' ou 'waiting' (os dependentes dele também
+        são cancelados). Jobs 'running': ver cancel_running.
+        """
+        with self._tx() as con:
+            return con.execute(
+                "UPDATE jobs SET status = 'canceled', updated_at = ? "
+                "WHERE _id = ? AND status IN ('pending', 'waiting')",
+                (_now_iso(), job_id),
+            ).rowcount > 0
+
+    def cancel_running(self, job_id: str) -> bool:
+        """
+        Pede o cancelamento de um job 'running' (coluna cancel_requested). O worker
+        dono, em qualquer processo, encerra o script e grava 'canceled'.
+        """
+        with self._tx() as con:
+            return con.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE _id = ? AND status = 'running'", (job_id,)
+            ).rowcount > 0
+
+    def cancel_requests(self, job_ids: Iterable[str]) -> List[str]:
+        """Entre job_ids, os 'running' com cancelamento pedido (consultado pelo worker)."""
+        ids = list(job_ids)
+        if not ids:
+            return []
+        rows = self._conn().execute(
+            f"SELECT _id FROM jobs WHERE _id IN ({', '.join('?' * len(ids))}) "
+            "AND status = 'running' AND cancel_requested = 1",
+            ids,
+        )
+        return [r[0] for r in rows]
+
+    # ------------- Agendamentos (core.job_schedule) -------------
+    def add_schedule(self, spec: Dict[str, Any], next_run: str) -> str:
+        """Guarda a definição de um agendamento recorrente, ativo a partir de next_run."""
+        sid = str(uuid.uuid4())
+        now = _now_iso()
+        with self._tx() as con:
+            con.execute(
+                "INSERT INTO schedules (_id, spec, enabled, next_run, created_at, updated_at) VALUES (?, ?, 1, ?, ?, ?)",
+                (sid, json.dumps(spec, ensure_ascii=False), next_run, now, now),
+            )
+        return sid
+
+    def list_schedules(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT * FROM schedules ORDER BY created_at")
+        return [self._row_to_schedule(r) for r in rows]
+
+    def get_schedule(self, schedule_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM schedules WHERE _id = ?", (schedule_id,)).fetchone()
+        return None if row is None else self._row_to_schedule(row)
+
+    def update_schedule(self, schedule_id: str, spec: Optional[Dict[str, Any]] = None, **fields: Any) -> bool:
+        """Troca a definição (spec) e/ou campos de estado (SCHEDULE_STATE) de um agendamento."""
+        unknown = set(fields) - set(SCHEDULE_STATE)
+        if unknown:
+            raise ValueError(f"campo(s) de agendamento desconhecido(s): {', '.join(sorted(unknown))}")
+        if spec is not None:
+            fields["spec"] = json.dumps(spec, ensure_ascii=False)
+        fields["updated_at"] = _now_iso()
+        with self._tx() as con:
+            return con.execute(
+                f"UPDATE schedules SET {', '.join(f'{k} = ?' for k in fields)} WHERE _id = ?",
+                (*fields.values(), schedule_id),
+            ).rowcount > 0
+
+    def delete_schedule(self, schedule_id: str) -> bool:
+        with self._tx() as con:
+            return con.execute("DELETE FROM schedules WHERE _id = ?", (schedule_id,)).rowcount > 0
+
+    def fire_schedule(self, schedule_id: str, due: str, next_run: str,
+                      jobs: Iterable[Dict[str, Any]]) -> Optional[List[str]]:
+        """
+        Dispara a ocorrência 'due' de um agendamento: se ele está ativo e next_run
+        ainda é 'due' (nenhum outro worker a disparou), enfileira jobs (como em
+        add_jobs; vazio = ocorrência pulada) e avança next_run, numa única transação.
+        Retorna os ids, ou None se a ocorrência já não estava pendente.
+        """
+        specs = list(jobs)
+        with self._tx() as con:
+            now = _now_iso()
+            if not con.execute(
+                "UPDATE schedules SET next_run = ?, updated_at = ? WHERE _id = ? AND enabled = 1 AND next_run = ?",
+                (next_run, now, schedule_id, due),
+            ).rowcount:
+                return None
+            ids = self._insert_jobs(con, specs) if specs else []
+            if ids:
+                con.execute("UPDATE schedules SET last_run = ?, last_job_id = ? WHERE _id = ?",
+                            (now, ids[-1], schedule_id))
+            else:
+                con.execute("UPDATE schedules SET last_skipped_at = ? WHERE _id = ?", (now, schedule_id))
+            return ids
+
+    # ------------- Internos -------------
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            # isolation_level=None: transações controladas explicitamente em _tx()
+            con = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            con.execute("PRAGMA recursive_triggers=ON")  # cascata de depends_on (tg_jobs_deps_*)
+            self._local.con = con
+        return con
+
+    def _init_schema(self) -> None:
+        con = self._conn()
+        con.executescript(_SCHEMA)
+        cols = {r["name"] for r in con.execute("PRAGMA table_info(jobs)")}
+        with self._tx() as con:
+            for name, ddl in _ADDED_COLUMNS.items():
+                if name not in cols:
+                    con.execute(ddl)
+            # bases criadas antes de job_counts: inicializa a contagem uma única vez
+            if not con.execute("SELECT 1 FROM meta WHERE key = 'job_counts_ready'").fetchone():
+                con.execute("DELETE FROM job_counts")
+                con.execute("INSERT INTO job_counts (status, n) SELECT status, COUNT(*) FROM jobs GROUP BY status")
+                con.execute("INSERT INTO meta (key, value) VALUES ('job_counts_ready', '1')")
+            con.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+        con.executescript(_SCHEMA_INDEXES)
+
+    def _claim(self, worker_id: Optional[str], lease_seconds: float, exclude: tuple = (),
+               accept: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        if not self._count("pending"):
+            return None
+        skip = f" AND job_type NOT IN ({', '.join('?' * len(exclude))})" if exclude else ""
+        page = CLAIM_PEEK if accept else 1
+        offset = 0
+        while True:
+            # leitura fora da transação: accept (ex.: Worker._device_free) pode tocar o
+            # disco e não deve segurar o lock de escrita da base
+            rows = self._conn().execute(
+                "SELECT * FROM jobs WHERE status = 'pending' AND (run_after IS NULL OR run_after <= ?)"
+                f"{skip} ORDER BY priority, created_at LIMIT ? OFFSET ?",
+                (_now_iso(), *exclude, page, offset),
+            ).fetchall()
+            row = next((r for r in rows if accept is None or accept(self._row_to_job(r))), None)
+            if row is None:
+                if len(rows) < page:
+                    return None
+                offset += page
+                continue
+            job = self._take_pending(row["_id"], worker_id, lease_seconds)
+            if job is not None:
+                return job
+            offset = 0  # outro processo levou o candidato: lê de novo
+
+    def _take_pending(self, job_id: str, worker_id: Optional[str], lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Marca como 'running' o job escolhido por _claim, se ele ainda está pendente e elegível."""
+        with self._tx() as con:
+            now = _now_iso()
+            if not con.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ?, attempts = attempts + 1, "
+                "owner_pid = ?, owner_host = ?, progress = NULL, cancel_requested = 0, "
+                "fingerprint = NULL, outputs = NULL, cache_of = NULL, run_after = NULL, resources = NULL "
+                "WHERE _id = ? AND status = 'pending' AND (run_after IS NULL OR run_after <= ?)",
+                (now, os.getpid(), HOST, job_id, now),
+            ).rowcount:
+                return None
+            if worker_id is not None:
+                con.execute(
+                    "UPDATE jobs SET worker_id = ?, heartbeat_at = ?, lease_expires_at = ? WHERE _id = ?",
+                    (worker_id, now, _iso_in(lease_seconds), job_id),
+                )
+            return self._row_to_job(con.execute("SELECT * FROM jobs WHERE _id = ?", (job_id,)).fetchone())
+
+    @staticmethod
+    def _insert_jobs(con: sqlite3.Connection, specs: List[Dict[str, Any]]) -> List[str]:
+        """Insere os itens de add_jobs (dentro da transação con); retorna os ids."""
+        priorities = _check_specs(specs)
+        ids = [str(uuid.uuid4()) for _ in specs]
+        now = _now_iso()
+        new_status: Dict[str, str] = {}
+
+        def status_of(jid: str) -> Optional[str]:
+            if jid in new_status:
+                return new_status[jid]
+            row = con.execute("SELECT status FROM jobs WHERE _id = ?", (jid,)).fetchone()
+            return None if row is None else row[0]
+
+        deps = _resolve_depends_on(specs, ids, lambda jid: status_of(jid) is not None)
+        rows, edges = [], []
+        for jid, spec, dep, prio in zip(ids, specs, deps, priorities):
+            status, blocker = _deps_state(dep, status_of)
+            new_status[jid] = status
+            error_msg = f"dependência {blocker} terminou em '{status_of(blocker)}'" if blocker else None
+            rows.append((jid, spec["job_type"], status, prio,
+                         json.dumps(spec.get("params") or {}, ensure_ascii=False), now, now, error_msg,
+                         json.dumps(dep) if dep else None, blocker))
+            edges += [(jid, d) for d in dep]
+        con.executemany(
+            "INSERT INTO jobs (_id, job_type, status, priority, params, created_at, updated_at, error_msg, "
+            "depends_on, blocked_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        con.executemany("INSERT OR IGNORE INTO job_deps (job_id, dep_id) VALUES (?, ?)", edges)
+        return ids
+
+    @staticmethod
+    def _append_attempt(con: sqlite3.Connection, job_id: str, attempt: Dict[str, Any]) -> None:
+        row = con.execute("SELECT attempt_history FROM jobs WHERE _id = ?", (job_id,)).fetchone()
+        try:
+            history = json.loads(row[0]) if row and row[0] else []
+        except ValueError:
+            history = []
+        history.append(dict(attempt))
+        con.execute("UPDATE jobs SET attempt_history = ? WHERE _id = ?",
+                    (json.dumps(history, ensure_ascii=False), job_id))
+
+    def _recover(self, con: sqlite3.Connection, found: List[tuple], max_attempts: int) -> int:
+        """Tira jobs 'running' do dono perdido: found = [(row com _id/attempts, motivo)]."""
+        now = _now_iso()
+        logs = []
+        for r, reason in found:
+            attempts = int(r["attempts"] or 0)
+            if max_attempts and attempts >= max_attempts:
+                status, msg = "error", f"{reason}; abandonado após {attempts} tentativa(s)"
+                logs.append((r["_id"], now, "ERROR",
+                             f"Job recuperado ({reason}) e abandonado após {attempts} tentativa(s)"))
+            else:
+                status, msg = "pending", reason
+                logs.append((r["_id"], now, "WARN",
+                             f"Job recuperado ({reason}); reenfileirado após {attempts} tentativa(s)"))
+            con.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, error_msg = ?, lease_expires_at = NULL, "
+                "owner_pid = NULL, owner_host = NULL WHERE _id = ?",
+                (status, now, msg, r["_id"]),
+            )
+        con.executemany("INSERT INTO logs (job_id, ts, level, msg) VALUES (?, ?, ?, ?)", logs)
+        return len(found)
+
+    def _db_version(self) -> Optional[str]:
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return None if row is None else str(row[0])
+
+    def _cap_log(self, con: sqlite3.Connection, job_id: str, added: int) -> None:
+        """
+        Mantém no máximo log_max_entries entradas do job (ring buffer); só apaga
+        ao passar 25% do limite. A entrada de aviso reaproveita o seq da linha
+        descartada mais recente, ficando antes das que restaram.
+        """
+        n = self._log_lines.get(job_id)
+        if n is None:
+            n = con.execute("SELECT COUNT(*) FROM logs WHERE job_id = ?", (job_id,)).fetchone()[0]
+        else:
+            n += added
+        limit = self.log_max_entries
+        if n > limit + limit // 4:
+            row = con.execute(
+                "SELECT seq FROM logs WHERE job_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                (job_id, max(1, limit - 1)),
+            ).fetchone()
+            if row is not None:
+                dropped = con.execute("DELETE FROM logs WHERE job_id = ? AND seq <= ?", (job_id, row[0])).rowcount
+                m = _trim_marker(dropped, limit)
+                con.execute("INSERT INTO logs (seq, job_id, ts, level, msg) VALUES (?, ?, ?, ?, ?)",
+                            (row[0], job_id, m["ts"], m["level"], m["msg"]))
+                n = n - dropped + 1
+        self._log_lines[job_id] = n
+
+    def _columns(self) -> List[str]:
+        cols = getattr(self, "_cols", None)
+        if cols is None:
+            cols = self._cols = [r["name"] for r in self._conn().execute("PRAGMA table_info(jobs)")]
+        return cols
+
+    def _count(self, status: str) -> int:
+        row = self._conn().execute("SELECT n FROM job_counts WHERE status = ?", (status,)).fetchone()
+        return int(row["n"]) if row else 0
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        else:
+            con.execute("COMMIT")
+            self._changes.current()  # acorda quem espera, se a transação mudou a versão
+
+    def _migrate_json(self, src: Path) -> None:
+        """Importa jobs_db.json legado (uma única vez)."""
+        if not src.exists():
+            return
+        with self._tx() as con:
+            if con.execute("SELECT 1 FROM meta WHERE key = 'migrated_from_json'").fetchone():
+                return
+            try:
+                data = json.loads(src.read_text(encoding="utf-8"))
+            except Exception:
+                data = {}
+            cols = {r["name"] for r in con.execute("PRAGMA table_info(jobs)")}
+            for j in data.get("jobs", []):
+                if not j.get("_id"):
+                    continue
+                row = {k: v for k, v in j.items() if k in cols}
+                row["job_type"] = j.get("job_type", "")
+                row["status"] = j.get("status") if j.get("status") in STATUSES else "pending"
+                row["priority"] = int(j.get("priority") or 0)
+                row["created_at"] = j.get("created_at") or _now_iso()
+                row["updated_at"] = j.get("updated_at") or row["created_at"]
+                row.setdefault("params", {})
+                for k in _JSON_COLUMNS:
+                    if k in row:
+                        row[k] = json.dumps(row[k], ensure_ascii=False)
+                con.execute(
+                    f"INSERT OR IGNORE INTO jobs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                    list(row.values()),
+                )
+                con.executemany("INSERT OR IGNORE INTO job_deps (job_id, dep_id) VALUES (?, ?)",
+                                [(j["_id"], d) for d in j.get("depends_on") or ()])
+            for jid, entries in self._legacy_logs(src, data):
+                con.executemany(
+                    "INSERT INTO logs (job_id, ts, level, msg) VALUES (?, ?, ?, ?)",
+                    [(jid, e.get("ts", ""), e.get("level", "INFO"), str(e.get("msg", ""))) for e in entries],
+                )
+            con.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                (json.dumps({"path": str(src.resolve()), "at": _now_iso()}),),
+            )
+
+    @staticmethod
+    def _legacy_logs(src: Path, data: Dict[str, Any]) -> Iterator[tuple[str, List[Dict[str, Any]]]]:
+        """Logs do JobStore JSON: seção "logs" embutida (antiga) ou <jobs_db>.logs/<_id>.jsonl."""
+        yield from (data.get("logs") or {}).items()
+        logs_dir = src.with_suffix(".logs")
+        if not logs_dir.is_dir():
+            return
+        for p in sorted(logs_dir.glob("*.jsonl")):
+            entries = []
+            with p.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except Exception:
+                        continue
+            yield p.stem, entries
+
+    @staticmethod
+    def _row_to_schedule(row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        try:
+            spec = json.loads(data.pop("spec") or "{}")
+        except ValueError:
+            spec = {}
+        data["enabled"] = bool(data["enabled"])
+        return {"_id": data.pop("_id"), **spec, **data}
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        for k in _JSON_COLUMNS:
+            if k not in job:
+                continue
+            try:
+                job[k] = json.loads(job[k]) if job[k] is not None else None
+            except Exception:
+                job[k] = None
+        if "params" in job and job["params"] is None:
+            job["params"] = {}
+        return job
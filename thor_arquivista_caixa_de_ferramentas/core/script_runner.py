@@ -0,0 +1,207 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/script_runner.py
+"""
+Execução "quente" dos scripts de scripts/ via main(argv), sem pagar a partida
+do interpretador e os imports a cada job.
+
+Um processo servidor (multiprocessing "forkserver") é iniciado uma vez, com os
+módulos dos scripts já importados (inclusive os pesados, como pandas no
+duplicate_finder). Cada job é um fork desse processo quente: roda
+<script>.main(argv) com stdout/stderr ligados a pipes lidos pelo Worker, e o
+código de saída vem de sys.exit/return de main. Continua isolado (um processo
+por job), mas a partida custa só um fork. Ao terminar main, o filho manda ao
+Worker o próprio uso de recursos (core.job_resources.self_usage), lido em
+WarmProcess.usage().
+
+Disponível em sistemas POSIX; no Windows (sem fork) o Worker usa subprocess.
+"""
+from __future__ import annotations
+
+import importlib
+import io
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import types
+from contextlib import contextmanager
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional
+
+from core.io_policy import IoPolicy, apply_priority
+from core.job_progress import ENV_FD as PROGRESS_FD_ENV
+from core.job_resources import self_usage
+
+# Lido na importação deste módulo dentro do forkserver (primeiro item do preload)
+_SCRIPTS_DIR_ENV = "THOR_SCRIPTS_DIR"
+
+# Módulo __main__ vazio, exposto ao multiprocessing enquanto um job é lançado
+_BLANK_MAIN = types.ModuleType("__main__")
+_main_lock = threading.Lock()
+
+if os.environ.get(_SCRIPTS_DIR_ENV) and os.environ[_SCRIPTS_DIR_ENV] not in sys.path:
+    sys.path.insert(0, os.environ[_SCRIPTS_DIR_ENV])
+
+
+def warm_available() -> bool:
+    return "forkserver" in multiprocessing.get_all_start_methods()
+
+
+class WarmProcess:
+    """Job num fork do processo quente; imita o Popen usado pelo Worker (pid, stdout, stderr, wait)."""
+
+    def __init__(self, proc, out_conn, err_conn, usage_conn=None):
+        self._proc = proc
+        self._conns = tuple(c for c in (out_conn, err_conn, usage_conn) if c is not None)
+        self._usage_conn = usage_conn
+        self.pid: Optional[int] = proc.pid
+        self.stdout: IO[str] = open(out_conn.fileno(), "r", encoding="utf-8", errors="replace", closefd=False)
+        self.stderr: IO[str] = open(err_conn.fileno(), "r", encoding="utf-8", errors="replace", closefd=False)
+
+    def poll(self) -> Optional[int]:
+        return self._proc.exitcode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        self._proc.join(timeout)
+        if self._proc.exitcode is None:
+            raise subprocess.TimeoutExpired(self._proc.name, timeout)
+        return self._proc.exitcode
+
+    def usage(self) -> Optional[Dict[str, float]]:
+        """Uso de recursos informado pelo filho ao terminar main() (None se ele foi morto antes)."""
+        try:
+            if self._usage_conn is not None and self._usage_conn.poll():
+                return self._usage_conn.recv()
+        except (EOFError, OSError):
+            pass
+        return None
+
+    def send_signal(self, sig: int) -> None:
+        os.kill(self.pid, sig)
+
+    def kill(self) -> None:
+        self._proc.kill()
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self._proc.exitcode
+
+    def __enter__(self) -> "WarmProcess":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for f in (self.stdout, self.stderr):
+            f.close()
+        for c in self._conns:
+            c.close()
+        self._proc.join()
+
+
+class ScriptPool:
+    """
+    Servidor quente dos scripts. modules = módulos pré-importados (nome do
+    arquivo, com ou sem .py); módulos que não importam (dependência ausente) são ignorados
+    no preload e importados no fork, como num subprocess.
+    """
+
+    def __init__(self, scripts_dir: str | Path, modules: List[str]):
+        self.scripts_dir = str(Path(scripts_dir).resolve())
+        self.modules = list(dict.fromkeys(Path(m).stem for m in modules))
+        self._ctx = multiprocessing.get_context("forkserver")
+        os.environ[_SCRIPTS_DIR_ENV] = self.scripts_dir
+        self._ctx.set_forkserver_preload([__name__] + self.modules)
+
+    def warm_up(self) -> None:
+        """Sobe o servidor (e os imports) antes do primeiro job."""
+        from multiprocessing import forkserver
+
+        forkserver.ensure_running()
+
+    def start(self, script_name: str, argv: List[str], *, progress_fd: Optional[int] = None,
+              env: Optional[Dict[str, str]] = None, io_policy: Optional[IoPolicy] = None) -> WarmProcess:
+        """
+        Executa o script num fork do servidor. progress_fd: ponta de escrita do
+        canal de progresso (core.job_progress), repassada ao filho como THOR_PROGRESS_FD.
+        env: variáveis acrescentadas ao ambiente do filho; io_policy: prioridade de CPU/E-S
+        (core.io_policy), aplicada no filho antes de main.
+        """
+        module = Path(script_name).stem
+        out_r, out_w = self._ctx.Pipe(duplex=False)
+        err_r, err_w = self._ctx.Pipe(duplex=False)
+        usage_r, usage_w = self._ctx.Pipe(duplex=False)
+        prog_w = None if progress_fd is None else Connection(os.dup(progress_fd), readable=False)
+        proc = self._ctx.Process(target=_run_script, args=(module, list(argv), out_w, err_w, prog_w, dict(env or {}), io_policy, usage_w),
+                                 name=f"thor-{module}", daemon=True)
+        try:
+            with _hidden_main():
+                proc.start()
+        finally:
+            for c in (out_w, err_w, prog_w, usage_w):
+                if c is not None:
+                    c.close()
+        return WarmProcess(proc, out_r, err_r, usage_r)
+
+
+@contextmanager
+def _hidden_main() -> Iterator[None]:
+    """
+    Esconde o __main__ do processo hospedeiro (GUI, worker) durante proc.start():
+    sem isso o multiprocessing reexecuta esse módulo em cada filho (como __mp_main__),
+    importando tkinter/painéis ou, sem guarda __main__, subindo outro Worker.
+    """
+    with _main_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = _BLANK_MAIN
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
+
+
+def _run_script(module: str, argv: List[str], out_conn, err_conn, prog_conn=None,
+                env: Optional[Dict[str, str]] = None, io_policy: Optional[IoPolicy] = None,
+                usage_conn=None) -> None:
+    """No processo filho: liga fd 1/2 aos pipes, executa <module>.main(argv) e informa o uso de recursos."""
+    os.setsid()  # grupo de processos próprio: o Worker encerra o job inteiro (killpg)
+    os.dup2(out_conn.fileno(), 1)
+    os.dup2(err_conn.fileno(), 2)
+    out_conn.close()
+    err_conn.close()
+    if prog_conn is not None:
+        fd = os.dup(prog_conn.fileno())  # fd próprio, fechado pelo script (pd_progress)
+        prog_conn.close()
+        os.environ[PROGRESS_FD_ENV] = str(fd)
+    else:
+        os.environ.pop(PROGRESS_FD_ENV, None)
+    sys.stdout = io.TextIOWrapper(io.FileIO(1, "w", closefd=False), encoding="utf-8", line_buffering=True)
+    sys.stderr = io.TextIOWrapper(io.FileIO(2, "w", closefd=False), encoding="utf-8", line_buffering=True)
+    os.environ.update(env or {})
+    if io_policy is not None and not apply_priority(io_policy):
+        print(f"[aviso] prioridade de E/S não aplicada por completo ({io_policy.describe()})", file=sys.stderr)
+    sys.argv = [f"{module}.py", *argv]
+    try:
+        rc = importlib.import_module(module).main(argv)
+    finally:
+        if usage_conn is not None:
+            try:
+                usage_conn.send(self_usage())
+            except Exception:
+                pass  # sem o número exato, o Worker usa as amostras de /proc
+    sys.exit(rc if isinstance(rc, int) else 0)
@@ -225,6 +225,9 @@ def get_scripts_map() -> ScriptsMap:
                 "--algo", p.get("algo", "sha256"),
                 *(["--progress"] if p.get("progress") else []),
                 *(["--ignore-hidden"] if p.get("ignore_hidden") else []),
+                # parte de um job dividido (core/job_shards.py)
+                *[f"--subpasta={d}" for d in p.get("subpastas") or ()],
+                *(["--arquivos-raiz"] if p.get("arquivos_raiz") else []),
             ]
         ),
         "VERIFY_FIXITY": (
@@ -234,6 +237,7 @@ def get_scripts_map() -> ScriptsMap:
                 "--manifesto", p["manifesto"],
                 *(["--report-extras"] if p.get("report_extras") else []),
                 *(["--progress"] if p.get("progress") else []),
+                *(["--resultado-json", p["resultado_json"]] if p.get("resultado_json") else []),
             ]
         ),                
         "BUILD_BAG": (
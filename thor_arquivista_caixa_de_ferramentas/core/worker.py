@@ -15,9 +15,28 @@
 # Caso contrário, veja <https://www.gnu.org/licenses/>.
 
 # core/worker.py
+"""
+Worker da fila de jobs (ver Worker) e o daemon sem interface gráfica, para
+servidores sem tela e para espalhar consumidores da mesma fila por várias
+máquinas. Não importa tkinter/ttkbootstrap/Pillow: sobe em uma fração de segundo.
+
+Uso via linha de comando:
+  python -m core.worker --config preservacao_app.json [--worker-id ID] [--concurrency N] [--drain-timeout S]
+                        [--api [host:porta|unix:/caminho]]
+
+SIGTERM ou SIGINT (Ctrl+C): para de pegar jobs e espera os em execução
+terminarem (drenagem); um segundo sinal, ou o fim de --drain-timeout, encerra
+os scripts e devolve esses jobs à fila para outro worker retomar.
+"""
 from __future__ import annotations
 
+import argparse
+import os
+import signal
 import sys
+import time
+import uuid
+import socket
 import subprocess
 import threading
 import traceback
@@ -26,31 +45,164 @@ from datetime import datetime
 from typing import Dict, Any, Tuple,  List, Optional
 
 from core.config import AppConfig
-from core.jobstore import JobStore
+from core.job_cache import job_fingerprint, output_digests, reuse_outputs
+from core.devices import job_devices
+from core.io_policy import IoPolicy, apply_priority, io_policies, priority_hook
+from core.job_resources import ResourceMeter, describe as describe_resources, reap
+from core.job_retry import RetryPolicy, retry_policies
+from core.job_schedule import run_due
+from core.job_shards import MERGE_SCRIPT, ShardPolicy, merge_command, plan_shards, shard_policies
+from core.jobstore import JobStore, _now_iso
+from core.job_output import LiveLog
+from core.job_progress import ProgressChannel, ProgressTracker
+from core.script_runner import ScriptPool, warm_available
 from core.scripts_map import get_scripts_map
 from negocio.premis import append_event, event_type_for_job, guess_object_id
 
 
+IDLE_WAIT_S = 5.0  # espera máxima por mudanças na fila ociosa
+PROGRESS_FLUSH_S = 2.0  # intervalo entre gravações do progresso dos jobs no JobStore
+SCHEDULE_POLL_S = 10.0  # intervalo entre consultas aos agendamentos recorrentes
+
+
 class Worker:
     """
-    Worker de fila local (JobStore JSON), que:
+    Worker de fila local (JobStore JSON ou SQLite), que:
       - consome jobs 'pending'
-      - executa scripts via subprocess
+      - executa scripts via main(argv) num processo quente (core.script_runner,
+        cfg.job_exec_mode = "warm", padrão onde há fork) ou via subprocess
+        (job_exec_mode = "subprocess", isolamento total / Windows)
       - registra logs no JobStore e eventos PREMIS no JSONL
 
+    A saída dos scripts é lida em streaming, com memória limitada: tudo vai
+    para o arquivo comprimido do job (JobStore.output) e, enquanto o job roda,
+    para o log do job em lotes (core.job_output.LiveLog), para acompanhar ao
+    vivo. As últimas cfg.job_log_tail_lines linhas de stderr viram error_msg.
+
     Agora com APIs de gestão de fila:
       - pause()/resume()/is_paused()
       - clear_pending()
       - requeue_errors()
       - requeue_all()
       - cancel_job(job_id)
+      - interrupt_running()
       - list_jobs(status=None)
       - counts_by_status()
+
+    Vários Workers (em processos ou máquinas diferentes) podem consumir a mesma
+    fila: cada um tem um worker_id, pega jobs com claim_next (lease) e renova o
+    lease por heartbeat enquanto o script roda. Jobs de workers que morreram
+    voltam para 'pending' quando o lease vence ou, se o processo dono era desta
+    máquina, já na partida do Worker (recover_orphaned), até cfg.job_max_attempts
+    tentativas.
+
+    Pool: até cfg.worker_concurrency jobs rodam ao mesmo tempo, cada um numa
+    thread; cfg.job_type_limits limita tipos específicos (ex.: {"REPLICATE": 1,
+    "HASH_MANIFEST": 2}; tipo ausente = só o limite geral). pause() deixa de
+    pegar jobs novos; stop() também, e espera os que estão rodando.
+
+    Cancelamento e tempo limite: cada job roda no seu próprio grupo de
+    processos. cancel_running(job_id) — ou JobStore.cancel_running, vindo de
+    outro processo e percebido em até PROGRESS_FLUSH_S — e o tempo limite do
+    tipo (cfg.job_timeouts, segundos) mandam SIGTERM ao grupo e, após
+    cfg.job_kill_grace_s, SIGKILL; o job termina 'canceled' ou 'timeout' e a
+    vaga é liberada. Os scripts tratam o SIGTERM (scripts/pd_cancel.py) para
+    apagar saídas parciais.
+
+    Dependências: jobs com depends_on ficam 'waiting' no JobStore e viram
+    'pending' quando a última dependência conclui (ou são cancelados se ela
+    falha); o status final gravado por _finish já dispara essa propagação e
+    acorda o despachante, que roda os ramos independentes em vagas paralelas.
+
+    Novas tentativas: com uma política em cfg.job_retry para o tipo (ou "*"),
+    uma falha transitória (código de saída ou padrão no stderr, ver
+    core.job_retry) devolve o job à fila com backoff exponencial e jitter
+    (JobStore.retry_later) até max_attempts execuções; cada tentativa fica no
+    attempt_history do job.
+
+    Cache de resultados: para os tipos em cfg.job_cache_types (ex.:
+    HASH_MANIFEST, FORMAT_IDENTIFY), o Worker calcula antes de executar o
+    fingerprint do job (tipo, params e tamanhos/mtimes das entradas, ver
+    core.job_cache). Se um job 'done' anterior tem o mesmo fingerprint e a saída
+    dele continua íntegra, o job novo conclui na hora apontando para ela
+    (cache_of), sem rodar o script nem gerar evento PREMIS.
+
+    Dispositivos: com cfg.device_max_jobs (ou device_job_limits), os caminhos
+    dos jobs pesados de E/S (cfg.io_heavy_types; raiz, fonte, destinos, src,
+    dst) são associados ao disco ou servidor de rede por trás deles
+    (core.devices) e o Worker não põe mais que o limite de jobs por
+    dispositivo: claim_next pula os que cairiam num dispositivo ocupado e pega
+    o próximo da fila, ocupando os discos livres.
+
+    Divisão: cfg.job_shards (core.job_shards) divide jobs grandes de
+    HASH_MANIFEST (por subpasta do primeiro nível) e VERIFY_FIXITY (por faixas
+    de linhas do manifesto) em partes que a fila roda em paralelo, em qualquer
+    vaga ou máquina; o job original espera por elas e, ao voltar, junta as
+    partes (scripts/merge_shards.py) na saída que o script teria gerado.
+
+    E/S: cfg.job_io define por tipo (ou "*") nice, classe de E/S (ionice) e
+    teto de banda em MB/s, com janelas de horário (core.io_policy); a
+    prioridade é aplicada ao processo do job e o teto segue para o script em
+    THOR_IO_LIMIT, onde um token bucket o aplica nos laços de leitura/cópia
+    (scripts/pd_throttle.py).
+
+    Progresso: os scripts que usam scripts/pd_progress.py mandam linhas JSON
+    por um canal próprio (core.job_progress); o Worker calcula percentual,
+    vazão e ETA e grava o campo 'progress' dos jobs em execução, em lote, a
+    cada PROGRESS_FLUSH_S segundos (JobStore.set_progress).
+
+    Recursos: o uso de CPU, pico de memória e bytes lidos/gravados de cada
+    execução (core.job_resources) vai para o log e para o campo 'resources' do
+    job, gravado com o status final.
+
+    Ociosa, a fila não é sondada: o Worker bloqueia em
+    JobStore.wait_for_change até um job ser enfileirado (ou IDLE_WAIT_S passar,
+    para as tarefas periódicas abaixo).
+
+    Agendamentos: a cada SCHEDULE_POLL_S, a thread de acompanhamento enfileira
+    as execuções vencidas dos agendamentos recorrentes (core.job_schedule.run_due),
+    mesmo com a fila ocupada; vários workers não duplicam uma ocorrência.
+
+    Com a fila ociosa, o Worker também compacta a base: jobs finalizados além
+    de cfg.job_retention_days vão para o arquivo morto (JobStore.archive_finished).
     """
 
     def __init__(self, cfg: AppConfig, jobstore: JobStore):
         self.cfg = cfg
         self.jobstore = jobstore
+        self.worker_id = (getattr(cfg, "worker_id", "") or
+                          f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+        self.lease_seconds = float(getattr(cfg, "job_lease_seconds", 300) or 300)
+        self.max_attempts = int(getattr(cfg, "job_max_attempts", 3) or 0)
+        self.concurrency = max(1, int(getattr(cfg, "worker_concurrency", 1) or 1))
+        self.type_limits: Dict[str, int] = {k: int(v) for k, v in
+                                            (getattr(cfg, "job_type_limits", None) or {}).items() if v}
+        self.timeouts: Dict[str, float] = {k: float(v) for k, v in
+                                           (getattr(cfg, "job_timeouts", None) or {}).items() if v}
+        self.kill_grace = float(getattr(cfg, "job_kill_grace_s", 30) or 30)
+        self.cache_types = frozenset(getattr(cfg, "job_cache_types", None) or ())
+        self.retry: Dict[str, RetryPolicy] = retry_policies(getattr(cfg, "job_retry", None))
+        self.io: Dict[str, IoPolicy] = io_policies(getattr(cfg, "job_io", None))
+        self.shards: Dict[str, ShardPolicy] = shard_policies(getattr(cfg, "job_shards", None))
+        self.device_max = int(getattr(cfg, "device_max_jobs", 0) or 0)
+        self.device_limits: Dict[str, int] = {k: int(v) for k, v in
+                                              (getattr(cfg, "device_job_limits", None) or {}).items()}
+        self.io_heavy = frozenset(getattr(cfg, "io_heavy_types", None) or ())
+        self._job_devices: Dict[str, List[str]] = {}  # _id -> dispositivos dos jobs pesados em execução
+        self._active: Dict[str, tuple] = {}  # _id -> (job_type, thread) dos jobs em execução
+        self._procs: Dict[str, Any] = {}     # _id -> processo do script (Popen/WarmProcess)
+        self._meters: Dict[str, ResourceMeter] = {}  # _id -> medição de recursos do job em execução
+        self._kill_reason: Dict[str, str] = {}  # _id -> 'canceled' | 'timeout' (encerrado pelo worker)
+        self._slots_lock = threading.Lock()
+        self._slot_freed = threading.Event()
+        self._premis_lock = threading.Lock()
+        self._progress: Dict[str, Dict[str, Any]] = {}  # progresso ainda não gravado, por _id
+        self._progress_lock = threading.Lock()
+        self._hb_done = threading.Event()
+        self._last_reap = 0.0
+        self._next_retry = 0.0  # monotonic da próxima nova tentativa agendada (retry_later)
+        self._last_compact = 0.0
+        self._next_schedule = 0.0  # monotonic da próxima consulta aos agendamentos
         self._stop_event = threading.Event()
 #        self._thread: threading.Thread | None = None
         self._pause_event = threading.Event()
@@ -59,17 +211,29 @@ class Worker:
 
         # Carrega o mapeamento de scripts de um módulo separado
         self._scripts = get_scripts_map()
+        self._pool: Optional[ScriptPool] = None
+        if (getattr(cfg, "job_exec_mode", "warm") or "warm") == "warm" and warm_available():
+            self._pool = ScriptPool(cfg.scripts_dir, [name for name, _ in self._scripts.values()] + [MERGE_SCRIPT])
 
     # ---------------- Lifecycle ----------------
     def start(self, *, daemon: bool = True) -> None:
         if self._thread and self._thread.is_alive():
             return
         self._stop_event.clear()
+        if self._pool is not None:
+            try:
+                self._pool.warm_up()
+            except Exception:
+                traceback.print_exc()
+                self._pool = None  # segue com subprocess
         self._thread = threading.Thread(target=self._loop, daemon=daemon)
         self._thread.start()
 
     def stop(self) -> None:
+        """Para de pegar jobs; os que estão em execução terminam (is_alive até lá)."""
         self._stop_event.set()
+        self._slot_freed.set()
+        self.jobstore.notify_change()  # acorda o loop se estiver esperando a fila
 
     def join(self, timeout: float | None = None) -> None:
         if self._thread:
@@ -84,18 +248,28 @@ class Worker:
 
     def resume(self) -> None:
         self._pause_event.clear()
+        self.jobstore.notify_change()
 
     def is_paused(self) -> bool:
         return self._pause_event.is_set()
 
     # ---------------- Queue management ----------------
-    def list_jobs(self, status: str | None = None) -> List[Dict[str, Any]]:
-        """Lista jobs; se status for informado, filtra por ele."""
-        return self.jobstore.list_jobs(status=status)
+    def list_jobs(self, status: str | None = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        """Lista jobs; se status for informado, filtra por ele (demais filtros/paginação: JobStore.list_jobs)."""
+        return self.jobstore.list_jobs(status=status, **kwargs)
 
     def counts_by_status(self) -> Dict[str, int]:
         return self.jobstore.counts_by_status()
 
+    def active_jobs(self) -> Dict[str, str]:
+        """Jobs em execução neste worker: _id -> job_type."""
+        with self._slots_lock:
+            return {jid: jtype for jid, (jtype, _) in self._active.items()}
+
+    def active_count(self) -> int:
+        with self._slots_lock:
+            return len(self._active)
+
     def clear_pending(self) -> int:
         """Remove todos os jobs 'pending'. Retorna quantos removeu."""
         return self.jobstore.clear_by_status('pending')
@@ -113,9 +287,9 @@ class Worker:
         return self.jobstore.requeue_from_status('error')
 
     def requeue_all(self) -> int:
-        """Reenfileira jobs com status em ['error','done','canceled'] para 'pending'."""
+        """Reenfileira jobs com status em ['error','done','canceled','timeout'] para 'pending'."""
         n = 0
-        for st in ('error', 'done', 'canceled'):
+        for st in ('error', 'done', 'canceled', 'timeout'):
             n += self.jobstore.requeue_from_status(st)
         return n
 
@@ -123,64 +297,581 @@ class Worker:
         """Cancela um job (se estiver pending, marca como canceled)."""
         return self.jobstore.cancel_job(job_id)
 
+    def cancel_running(self, job_id: str) -> bool:
+        """
+        Cancela um job em execução: se roda neste worker, encerra o grupo de
+        processos na hora; senão, registra o pedido para o worker dono.
+        """
+        requested = self.jobstore.cancel_running(job_id)
+        return self._terminate(job_id, "canceled") or requested
+
+    def interrupt_running(self) -> int:
+        """
+        Encerra os scripts em execução neste worker e devolve os jobs à fila
+        ('pending'), para outro worker retomá-los — desligamento sem esperar o
+        fim deles. Retorna quantos foram interrompidos.
+        """
+        return sum(1 for jid in self.active_jobs() if self._terminate(jid, "shutdown"))
+
     # ---------------- Internals ----------------
     def _loop(self) -> None:
-        while not self._stop_event.is_set():
-            # respeita pausa
-            if self._pause_event.is_set():
-                self._stop_event.wait(0.3)
-                continue
-
-            job = self.jobstore.pop_next_pending()
-            if not job:
-                self._stop_event.wait(0.5)
-                continue
-
-            jid = job["_id"]
-            jtype = job["job_type"]
-            params = job.get("params", {})
-            self.jobstore.add_log(jid, f"Iniciando job {jtype}")
-
-            try:
-                rc, out, err = self._execute(jtype, params)
-
-                if out:
-                    self.jobstore.add_log(jid, out[:2000])
-                if err:
-                    self.jobstore.add_log(jid, err[:2000], level="ERROR" if rc else "INFO")
-
-                if jtype != "PREMIS_EVENT":
+        """Despacha jobs enquanto houver vagas; ao parar, espera os que estão em execução."""
+        self._recover_orphans()
+        self._hb_done = threading.Event()
+        threading.Thread(target=self._heartbeat_loop, args=(self._hb_done,), daemon=True).start()
+        threading.Thread(target=self._watch_loop, args=(self._hb_done,), daemon=True).start()
+        try:
+            while not self._stop_event.is_set():
+                # respeita pausa (jobs já em execução continuam)
+                if self._pause_event.is_set():
+                    self._stop_event.wait(0.3)
+                    continue
+                if self.active_count() >= self.concurrency:
+                    self._slot_freed.wait(IDLE_WAIT_S)
+                    self._slot_freed.clear()
+                    continue
+
+                version = self.jobstore.version()
+                job = self.jobstore.claim_next(self.worker_id, lease_seconds=self.lease_seconds,
+                                               exclude_types=self._saturated_types(),
+                                               accept=self._device_free if self._device_aware() else None)
+                if not job:
+                    self._reap_expired_leases()
+                    self._compact()
+                    if not self._stop_event.is_set():
+                        # acorda a tempo da próxima nova tentativa agendada por este worker
+                        due = self._next_retry - time.monotonic()
+                        wait = min(IDLE_WAIT_S, due + 0.05) if due > 0 else IDLE_WAIT_S
+                        self.jobstore.wait_for_change(version, timeout=wait)
+                    continue
+                self._launch(job)
+        finally:
+            for t in [t for _, t in self._snapshot()]:
+                t.join()
+            self._hb_done.set()
+
+    def _launch(self, job: Dict[str, Any]) -> None:
+        t = threading.Thread(target=self._run_job, args=(job,), daemon=True, name=f"job-{job['_id'][:8]}")
+        devices = self._heavy_devices(job) if self._device_aware() else []
+        with self._slots_lock:
+            self._active[job["_id"]] = (job["job_type"], t)
+            if devices:
+                self._job_devices[job["_id"]] = devices
+        if devices:
+            self.jobstore.add_log(job["_id"], f"Dispositivos: {', '.join(devices)}", level="DEBUG")
+        t.start()
+
+    def _run_job(self, job: Dict[str, Any]) -> None:
+        """Executa um job numa vaga do pool e libera a vaga ao terminar."""
+        jid = job["_id"]
+        jtype = job["job_type"]
+        params = job.get("params", {})
+        self.jobstore.add_log(jid, f"Iniciando job {jtype} (worker {self.worker_id})")
+        try:
+            fingerprint = self._fingerprint(jid, jtype, params)
+            if fingerprint and self._serve_cached(jid, jtype, params, fingerprint):
+                return
+            command = merge_command(job)
+            if command is None and self._split(job):
+                return
+            rc, out, err, resources = self._execute(jid, jtype, params, command=command)
+            self._flush_progress()  # último progresso antes do status final
+            if resources:
+                self.jobstore.add_log(jid, f"Recursos: {describe_resources(resources)}")
+
+            with self._slots_lock:
+                killed = self._kill_reason.pop(jid, None)
+
+            # partes: o evento é o da junção; interrompido no desligamento: o da execução que concluir
+            if jtype != "PREMIS_EVENT" and not params.get("shard_of") and killed != "shutdown":
+                with self._premis_lock:
                     append_event(
                         Path(self.cfg.premis_log),
                         {
                             "eventIdentifier": f"local-{jtype}-{datetime.utcnow().isoformat()}",
                             "eventType": event_type_for_job(jtype),
                             "eventDateTime": datetime.utcnow().isoformat() + "Z",
-                            "eventDetail": f"Exit code {rc}",
-                            "eventOutcome": "success" if rc == 0 else "failure",
+                            "eventDetail": f"Exit code {rc}" + (f" ({killed})" if killed else ""),
+                            "eventOutcome": "success" if rc == 0 and not killed else "failure",
                             "linkingObjectIdentifier": guess_object_id(jtype, params),
                             "linkingAgentName": self.cfg.premis_agent or "Gerenciador",
                         },
                     )
 
-                if rc == 0:
-                    self.jobstore.add_log(jid, "Concluído com sucesso")
-                    self.jobstore.set_status(jid, "done")
-                else:
-                    self.jobstore.add_log(jid, f"Erro (rc={rc})", level="ERROR")
-                    self.jobstore.set_status(jid, "error", error_msg=(err or "")[:500])
-
-            except Exception as e:
+            if killed == "shutdown":
+                self.jobstore.add_log(jid, f"Interrompido no desligamento do worker (rc={rc}); devolvido à fila",
+                                      level="WARN")
+                self._finish(jid, "pending")
+            elif killed == "canceled":
+                self.jobstore.add_log(jid, f"Cancelado durante a execução (rc={rc})", level="WARN")
+                self._finish(jid, "canceled", error_msg="cancelado durante a execução", job=job, rc=rc,
+                             resources=resources)
+            elif killed == "timeout":
+                msg = f"tempo limite de {self.timeouts.get(jtype, 0):g} s excedido"
+                self.jobstore.add_log(jid, f"Encerrado: {msg} (rc={rc})", level="ERROR")
+                self._finish(jid, "timeout", error_msg=msg, job=job, rc=rc, resources=resources)
+            elif rc == 0:
+                self.jobstore.add_log(jid, "Concluído com sucesso")
+                if fingerprint:
+                    self._remember(jid, jtype, params, fingerprint)
+                self._finish(jid, "done", job=job, rc=rc, resources=resources)
+            else:
+                self.jobstore.add_log(jid, f"Erro (rc={rc})", level="ERROR")
+                self._finish(jid, "error", error_msg=(err or "")[-500:], job=job, rc=rc, resources=resources)
+
+        except Exception as e:
+            traceback.print_exc()
+            self.jobstore.add_log(jid, f"Falha inesperada: {e}", level="ERROR")
+            self._finish(jid, "error", error_msg=str(e)[:500], job=job)
+        finally:
+            with self._slots_lock:
+                self._active.pop(jid, None)
+                self._kill_reason.pop(jid, None)
+                self._job_devices.pop(jid, None)
+            self._slot_freed.set()
+            self.jobstore.notify_change()  # o despachante pode estar esperando a vaga deste tipo
+
+    def _snapshot(self) -> List[tuple]:
+        with self._slots_lock:
+            return list(self._active.values())
+
+    def _saturated_types(self) -> List[str]:
+        """Tipos que já ocupam todas as vagas permitidas em job_type_limits."""
+        running: Dict[str, int] = {}
+        for jtype, _ in self._snapshot():
+            running[jtype] = running.get(jtype, 0) + 1
+        return [t for t, n in running.items() if self.type_limits.get(t) and n >= self.type_limits[t]]
+
+    def _device_aware(self) -> bool:
+        return bool(self.device_max or self.device_limits) and bool(self.io_heavy)
+
+    def _heavy_devices(self, job: Dict[str, Any]) -> List[str]:
+        if job.get("job_type") not in self.io_heavy:
+            return []
+        return job_devices(job.get("params") or {}, job["job_type"])
+
+    def _device_free(self, job: Dict[str, Any]) -> bool:
+        """
+        accept de claim_next: o job não é pesado de E/S ou todos os seus
+        dispositivos estão abaixo do limite (device_job_limits ou device_max_jobs).
+        """
+        devices = self._heavy_devices(job)
+        if not devices:
+            return True
+        with self._slots_lock:
+            busy: Dict[str, int] = {}
+            for devs in self._job_devices.values():
+                for d in devs:
+                    busy[d] = busy.get(d, 0) + 1
+        for d in devices:
+            limit = self.device_limits.get(d, self.device_max)
+            if limit and busy.get(d, 0) >= limit:
+                return False
+        return True
+
+    def _finish(self, job_id: str, status: str, *, error_msg: Optional[str] = None,
+                job: Optional[Dict[str, Any]] = None, rc: Optional[int] = None,
+                resources: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Grava o status final, desde que o job ainda pertença a este worker, com o
+        uso de recursos da execução (core.job_resources).
+        Com o job (como veio do claim) e uma política em cfg.job_retry para o tipo,
+        a tentativa vai para attempt_history e uma falha transitória devolve o job
+        à fila com backoff em vez de encerrá-lo.
+        """
+        attempt = None
+        policy = self.retry.get(job["job_type"], self.retry.get("*")) if job else None
+        if policy is not None:
+            n = int(job.get("attempts") or 1)
+            attempt = {"attempt": n, "started_at": job.get("updated_at"), "ended_at": _now_iso(),
+                       "status": status, "rc": rc, "worker_id": self.worker_id,
+                       "error": (error_msg or "")[-200:] or None}
+            if resources:
+                attempt["resources"] = resources
+            if policy.should_retry(n, status, rc, error_msg or ""):
+                delay = policy.delay(n)
+                if self.jobstore.retry_later(job_id, delay, error_msg=error_msg, attempt=attempt,
+                                             worker_id=self.worker_id):
+                    due = time.monotonic() + delay
+                    if self._next_retry <= time.monotonic() or due < self._next_retry:
+                        self._next_retry = due
+                    self.jobstore.add_log(job_id, f"Falha transitória na tentativa {n}/{policy.max_attempts}; "
+                                                  f"nova tentativa em {delay:.0f} s", level="WARN")
+                    return
+        if not self.jobstore.set_status(job_id, status, error_msg=error_msg, worker_id=self.worker_id,
+                                        attempt=attempt, resources=resources):
+            self.jobstore.add_log(job_id, f"Resultado '{status}' descartado: lease perdido por {self.worker_id}",
+                                  level="WARN")
+
+    def _split(self, job: Dict[str, Any]) -> bool:
+        """
+        Divide o job em partes se cfg.job_shards (ou params "shards") pedir
+        (core.job_shards). True = o job foi para 'waiting' e não deve rodar agora.
+        """
+        jid = job["_id"]
+        try:
+            plan = plan_shards(job, self.shards.get(job["job_type"]))
+        except (OSError, ValueError) as e:
+            self.jobstore.add_log(jid, f"Divisão em partes indisponível ({e}); executando inteiro", level="WARN")
+            return False
+        if plan is None:
+            return False
+        specs, info = plan
+        ids = self.jobstore.split_job(jid, specs, info=info, worker_id=self.worker_id)
+        if ids is None:
+            self.jobstore.add_log(jid, f"Divisão descartada: lease perdido por {self.worker_id}", level="WARN")
+            return True
+        self.jobstore.add_log(jid, f"Dividido em {len(ids)} partes (por {info['by']}): {', '.join(ids)}; "
+                                   f"a junção roda quando todas concluírem")
+        self.jobstore.add_logs([(sid, f"Parte do job {jid}") for sid in ids])
+        return True
+
+    def _fingerprint(self, job_id: str, job_type: str, params: Dict[str, Any]) -> Optional[str]:
+        """Fingerprint do job se o tipo usa o cache (cfg.job_cache_types) e params não o desligam."""
+        if job_type not in self.cache_types or params.get("cache") is False:
+            return None
+        t0 = time.monotonic()
+        try:
+            fp = job_fingerprint(job_type, params)
+        except Exception as e:
+            self.jobstore.add_log(job_id, f"Cache: fingerprint indisponível ({e})", level="WARN")
+            return None
+        if fp:
+            self.jobstore.add_log(job_id, f"Cache: fingerprint das entradas em {time.monotonic() - t0:.2f} s",
+                                  level="DEBUG")
+        return fp
+
+    def _serve_cached(self, job_id: str, job_type: str, params: Dict[str, Any], fingerprint: str) -> bool:
+        """Conclui o job com a saída de um job anterior de mesmo fingerprint. False = executar."""
+        prev = self.jobstore.find_cached(fingerprint)
+        if not prev or prev["_id"] == job_id:
+            return False
+        try:
+            outputs = reuse_outputs(job_type, params, prev.get("outputs") or {})
+        except OSError as e:
+            self.jobstore.add_log(job_id, f"Cache: falha ao copiar a saída do job {prev['_id']} ({e})",
+                                  level="WARN")
+            return False
+        if outputs is None:
+            self.jobstore.add_log(job_id, f"Cache: saída do job {prev['_id']} ausente ou alterada; executando")
+            return False
+        self.jobstore.set_result(job_id, fingerprint=fingerprint, outputs=outputs, cache_of=prev["_id"],
+                                 worker_id=self.worker_id)
+        paths = ", ".join(o["path"] for o in outputs.values())
+        self.jobstore.add_log(job_id, f"Cache: entradas inalteradas desde o job {prev['_id']}; "
+                                      f"resultado reaproveitado ({paths})")
+        self._finish(job_id, "done")
+        return True
+
+    def _remember(self, job_id: str, job_type: str, params: Dict[str, Any], fingerprint: str) -> None:
+        """Guarda fingerprint e resumo das saídas de um job concluído, para reaproveitamento."""
+        try:
+            outputs = output_digests(job_type, params)
+        except Exception as e:
+            outputs = None
+            self.jobstore.add_log(job_id, f"Cache: resumo das saídas indisponível ({e})", level="WARN")
+        if outputs:
+            self.jobstore.set_result(job_id, fingerprint=fingerprint, outputs=outputs, worker_id=self.worker_id)
+
+    def _heartbeat_loop(self, done: threading.Event) -> None:
+        """Renova, a cada 1/3 do prazo, o lease de todos os jobs em execução neste worker."""
+        interval = max(1.0, self.lease_seconds / 3)
+        lost: set = set()
+        while not done.wait(interval):
+            for jid in self.active_jobs():
+                if jid in lost:
+                    continue
+                try:
+                    if not self.jobstore.renew_lease(jid, self.worker_id, self.lease_seconds):
+                        lost.add(jid)
+                        self.jobstore.add_log(jid, f"Lease perdido pelo worker {self.worker_id}", level="WARN")
+                except Exception:
+                    traceback.print_exc()
+
+    def _note_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        with self._progress_lock:
+            self._progress[job_id] = progress
+
+    def _flush_progress(self) -> None:
+        with self._progress_lock:
+            batch, self._progress = self._progress, {}
+        if batch:
+            try:
+                self.jobstore.set_progress(batch, worker_id=self.worker_id)
+            except Exception:
                 traceback.print_exc()
-                self.jobstore.add_log(jid, f"Falha inesperada: {e}", level="ERROR")
-                self.jobstore.set_status(jid, "error", error_msg=str(e)[:500])
 
-    def _execute(self, job_type: str, params: Dict[str, Any]) -> tuple[int, str, str]:
-        if job_type not in self._scripts:
-            return 1, "", f"Job não suportado: {job_type}"
+    def _watch_loop(self, done: threading.Event) -> None:
+        """
+        A cada PROGRESS_FLUSH_S: grava o progresso mais recente dos jobs em execução
+        e encerra os que tiveram o cancelamento pedido por outro processo; amostra
+        o uso de recursos dos scripts (core.job_resources); a cada
+        SCHEDULE_POLL_S, dispara os agendamentos vencidos.
+        """
+        while not done.wait(PROGRESS_FLUSH_S):
+            self._flush_progress()
+            with self._slots_lock:
+                meters = list(self._meters.values())
+            for meter in meters:
+                meter.sample()
+            self._run_schedules()
+            with self._slots_lock:
+                ids = [jid for jid in self._procs if jid not in self._kill_reason]
+            try:
+                for jid in self.jobstore.cancel_requests(ids) if ids else ():
+                    self._terminate(jid, "canceled")
+            except Exception:
+                traceback.print_exc()
 
-        script_name, arg_builder = self._scripts[job_type]
-        args = arg_builder(params, self.cfg)  # builder recebe (params, cfg)
+    def _run_schedules(self) -> None:
+        now = time.monotonic()
+        if now < self._next_schedule or self._stop_event.is_set():
+            return
+        self._next_schedule = now + SCHEDULE_POLL_S
+        try:
+            run_due(self.jobstore)
+        except Exception:
+            traceback.print_exc()
+
+    def _terminate(self, job_id: str, reason: str) -> bool:
+        """
+        Encerra o script de um job deste worker: SIGTERM ao grupo de processos e,
+        se ainda estiver vivo após kill_grace segundos, SIGKILL. False se o job
+        não roda aqui (ou já está sendo encerrado).
+        """
+        with self._slots_lock:
+            proc = self._procs.get(job_id)
+            if proc is None or job_id in self._kill_reason:
+                return False
+            self._kill_reason[job_id] = reason
+        self.jobstore.add_log(job_id, f"Encerrando o script ({reason}): SIGTERM ao grupo de processos", level="WARN")
+        _signal_group(proc, hard=False)
+        timer = threading.Timer(self.kill_grace, self._kill_hard, args=(job_id, proc))
+        timer.daemon = True
+        timer.start()
+        return True
+
+    def _kill_hard(self, job_id: str, proc: Any) -> None:
+        if proc.poll() is None:
+            self.jobstore.add_log(job_id, f"Script não terminou em {self.kill_grace:g} s: SIGKILL", level="WARN")
+            _signal_group(proc, hard=True)
+
+    def _compact(self) -> None:
+        """Com a fila ociosa, arquiva jobs finalizados além da retenção (job_retention_days)."""
+        interval = float(getattr(self.cfg, "compaction_interval_s", 3600) or 0)
+        retention = getattr(self.cfg, "job_retention_days", None)
+        now = time.monotonic()
+        if interval <= 0 or not retention or (self._last_compact and now - self._last_compact < interval):
+            return
+        self._last_compact = now
+        try:
+            while self.jobstore.archive_finished(retention) and not self._stop_event.is_set():
+                if self.counts_by_status().get("pending"):
+                    break  # volta a atender a fila; o restante fica para a próxima rodada
+        except Exception:
+            traceback.print_exc()
+
+    def _reap_expired_leases(self) -> None:
+        """Com a fila ociosa, devolve jobs de workers mortos (lease vencido) para 'pending'."""
+        now = time.monotonic()
+        if now - self._last_reap < self.lease_seconds / 2:
+            return
+        self._last_reap = now
+        try:
+            self.jobstore.requeue_expired_leases(max_attempts=self.max_attempts)
+        except Exception:
+            traceback.print_exc()
+        self._recover_orphans()
+
+    def _recover_orphans(self) -> None:
+        """Reenfileira jobs 'running' cujo processo dono morreu nesta máquina (ex.: app encerrado no meio)."""
+        try:
+            self.jobstore.recover_orphaned(stale_seconds=self.lease_seconds, max_attempts=self.max_attempts)
+        except Exception:
+            traceback.print_exc()
+
+    def _spawn(self, job_id: str, cmd: List[str], script_name: str, args: List[str], progress: ProgressChannel,
+               io: Optional[IoPolicy] = None):
+        """
+        Processo do job: fork do processo quente (main(argv)) ou, sem pool, subprocess.
+        io (cfg.job_io): nice/ionice aplicados ao processo antes de o script rodar
+        (no filho: fork quente ou preexec_fn) e limite de banda no ambiente.
+        """
+        env = io.env() if io is not None else {}
+        if self._pool is not None:
+            try:
+                return self._pool.start(script_name, args, progress_fd=progress.child_fd, env=env, io_policy=io)
+            except OSError:
+                traceback.print_exc()  # servidor quente indisponível: cai para subprocess
+        pass_fds = () if progress.child_fd is None else (progress.child_fd,)
+        if os.name == "posix":
+            group: Dict[str, Any] = {"start_new_session": True}
+            if io is not None:
+                group["preexec_fn"] = priority_hook(io)  # no filho, antes do exec: o script já nasce com ela
+        else:
+            group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors="replace",
+                                pass_fds=pass_fds, env={**os.environ, **progress.env, **env}, **group)
+        if io is not None and os.name != "posix" and not apply_priority(io, proc.pid):
+            self.jobstore.add_log(job_id, f"Prioridade de E/S não aplicada por completo ({io.describe()})",
+                                  level="WARN")
+        return proc
+
+    def _execute(self, job_id: str, job_type: str, params: Dict[str, Any], *,
+                 command: Optional[Tuple[str, List[str]]] = None) -> tuple:
+        """
+        Executa o script do job (ou command = (script, argv), ex.: a junção de um
+        job dividido). Retorna (rc, fim do stdout, fim do stderr, recursos); a saída
+        completa fica em self.jobstore.output (arquivo .gz do job) e recursos é o
+        resumo de core.job_resources (None se o script nem iniciou).
+        """
+        if command is not None:
+            script_name, args = command
+        elif job_type not in self._scripts:
+            return 1, "", f"Job não suportado: {job_type}", None
+        else:
+            script_name, arg_builder = self._scripts[job_type]
+            args = arg_builder(params, self.cfg)  # builder recebe (params, cfg)
         cmd = [sys.executable, str(Path(self.cfg.scripts_dir) / script_name)] + args
-        proc = subprocess.run(cmd, capture_output=True, text=True)
-        return proc.returncode, proc.stdout, proc.stderr
\ No newline at end of file
+        tail = int(getattr(self.cfg, "job_log_tail_lines", 200) or 200)
+        live = LiveLog(self.jobstore, job_id)
+        progress = ProgressChannel()
+        tracker = ProgressTracker(lambda p: self._note_progress(job_id, p))
+        meter = ResourceMeter()
+        with self.jobstore.output.writer(job_id, tail_lines=tail, live=live) as output:
+            try:
+                io = self.io.get(job_type, self.io.get("*"))
+                if io is not None and io.describe():
+                    self.jobstore.add_log(job_id, f"Política de E/S: {io.describe()}")
+                proc = self._spawn(job_id, cmd, script_name, args, progress, io)
+                progress.child_started()
+                meter.attach(proc.pid)
+                with self._slots_lock:
+                    self._procs[job_id] = proc
+                    self._meters[job_id] = meter
+                with proc:
+                    readers = [threading.Thread(target=output.pump, args=(pipe, name), daemon=True)
+                               for pipe, name in ((proc.stdout, "stdout"), (proc.stderr, "stderr"))]
+                    readers.append(threading.Thread(target=tracker.pump, args=(progress.reader(),), daemon=True))
+                    for t in readers:
+                        t.start()
+                    try:
+                        rc, final = _wait(proc, self.timeouts.get(job_type))
+                    except subprocess.TimeoutExpired:
+                        self._terminate(job_id, "timeout")
+                        rc, final = _wait(proc, None)
+                    resources = meter.finish(final)
+                    progress.close()
+                    for t in readers:
+                        t.join()
+            finally:
+                with self._slots_lock:
+                    self._procs.pop(job_id, None)
+                    self._meters.pop(job_id, None)
+                progress.close()
+        log_max = int(getattr(self.jobstore, "log_max_entries", 0) or 0)
+        if log_max and sum(output.lines.values()) > log_max:
+            self.jobstore.add_log(
+                job_id,
+                f"Saída extensa ({output.lines['stdout']} linhas stdout, {output.lines['stderr']} stderr): "
+                f"o log guarda as {log_max} entradas mais recentes; saída completa em {output.path}",
+            )
+        return rc, output.tail("stdout"), output.tail("stderr"), resources
+
+
+def _wait(proc: Any, timeout: Optional[float]) -> Tuple[int, Optional[Dict[str, float]]]:
+    """Espera o script (Popen ou WarmProcess); retorna (rc, uso final exato ou None)."""
+    if isinstance(proc, subprocess.Popen):
+        return reap(proc, timeout)
+    rc = proc.wait(timeout)
+    return rc, proc.usage()
+
+
+def _signal_group(proc: Any, *, hard: bool) -> None:
+    """SIGTERM/SIGKILL ao grupo de processos do job (no Windows: CTRL_BREAK / kill)."""
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name != "posix":
+            proc.kill() if hard else proc.send_signal(signal.CTRL_BREAK_EVENT)
+            return
+        sig = signal.SIGKILL if hard else signal.SIGTERM
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            os.kill(proc.pid, sig)  # grupo ainda não criado (fork quente recém-iniciado)
+    except (ProcessLookupError, OSError):
+        pass  # já terminou
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from core.jobstore import open_jobstore
+
+    ap = argparse.ArgumentParser(description="Worker da fila de jobs, sem interface gráfica.")
+    ap.add_argument("--config", default="preservacao_app.json", help="Configuração do app (JSON).")
+    ap.add_argument("--worker-id", default=None, help="Identificação deste worker (padrão: host:pid:aleatório).")
+    ap.add_argument("--concurrency", type=int, default=None, help="Jobs simultâneos (padrão: worker_concurrency).")
+    ap.add_argument("--drain-timeout", type=float, default=0,
+                    help="Segundos de espera pelos jobs em execução após SIGTERM/SIGINT, antes de "
+                         "interrompê-los e devolvê-los à fila (0 = esperar até o fim).")
+    ap.add_argument("--api", nargs="?", const="", default=None, metavar="LISTEN",
+                    help="Sobe também a API HTTP (core/job_api.py) em host:porta ou unix:/caminho "
+                         "(sem valor: api_listen da configuração ou 127.0.0.1:8765).")
+    args = ap.parse_args(argv)
+
+    try:
+        cfg = AppConfig.from_env(AppConfig.from_file(args.config))
+        if args.worker_id:
+            cfg.worker_id = args.worker_id
+        if args.concurrency:
+            cfg.worker_concurrency = args.concurrency
+        worker = Worker(cfg, open_jobstore(cfg))
+        api = None
+        if args.api is not None or cfg.api_listen:
+            from core.job_api import JobApi
+            api = JobApi(cfg, worker.jobstore, worker, listen=args.api or None)
+            api.start()
+    except (OSError, ValueError, TypeError) as e:
+        print(f"[ERRO] {e}", file=sys.stderr)
+        return 2
+
+    signals: List[int] = []
+    wake = threading.Event()
+
+    def _on_signal(signum, frame):
+        signals.append(signum)
+        wake.set()
+
+    for name in ("SIGTERM", "SIGINT", "SIGBREAK"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            signal.signal(sig, _on_signal)
+
+    worker.start(daemon=False)
+    print(f"[INFO] Worker {worker.worker_id} iniciado (backend {cfg.jobstore_backend}, "
+          f"{worker.concurrency} vaga(s), {'quente' if worker._pool else 'subprocess'})", file=sys.stderr)
+    if api is not None:
+        print(f"[INFO] API da fila em {api.url}", file=sys.stderr)
+    deadline: Optional[float] = None
+    while worker.is_alive():
+        wake.wait(0.5 if deadline is None else max(0.05, min(0.5, deadline - time.monotonic())))
+        wake.clear()
+        if signals and deadline is None:
+            worker.stop()
+            n = worker.active_count()
+            limit = f"até {args.drain_timeout:g} s" if args.drain_timeout else "sem limite"
+            print(f"[INFO] Sinal {signal.Signals(signals[0]).name}: parando de pegar jobs; "
+                  f"aguardando {n} em execução ({limit}; novo sinal interrompe)", file=sys.stderr)
+            deadline = time.monotonic() + args.drain_timeout if args.drain_timeout else float("inf")
+        if deadline is not None and (len(signals) > 1 or time.monotonic() >= deadline):
+            n = worker.interrupt_running()  # repetido: pega também jobs que ainda não tinham processo
+            if n:
+                print(f"[INFO] {n} job(s) interrompido(s) e devolvido(s) à fila", file=sys.stderr)
+    if api is not None:
+        api.stop()
+    print(f"[INFO] Worker {worker.worker_id} encerrado", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
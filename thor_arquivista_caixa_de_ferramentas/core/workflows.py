@@ -0,0 +1,83 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# core/workflows.py
+"""
+Fluxos de trabalho prontos, montados como grafos de jobs para JobStore.add_jobs:
+cada item tem um 'ref' e, quando depende de outros, 'depends_on' com os refs
+dos itens anteriores. O worker inicia cada etapa assim que as entradas dela
+concluem e roda os ramos independentes em paralelo; se uma etapa falha, as
+seguintes são canceladas.
+
+  ids = jobstore.add_jobs(duplicate_workflow(raiz, inv, dup, dec, ...))
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def duplicate_workflow(raiz: str, inventario: str, duplicatas: str, decisoes: str, *,
+                       dashboard_duplicatas_csv: Optional[str] = None,
+                       dashboard_decisoes_csv: Optional[str] = None,
+                       mostrar_progresso: bool = False, priority: int = 0) -> List[Dict[str, Any]]:
+    """
+    Análise de duplicatas (DUPLICATE_FINDER):
+
+      inventario -> duplicatas -+-> modelo_decisoes -> [dashboard_decisoes]
+                                +-> [dashboard_duplicatas]
+
+    Os painéis são opcionais; o de duplicatas roda em paralelo ao modelo de decisões.
+    """
+    def job(ref: str, params: Dict[str, Any], *deps: str) -> Dict[str, Any]:
+        return {"job_type": "DUPLICATE_FINDER", "params": params, "priority": priority,
+                "ref": ref, "depends_on": list(deps)}
+
+    specs = [
+        job("inventario", {"modo": "inventario", "raiz": raiz, "inventario": inventario,
+                           "mostrar_progresso": bool(mostrar_progresso)}),
+        job("duplicatas", {"modo": "duplicatas", "inventario": inventario, "duplicatas": duplicatas},
+            "inventario"),
+        job("modelo_decisoes", {"modo": "modelo_decisoes", "duplicatas": duplicatas, "decisoes": decisoes},
+            "duplicatas"),
+    ]
+    if dashboard_duplicatas_csv:
+        specs.append(job("dashboard_duplicatas",
+                         {"modo": "dashboard_duplicatas", "inventario": inventario, "duplicatas": duplicatas,
+                          "dashboard_duplicatas_csv": dashboard_duplicatas_csv},
+                         "duplicatas"))
+    if dashboard_decisoes_csv:
+        specs.append(job("dashboard_decisoes",
+                         {"modo": "dashboard_decisoes", "inventario": inventario, "decisoes": decisoes,
+                          "dashboard_decisoes_csv": dashboard_decisoes_csv},
+                         "modelo_decisoes"))
+    return specs
+
+
+def preservation_chain(raiz: str, manifesto: str, bag_dst: str, destinos: Sequence[str], *,
+                       algo: str = "sha256", verificar_hash: bool = True,
+                       priority: int = 0) -> List[Dict[str, Any]]:
+    """
+    Cadeia usual de preservação: manifesto de hash da origem -> bag BagIt ->
+    réplica do bag nos destinos.
+    """
+    return [
+        {"job_type": "HASH_MANIFEST", "ref": "hash", "priority": priority,
+         "params": {"raiz": raiz, "saida": manifesto, "algo": algo}},
+        {"job_type": "BUILD_BAG", "ref": "bag", "depends_on": ["hash"], "priority": priority,
+         "params": {"src": raiz, "dst": bag_dst, "algo": algo}},
+        {"job_type": "REPLICATE", "ref": "replicate", "depends_on": ["bag"], "priority": priority,
+         "params": {"fonte": bag_dst, "destinos": list(destinos), "verificar_hash": bool(verificar_hash)}},
+    ]
@@ -45,7 +45,11 @@ import shutil
 import sys
 from datetime import date
 from pathlib import Path
-from typing import Iterable, Tuple, List, Dict, Optional
+from typing import Callable, Iterable, Tuple, List, Dict, Optional
+
+from pd_cancel import Terminated, install as install_cancel
+from pd_progress import Progress
+from pd_throttle import copy2 as throttled_copy2, limiter
 
 CHUNK = 1024 * 1024
 
@@ -53,15 +57,19 @@ CHUNK = 1024 * 1024
 # ==========================
 # Utilidades de hash/IO
 # ==========================
-def digest_file(path: Path, algo: str = "sha256") -> str:
+def digest_file(path: Path, algo: str = "sha256", on_chunk: Optional[Callable[[int], None]] = None) -> str:
     algo = algo.lower()
     try:
         h = getattr(hashlib, algo)()
     except AttributeError as e:
         raise ValueError(f"Algoritmo de hash não suportado: {algo}") from e
+    bucket = limiter()
     with path.open("rb") as f:
         for chunk in iter(lambda: f.read(CHUNK), b""):
+            bucket.consume(len(chunk))
             h.update(chunk)
+            if on_chunk:
+                on_chunk(len(chunk))
     return h.hexdigest()
 
 
@@ -234,6 +242,9 @@ def build_bag(
 
     # 2) Transfere para data/ conforme modo
     print(f"[1/6] Transferindo {len(files_src)} arquivo(s) (mode={mode})…")
+    sizes = [p.stat().st_size for p in files_src]
+    payload_bytes = sum(sizes)
+    prog = Progress("transfer", files_total=len(files_src), bytes_total=payload_bytes)
     transferred: List[Path] = []
     for i, p in enumerate(files_src, 1):
         rel = relposix(src, p)
@@ -241,28 +252,32 @@ def build_bag(
         dst_file.parent.mkdir(parents=True, exist_ok=True)
 
         if mode == "copy":
-            shutil.copy2(p, dst_file)
+            throttled_copy2(p, dst_file)
         elif mode == "move":
             shutil.move(str(p), str(dst_file))
         elif mode == "link":
             try:
                 os.link(p, dst_file)
             except OSError:
-                shutil.copy2(p, dst_file)
+                throttled_copy2(p, dst_file)
         else:
             raise ValueError("mode deve ser 'copy', 'move' ou 'link'.")
 
+        prog.advance(files=1, nbytes=sizes[i - 1])
         if i % 50 == 0 or i == len(files_src):
             print(f"  - {i}/{len(files_src)}")
         transferred.append(dst_file)
 
     # 3) Calcula manifest do payload
     print("[2/6] Gerando manifest do payload…")
+    prog.set_phase("manifest", files_total=len(transferred), bytes_total=payload_bytes)
+    on_chunk = (lambda n: prog.advance(nbytes=n)) if prog.enabled else None
     manifest_path = dst / f"manifest-{algo.lower()}.txt"
     transferred_sorted = sorted(transferred, key=lambda x: relposix(data_dir, x))
     with manifest_path.open("w", encoding="utf-8", newline="\n") as mf:
         for i, f in enumerate(transferred_sorted, 1):
-            dig = digest_file(f, algo=algo)
+            dig = digest_file(f, algo=algo, on_chunk=on_chunk)
+            prog.advance(files=1)
             # caminho relativo ao ROOT do bag, ex.: "data/dir/arquivo.ext"
             path_in_bag = relposix(dst, f)
             mf.write(f"{dig}  {path_in_bag}\n")
@@ -270,6 +285,7 @@ def build_bag(
                 print(f"  - {i}/{len(transferred_sorted)}")
 
     # 4) bagit.txt
+    prog.set_phase("tags")
     print("[3/6] Escrevendo bagit.txt…")
     bagit_txt = "BagIt-Version: 0.97\nTag-File-Character-Encoding: UTF-8\n"
     write_text(dst / "bagit.txt", bagit_txt)
@@ -357,6 +373,7 @@ def build_bag(
                 dig = digest_file(p, algo=algo)
                 tf.write(f"{dig}  {relposix(dst, p)}\n")
 
+    prog.close()
     print("[6/6] Bag construído em:", dst)
     return dst
 
@@ -398,8 +415,36 @@ def parse_args(argv=None):
     return ap.parse_args(argv)
 
 
+def discard_partial_bag(dst: Path, mode: str, prior: str) -> None:
+    """
+    Remove um bag interrompido (cancelamento/tempo limite). prior = estado do
+    destino antes do build ("absent" | "empty" | "other"): um destino que já
+    tinha conteúdo nunca é apagado. No modo 'move' os arquivos já movidos para
+    data/ são a única cópia: nada é apagado.
+    """
+    dst = dst.resolve()
+    if mode == "move" or prior == "other":
+        print(f"AVISO: bag interrompido em {dst}; conteúdo mantido para conferência.", file=sys.stderr)
+        return
+    if dst.is_dir():
+        shutil.rmtree(dst, ignore_errors=True)
+        if prior == "empty":
+            dst.mkdir(parents=True, exist_ok=True)  # devolve a pasta vazia que já existia
+    print(f"Bag parcial removido: {dst}", file=sys.stderr)
+
+
+def _dst_state(dst: Path) -> str:
+    if not dst.exists():
+        return "absent"
+    if dst.is_dir() and not any(dst.iterdir()):
+        return "empty"
+    return "other"
+
+
 def main(argv=None):
     args = parse_args(argv)
+    install_cancel()
+    prior = _dst_state(args.dst)
     try:
         build_bag(
             src=args.src,
@@ -418,6 +463,9 @@ def main(argv=None):
             profile=args.profile,
             profile_params=parse_profile_params(args.profile_param),
         )
+    except Terminated:
+        discard_partial_bag(args.dst, args.mode, prior)
+        raise
     except Exception as e:
         print(f"ERRO: {e}", file=sys.stderr)
         sys.exit(2)
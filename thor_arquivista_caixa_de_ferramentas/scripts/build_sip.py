@@ -32,7 +32,7 @@ def write_manifest_sha256(root: Path, target: Path):
                 rel = relpath(p, root)
                 f.write(f"{h}  {rel}\n")
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="Construir SIP simples (OAIS)")
     ap.add_argument("--fonte", required=True, help="Pasta de origem dos objetos.")
     ap.add_argument("--saida", required=True, help="Diretório de saída para o SIP.")
@@ -41,7 +41,7 @@ def main():
     ap.add_argument("--no-zip", dest="zip_out", action="store_false", help="Não compactar (padrão).")
     ap.set_defaults(zip_out=False)
     add_common_args(ap)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     cfg = load_config(args.config)
     src = Path(args.fonte).resolve()
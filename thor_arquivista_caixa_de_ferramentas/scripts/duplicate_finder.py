@@ -436,8 +436,8 @@ def _build_parser() -> argparse.ArgumentParser:
     p.add_argument('--dashboard-decisoes-xlsx', help='XLSX da recuperação planejada (requer pandas+xlsxwriter)')
     return p
 
-def main() -> None:
-    args = _build_parser().parse_args()
+def main(argv=None) -> None:
+    args = _build_parser().parse_args(argv)
 
     # Rotas exclusivas (um comando por execução, como nos outros scripts)
     if args.raiz and args.inventario and not any([
@@ -55,12 +55,12 @@ def identify_basic(path: Path):
         "basis": "mimetypes"
     }
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="Identificar formatos de arquivos.")
     ap.add_argument("--raiz", required=True, help="Pasta a varrer.")
     ap.add_argument("--saida", help="Arquivo JSONL de saída. Se omitido, imprime.")
     add_common_args(ap)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     cfg = load_config(args.config)
     root = Path(args.raiz).resolve()
@@ -25,12 +25,16 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from fnmatch import fnmatch
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
+
+from pd_cancel import check as check_cancel, install as install_cancel
+from pd_progress import Progress
+from pd_throttle import limiter
 
 CHUNK = 1024 * 1024  # 1 MiB
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv=None) -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description="Gera manifesto BagIt: '<hash>  <caminho/relativo>'."
     )
@@ -51,7 +55,12 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--follow-symlinks", action="store_true", default=False, help="Segue links simbólicos.")
     p.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Threads (padrão: núcleos da máquina).")
     p.add_argument("--progress", action="store_true", default=False, help="Mostra progresso no stderr.")
-    return p.parse_args()
+    p.add_argument("--subpasta", action="append", default=None,
+                   help="Só esta pasta do primeiro nível da raiz (repetível; parte de um job dividido). "
+                        "Os caminhos do manifesto continuam relativos à raiz.")
+    p.add_argument("--arquivos-raiz", action="store_true", default=False,
+                   help="Só os arquivos soltos na raiz (combina com --subpasta).")
+    return p.parse_args(argv)
 
 
 def is_hidden(path: Path) -> bool:
@@ -64,11 +73,21 @@ def dt_from_yyyy_mm_dd(s: Optional[str]) -> Optional[float]:
     return datetime.strptime(s, "%Y-%m-%d").timestamp()
 
 
-def iter_files(raiz: Path, follow_symlinks: bool, ignore_hidden_flag: bool):
+def iter_files(raiz: Path, follow_symlinks: bool, ignore_hidden_flag: bool,
+               subpastas: Optional[list[str]] = None, arquivos_raiz: bool = False):
+    """
+    Arquivos sob a raiz. Com subpastas (uma parte de um job dividido, ver
+    core/job_shards.py), só essas pastas do primeiro nível e, com arquivos_raiz,
+    os arquivos soltos na raiz.
+    """
     for root, dirs, files in os.walk(raiz, followlinks=follow_symlinks):
         root_path = Path(root)
         if ignore_hidden_flag:
             dirs[:] = [d for d in dirs if not d.startswith(".")]
+        if subpastas is not None and root_path == raiz:
+            dirs[:] = [d for d in dirs if d in subpastas]
+            if not arquivos_raiz:
+                files = []
         for name in files:
             p = root_path / name
             rel = p.relative_to(raiz)
@@ -121,19 +140,32 @@ def pass_filters(p: Path,
     return True
 
 
-def hash_file(p: Path, algo: str) -> str:
+def hash_file(p: Path, algo: str, on_chunk: Optional[Callable[[int], None]] = None) -> str:
     h = hashlib.new(algo)
+    bucket = limiter()
     with p.open("rb") as f:
         while True:
+            check_cancel()
             chunk = f.read(CHUNK)
             if not chunk:
                 break
+            bucket.consume(len(chunk))
             h.update(chunk)
+            if on_chunk:
+                on_chunk(len(chunk))
     return h.hexdigest()
 
 
-def main() -> int:
-    args = parse_args()
+def _size(p: Path) -> int:
+    try:
+        return p.stat().st_size
+    except OSError:
+        return 0
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    install_cancel()
     raiz = Path(args.raiz).resolve()
     saida = Path(args.saida).resolve()
 
@@ -145,7 +177,8 @@ def main() -> int:
     mod_before_ts = dt_from_yyyy_mm_dd(args.modified_before)
 
     candidates: list[Path] = []
-    for p in iter_files(raiz, args.follow_symlinks, args.ignore_hidden):
+    subpastas = (args.subpasta or []) if (args.subpasta or args.arquivos_raiz) else None
+    for p in iter_files(raiz, args.follow_symlinks, args.ignore_hidden, subpastas, args.arquivos_raiz):
         if pass_filters(
             p, raiz,
             args.include_ext, args.exclude_ext,
@@ -159,9 +192,14 @@ def main() -> int:
     if args.progress:
         print(f"[INFO] Arquivos a processar: {total}", file=sys.stderr)
 
+    prog = Progress("hash", files_total=total)
+    if prog.enabled:
+        prog.bytes_total = sum(_size(p) for p in candidates)
+    on_chunk = (lambda n: prog.advance(nbytes=n)) if prog.enabled else None
+
     results: list[tuple[Path, str | None, str | None]] = []
     with ThreadPoolExecutor(max_workers=max(1, int(args.workers))) as ex:
-        futs = {ex.submit(hash_file, p, args.algo): p for p in candidates}
+        futs = {ex.submit(hash_file, p, args.algo, on_chunk): p for p in candidates}
         done = 0
         for fut in as_completed(futs):
             p = futs[fut]
@@ -171,19 +209,31 @@ def main() -> int:
             except Exception as e:
                 results.append((p, None, str(e)))
             done += 1
+            prog.advance(files=1)
             if args.progress and (done % 50 == 0 or done == total):
                 print(f"[INFO] Progresso: {done}/{total}", file=sys.stderr)
 
-    saida.parent.mkdir(parents=True, exist_ok=True)
-    with saida.open("w", encoding="utf-8", newline="\n") as out:
-        for p, digest, err in sorted(results, key=lambda t: t[0].relative_to(raiz).as_posix()):
-            if digest is None:
-                print(f"[ERRO] Falha ao calcular hash: {p} -> {err}", file=sys.stderr)
-                continue
-            rel = p.relative_to(raiz).as_posix()
-            # BagIt: hash + dois espaços + caminho relativo (POSIX)
-            out.write(f"{digest}  {rel}\n")
+    prog.set_phase("write", files_total=len(results))
 
+    # grava num temporário e troca no fim: um job cancelado não deixa manifesto pela metade
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    tmp = saida.with_name(saida.name + ".part")
+    try:
+        with tmp.open("w", encoding="utf-8", newline="\n") as out:
+            for p, digest, err in sorted(results, key=lambda t: t[0].relative_to(raiz).as_posix()):
+                if digest is None:
+                    print(f"[ERRO] Falha ao calcular hash: {p} -> {err}", file=sys.stderr)
+                    continue
+                rel = p.relative_to(raiz).as_posix()
+                # BagIt: hash + dois espaços + caminho relativo (POSIX)
+                out.write(f"{digest}  {rel}\n")
+        tmp.replace(saida)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    prog.advance(files=len(results))
+    prog.close()
     if args.progress:
         print(f"[INFO] Manifesto gerado em: {saida}", file=sys.stderr)
     return 0
@@ -0,0 +1,130 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+merge_shards.py — Junta as partes de um job dividido pelo Worker (core/job_shards.py)
+na mesma saída que o script original teria gerado.
+
+  manifesto --saida M --partes p1.txt p2.txt ...
+      manifestos parciais de hash_files.py (cada um já ordenado pelo caminho)
+      -> um manifesto na mesma ordem, intercalado em streaming (heapq.merge).
+  fixidez --raiz R --manifesto M --partes r1.json r2.json ... [--report-extras]
+      resultados de verify_fixity.py --resultado-json -> o mesmo relatório e o
+      mesmo código de saída de verify_fixity.py.
+
+--limpar DIR apaga a pasta de trabalho das partes depois de gravar o resultado.
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import shutil
+import sys
+from pathlib import Path
+
+from pd_cancel import check as check_cancel, install as install_cancel
+from verify_fixity import find_extras, print_report, read_manifest
+
+CHECK_EVERY = 10000  # linhas entre verificações de cancelamento
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Junta as partes de um job dividido (manifesto ou fixidez).")
+    p.add_argument("modo", choices=["manifesto", "fixidez"])
+    p.add_argument("--partes", nargs="+", required=True, help="Saídas das partes, na ordem.")
+    p.add_argument("--saida", help="(manifesto) Manifesto final.")
+    p.add_argument("--raiz", help="(fixidez) Pasta raiz verificada.")
+    p.add_argument("--manifesto", help="(fixidez) Manifesto original.")
+    p.add_argument("--algo", default=None, help="(fixidez) Algoritmo, se nenhuma parte o informar.")
+    p.add_argument("--report-extras", action="store_true", default=False,
+                   help="(fixidez) Reporta arquivos presentes em disco mas ausentes no manifesto.")
+    p.add_argument("--limpar", default=None, help="Pasta de trabalho das partes, apagada no fim.")
+    return p.parse_args(argv)
+
+
+def _path_key(line: str) -> str:
+    # '<hash>  <caminho>\n' -> caminho (a ordem de hash_files.py)
+    rel = line.partition("  ")[2]
+    return rel[:-1] if rel.endswith("\n") else rel
+
+
+def merge_manifests(parts: list[Path], saida: Path) -> int:
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    tmp = saida.with_name(saida.name + ".part")
+    files = [p.open("r", encoding="utf-8", newline="\n") for p in parts]
+    n = 0
+    try:
+        with tmp.open("w", encoding="utf-8", newline="\n") as out:
+            for line in heapq.merge(*files, key=_path_key):
+                out.write(line)
+                n += 1
+                if n % CHECK_EVERY == 0:
+                    check_cancel()
+        tmp.replace(saida)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    finally:
+        for f in files:
+            f.close()
+    print(f"[INFO] {len(parts)} parte(s), {n} entrada(s) -> {saida}", file=sys.stderr)
+    return 0
+
+
+def merge_fixity(parts: list[Path], raiz: Path, mani: Path, algo: str | None, report_extras: bool) -> int:
+    total = ok = 0
+    missing: list[str] = []
+    mismatches: list[str] = []
+    for p in parts:
+        res = json.loads(p.read_text(encoding="utf-8"))
+        algo = algo or res.get("algo")
+        total += int(res["total"])
+        ok += int(res["ok"])
+        missing.extend(res["missing"])
+        mismatches.extend(res["mismatches"])
+    extras_count = find_extras(raiz, read_manifest(mani)) if report_extras else None
+    return print_report(mani, raiz, algo or "sha256", total, ok, missing, mismatches, extras_count)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    install_cancel()
+    parts = [Path(p) for p in args.partes]
+    absent = [p for p in parts if not p.is_file()]
+    if absent:
+        print(f"[ERRO] Parte(s) ausente(s): {', '.join(map(str, absent))}", file=sys.stderr)
+        return 2
+    if args.modo == "manifesto":
+        if not args.saida:
+            print("[ERRO] --saida é obrigatório no modo manifesto.", file=sys.stderr)
+            return 2
+        rc = merge_manifests(parts, Path(args.saida).resolve())
+    else:
+        if not args.raiz or not args.manifesto:
+            print("[ERRO] --raiz e --manifesto são obrigatórios no modo fixidez.", file=sys.stderr)
+            return 2
+        rc = merge_fixity(parts, Path(args.raiz).resolve(), Path(args.manifesto).resolve(),
+                          args.algo, args.report_extras)
+    if args.limpar:
+        shutil.rmtree(args.limpar, ignore_errors=True)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,77 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pd_cancel.py — Encerramento cooperativo dos scripts (cancelamento/tempo limite).
+
+O Worker do Thor Arquivista encerra um job cancelado ou com tempo esgotado
+mandando SIGTERM ao grupo de processos do job (CTRL_BREAK no Windows) e, se
+ele não terminar no prazo, SIGKILL. Com install(), o sinal vira a exceção
+Terminated (SystemExit, código 143) na thread principal, e stop_requested()
+passa a valer True para as threads auxiliares, que param com check(). Assim
+blocos finally/except do script podem apagar saídas parciais.
+
+Uso:
+  install()
+  try:
+      ...                 # loops longos chamam check()
+  except BaseException:
+      remover_parciais()
+      raise
+"""
+from __future__ import annotations
+
+import signal
+import threading
+
+EXIT_TERMINATED = 143  # 128 + SIGTERM, como no shell
+
+_stop = threading.Event()
+
+
+class Terminated(SystemExit):
+    def __init__(self):
+        super().__init__(EXIT_TERMINATED)
+
+
+def _handler(signum, frame):
+    first = not _stop.is_set()
+    _stop.set()
+    if first:
+        raise Terminated()
+
+
+def install() -> None:
+    """Converte SIGTERM (e SIGBREAK no Windows) em Terminated. Chamar na thread principal."""
+    _stop.clear()
+    if threading.current_thread() is not threading.main_thread():
+        return
+    for name in ("SIGTERM", "SIGBREAK"):
+        sig = getattr(signal, name, None)
+        if sig is not None:
+            signal.signal(sig, _handler)
+
+
+def stop_requested() -> bool:
+    return _stop.is_set()
+
+
+def check() -> None:
+    """Para threads auxiliares: interrompe o trabalho se o encerramento foi pedido."""
+    if _stop.is_set():
+        raise Terminated()
@@ -26,6 +26,8 @@ import os, sys, json, hashlib, datetime, argparse, shutil
 from pathlib import Path
 from typing import Optional, Dict, Any, Iterable, Tuple
 
+from pd_throttle import copy2 as throttled_copy2, limiter
+
 CHUNK_SIZE = 1024 * 1024  # 1 MiB
 
 def load_config(path: Optional[str]) -> Dict[str, Any]:
@@ -44,13 +46,15 @@ def load_config(path: Optional[str]) -> Dict[str, Any]:
         return json.loads(text)
 
 def sha256_file(path: Path, chunk_size: int = CHUNK_SIZE) -> str:
-    """Calcula SHA-256 do arquivo, em blocos."""
+    """Calcula SHA-256 do arquivo, em blocos (respeitando o limite de banda, ver pd_throttle)."""
+    bucket = limiter()
     h = hashlib.sha256()
     with path.open("rb") as f:
         while True:
             b = f.read(chunk_size)
             if not b:
                 break
+            bucket.consume(len(b))
             h.update(b)
     return h.hexdigest()
 
@@ -85,8 +89,18 @@ def human_bytes(n: int) -> str:
     return f"{x:.2f} {units[i]}"
 
 def safe_copy(src: Path, dst: Path) -> None:
+    """
+    Copia via '<dst>.part' + rename: interrompida (ex.: job cancelado), não deixa arquivo truncado.
+    Respeita o limite de banda do job (pd_throttle).
+    """
     dst.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(src, dst)
+    tmp = dst.with_name(dst.name + ".part")
+    try:
+        throttled_copy2(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
 
 def try_import_tqdm():
     try:
@@ -0,0 +1,136 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pd_progress.py — Canal de progresso legível por máquina para os scripts.
+
+Cada atualização é uma linha JSON:
+  {"phase": "hash", "files_done": 10, "files_total": 200,
+   "bytes_done": 1048576, "bytes_total": 73400320}
+
+O destino vem do ambiente (definido pelo Worker do Thor Arquivista):
+  - THOR_PROGRESS_FD=<n>               descritor já aberto (pipe dedicado)
+  - THOR_PROGRESS_SOCKET=host:port     socket TCP (ou caminho de socket Unix)
+Sem nenhum dos dois, o Progress não faz nada (execução manual pela CLI).
+
+Uso:
+  prog = Progress("hash", files_total=len(arquivos), bytes_total=soma)
+  prog.advance(nbytes=len(chunk))   # thread-safe
+  prog.advance(files=1)
+  prog.close()
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import threading
+import time
+from typing import IO, Optional
+
+ENV_FD = "THOR_PROGRESS_FD"
+ENV_SOCKET = "THOR_PROGRESS_SOCKET"
+MIN_INTERVAL_S = 0.5  # intervalo mínimo entre linhas (a última sempre é enviada)
+
+
+def _open_channel() -> Optional[IO[str]]:
+    """Abre o canal indicado no ambiente; None se não houver (ou se falhar)."""
+    try:
+        fd = os.environ.get(ENV_FD)
+        if fd:
+            return os.fdopen(int(fd), "w", encoding="utf-8", buffering=1)
+        addr = os.environ.get(ENV_SOCKET)
+        if addr:
+            host, sep, port = addr.rpartition(":")
+            if sep and port.isdigit():
+                sock = socket.create_connection((host or "127.0.0.1", int(port)), timeout=5)
+            else:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(addr)
+            return sock.makefile("w", encoding="utf-8", buffering=1)
+    except (OSError, ValueError):
+        pass  # progresso é opcional: o script segue sem ele
+    return None
+
+
+class Progress:
+    def __init__(self, phase: str = "", *, files_total: Optional[int] = None,
+                 bytes_total: Optional[int] = None, min_interval: float = MIN_INTERVAL_S):
+        self._out = _open_channel()
+        self._lock = threading.Lock()
+        self._min_interval = min_interval
+        self._last = 0.0
+        self.phase = phase
+        self.files_total = files_total
+        self.bytes_total = bytes_total
+        self.files_done = 0
+        self.bytes_done = 0
+        self.emit(force=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self._out is not None
+
+    def set_phase(self, phase: str, *, files_total: Optional[int] = None,
+                  bytes_total: Optional[int] = None) -> None:
+        """Começa uma nova fase (zera os contadores)."""
+        with self._lock:
+            self.phase = phase
+            self.files_total, self.bytes_total = files_total, bytes_total
+            self.files_done = self.bytes_done = 0
+        self.emit(force=True)
+
+    def advance(self, *, files: int = 0, nbytes: int = 0) -> None:
+        with self._lock:
+            self.files_done += files
+            self.bytes_done += nbytes
+        self.emit()
+
+    def emit(self, force: bool = False) -> None:
+        if self._out is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last < self._min_interval:
+                return
+            self._last = now
+            line = json.dumps({
+                "phase": self.phase,
+                "files_done": self.files_done, "files_total": self.files_total,
+                "bytes_done": self.bytes_done, "bytes_total": self.bytes_total,
+            })
+            try:
+                self._out.write(line + "\n")
+            except (OSError, ValueError):
+                self._out = None  # leitor foi embora; segue sem progresso
+
+    def close(self) -> None:
+        self.emit(force=True)
+        with self._lock:
+            if self._out is not None:
+                try:
+                    self._out.close()
+                except OSError:
+                    pass
+                self._out = None
+
+    def __enter__(self) -> "Progress":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,142 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pd_throttle.py — Limite de banda (token bucket) nos laços de leitura/cópia.
+
+O limite vem do ambiente (definido pelo Worker do Thor Arquivista a partir de
+cfg.job_io, ver core/io_policy.py), em MB/s (10^6 bytes), com janelas por
+horário local:
+  THOR_IO_LIMIT='{"max_mb_s": 0,
+                  "windows": [{"from": "08:00", "to": "19:00", "days": [0,1,2,3,4], "max_mb_s": 40}]}'
+A primeira janela que contém o horário atual vale; fora delas, max_mb_s
+(0 = sem limite). days: 0 = segunda ... 6 = domingo (ausente = todos);
+janelas com from > to atravessam a meia-noite. O limite é reavaliado a cada
+RECHECK_S segundos, então um job longo acelera quando a janela termina.
+Sem a variável, limiter() não limita nada (execução manual pela CLI).
+
+Uso:
+  bucket = limiter()
+  for chunk in ...:
+      bucket.consume(len(chunk))   # thread-safe: o limite vale para o job inteiro
+  copy2(src, dst)                  # shutil.copy2 com o limite aplicado
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pd_cancel import check as check_cancel
+
+ENV_LIMIT = "THOR_IO_LIMIT"
+CHUNK = 1024 * 1024
+RECHECK_S = 5.0   # intervalo de reavaliação das janelas de horário
+BURST_S = 0.5     # rajada máxima acumulada, em segundos de banda
+_SLEEP_SLICE_S = 0.25  # esperas longas em fatias, para atender cancelamentos
+
+
+def _minutes(hhmm: str) -> int:
+    h, _, m = str(hhmm).partition(":")
+    return int(h) * 60 + int(m or 0)
+
+
+class TokenBucket:
+    def __init__(self, max_mb_s: float = 0, windows: Optional[List[Dict[str, Any]]] = None):
+        self._default = float(max_mb_s or 0) * 1e6
+        self._windows: List[Tuple[int, int, Optional[frozenset], float]] = [
+            (_minutes(w["from"]), _minutes(w["to"]),
+             frozenset(w["days"]) if w.get("days") is not None else None,
+             float(w.get("max_mb_s") or 0) * 1e6)
+            for w in windows or ()
+        ]
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self._rate = 0.0
+        self._checked = float("-inf")
+
+    @property
+    def active(self) -> bool:
+        """Há algum limite configurado (agora ou em alguma janela)?"""
+        return bool(self._default or any(w[3] for w in self._windows))
+
+    def rate_now(self) -> float:
+        """Limite vigente em bytes/s (0 = sem limite)."""
+        now = time.localtime()
+        minute = now.tm_hour * 60 + now.tm_min
+        for start, end, days, rate in self._windows:
+            if days is not None and now.tm_wday not in days:
+                continue
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+        return self._default
+
+    def consume(self, nbytes: int) -> None:
+        """Debita nbytes do balde; dorme o necessário para manter a média no limite."""
+        if not self.active:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= RECHECK_S:
+                self._rate, self._checked = self.rate_now(), now
+            rate = self._rate
+            if not rate:
+                self._tokens, self._last = 0.0, now
+                return
+            self._tokens = min(rate * BURST_S, self._tokens + (now - self._last) * rate) - nbytes
+            self._last = now
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+        while wait > 0:  # fora do lock: outras threads reservam a sua parte na fila
+            time.sleep(min(wait, _SLEEP_SLICE_S))
+            wait -= _SLEEP_SLICE_S
+            check_cancel()
+
+
+_bucket: Optional[TokenBucket] = None
+_bucket_lock = threading.Lock()
+
+
+def limiter() -> TokenBucket:
+    """Balde do processo, criado na primeira chamada a partir de THOR_IO_LIMIT."""
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            try:
+                conf = json.loads(os.environ.get(ENV_LIMIT) or "{}")
+                _bucket = TokenBucket(conf.get("max_mb_s") or 0, conf.get("windows"))
+            except (ValueError, TypeError, KeyError, AttributeError):
+                _bucket = TokenBucket()  # limite ilegível: segue sem limite
+        return _bucket
+
+
+def copy2(src, dst) -> None:
+    """shutil.copy2 respeitando o limite (sem limite, usa a cópia rápida do sistema)."""
+    bucket = limiter()
+    if not bucket.active:
+        shutil.copy2(src, dst)
+        return
+    with open(src, "rb") as fi, open(dst, "wb") as fo:
+        for chunk in iter(lambda: fi.read(CHUNK), b""):
+            bucket.consume(len(chunk))
+            fo.write(chunk)
+    shutil.copystat(src, dst)
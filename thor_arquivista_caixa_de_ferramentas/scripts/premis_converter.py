@@ -862,7 +862,7 @@ def generate_examples(base_dir: Path) -> Dict[str, Path]:
 # -----------------------------------------------------------
 # CLI
 # -----------------------------------------------------------
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(
         description="Conversor/validador PREMIS 3.0 (XML ⇄ JSON ⇄ CSV) — estilo de CSV do projeto."
     )
@@ -871,7 +871,7 @@ def main():
     ap.add_argument("--validate", action="store_true", help="Validar XML de entrada contra o XSD do projeto")
     ap.add_argument("--schema", help="Caminho alternativo para premis-v3-0.xsd (opcional)")
     ap.add_argument("--example", action="store_true", help="Gerar exemplos (XML/CSV/JSON) em ./examples/ no estilo do projeto")
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     # Geração de exemplos
     if args.example:
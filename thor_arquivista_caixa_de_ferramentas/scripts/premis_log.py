@@ -23,7 +23,7 @@ import argparse, json, uuid
 from pathlib import Path
 from pd_common import append_jsonl, iso_now, add_common_args, load_config
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="Adicionar evento PREMIS (JSONL).")
     ap.add_argument("--arquivo-log", required=True, help="Arquivo JSONL de eventos PREMIS.")
     ap.add_argument("--tipo", required=True, help="eventType (ex: ingestion, fixity check, format identification).")
@@ -32,7 +32,7 @@ def main():
     ap.add_argument("--resultado", default="success", help="outcome (success|failure|warning|...).")
     ap.add_argument("--agente", default="Sistema de Preservação", help="Agente responsável (nome).")
     add_common_args(ap)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
 
     cfg = load_config(args.config)
     evt = {
@@ -21,15 +21,17 @@ replicate_storage.py — Replica um conjunto de arquivos para múltiplos destino
 """
 import argparse, sys
 from pathlib import Path
+from pd_cancel import install as install_cancel
 from pd_common import iter_files, relpath, safe_copy, sha256_file, try_import_tqdm, add_common_args, load_config
 
-def main():
+def main(argv=None):
     ap = argparse.ArgumentParser(description="Replicar dados para destinos múltiplos.")
     ap.add_argument("--fonte", required=True, help="Pasta de origem.")
     ap.add_argument("--destino", required=True, action="append", help="Pasta de destino (pode repetir).")
     ap.add_argument("--verificar-hash", action="store_true", help="Após copiar, recalcular sha256 e comparar.")
     add_common_args(ap)
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
+    install_cancel()  # cancelado no meio: safe_copy descarta o arquivo parcial
 
     cfg = load_config(args.config)
     src = Path(args.fonte).resolve()
@@ -20,18 +20,23 @@ from __future__ import annotations
 
 import argparse
 import hashlib
+import json
 import os
 import re
 import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Optional
+
+from pd_cancel import check as check_cancel, install as install_cancel
+from pd_progress import Progress
+from pd_throttle import limiter
 
 CHUNK = 1024 * 1024  # 1 MiB
 LINE_RE = re.compile(r"^([A-Fa-f0-9]+)\s+(.*\S)\s*$")  # hash + whitespace + path (não vazio)
 
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv=None) -> argparse.Namespace:
     p = argparse.ArgumentParser(
         description="Verifica fixidez a partir de manifesto BagIt ('<hash>  <caminho/relativo>')."
     )
@@ -45,7 +50,10 @@ def parse_args() -> argparse.Namespace:
                    help="Retorna erro se houver arquivos faltando (padrão: também retorna erro, mas essa flag deixa explícito).")
     p.add_argument("--report-extras", action="store_true", default=False,
                    help="Reporta arquivos presentes em disco mas ausentes no manifesto.")
-    return p.parse_args()
+    p.add_argument("--resultado-json", default=None,
+                   help="Grava contagens e listas em JSON e sai com 0 mesmo com divergências "
+                        "(parte de um job dividido; o relatório sai de merge_shards.py).")
+    return p.parse_args(argv)
 
 
 def infer_algo_from_filename(path: Path) -> Optional[str]:
@@ -56,19 +64,110 @@ def infer_algo_from_filename(path: Path) -> Optional[str]:
     return None
 
 
-def hash_file(p: Path, algo: str) -> str:
+def read_manifest(mani: Path) -> list[tuple[str, str]]:
+    """Entradas (digest_hex, relpath_posix) do manifesto; linhas inválidas vão para o stderr."""
+    entries: list[tuple[str, str]] = []
+    with mani.open("r", encoding="utf-8") as f:
+        for ln, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line or line.lstrip().startswith("#"):
+                continue
+            m = LINE_RE.match(line)
+            if not m:
+                print(f"[AVISO] Linha ignorada (não casa com '<hash><espacos><path>'): {ln}", file=sys.stderr)
+                continue
+            digest = m.group(1).lower()
+            rel = m.group(2)
+            # normaliza para POSIX no manifesto
+            rel = rel.replace("\\", "/")
+            entries.append((digest, rel))
+    return entries
+
+
+def find_extras(raiz: Path, entries: list[tuple[str, str]], prog: Optional[Progress] = None) -> int:
+    """Arquivos em disco não listados no manifesto (um [EXTRA] por arquivo no stderr)."""
+    extras_count = 0
+    in_manifest = {Path(rel) for _, rel in entries}
+    for root, dirs, files in os.walk(raiz):
+        root_path = Path(root)
+        if prog is not None:
+            prog.advance(files=len(files))
+        for name in files:
+            p = root_path / name
+            rel = p.relative_to(raiz)
+            rel_posix = rel.as_posix()
+            if Path(rel_posix) not in in_manifest:
+                extras_count += 1
+                print(f"[EXTRA] {rel_posix}", file=sys.stderr)
+    return extras_count
+
+
+def print_report(mani: Path, raiz: Path, algo: str, total: int, ok: int,
+                 missing: list[str], mismatches: list[str], extras_count: Optional[int] = None) -> int:
+    """Resumo no stdout; retorna o código de saída (0 se tudo ok; 1 se houve mismatch/missing)."""
+    print("=== Verificação de fixidez ===")
+    print(f"Manifesto : {mani}")
+    print(f"Raiz      : {raiz}")
+    print(f"Algoritmo : {algo}")
+    print(f"Total     : {total}")
+    print(f"OK        : {ok}")
+    print(f"Faltando  : {len(missing)}")
+    print(f"Divergências: {len(mismatches)}")
+    if extras_count is not None:
+        print(f"Extras    : {extras_count}")
+
+    if missing:
+        print("\n-- Faltando --")
+        for r in missing[:200]:
+            print(r)
+        if len(missing) > 200:
+            print(f"... (+{len(missing)-200} ocultos)")
+
+    if mismatches:
+        print("\n-- Divergências --")
+        for r in mismatches[:200]:
+            print(r)
+        if len(mismatches) > 200:
+            print(f"... (+{len(mismatches)-200} ocultos)")
+
+    return 0 if (not mismatches and not missing) else 1
+
+
+def write_result(path: Path, algo: str, total: int, ok: int, missing: list[str], mismatches: list[str]) -> None:
+    """Resultado de uma parte (--resultado-json), gravado num temporário e trocado no fim."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    tmp.write_text(json.dumps({"algo": algo, "total": total, "ok": ok, "missing": missing,
+                               "mismatches": mismatches}, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+
+
+def hash_file(p: Path, algo: str, on_chunk: Optional[Callable[[int], None]] = None) -> str:
     h = hashlib.new(algo)
+    bucket = limiter()
     with p.open("rb") as f:
         while True:
+            check_cancel()
             chunk = f.read(CHUNK)
             if not chunk:
                 break
+            bucket.consume(len(chunk))
             h.update(chunk)
+            if on_chunk:
+                on_chunk(len(chunk))
     return h.hexdigest()
 
 
-def main() -> int:
-    args = parse_args()
+def _size(p: Path) -> int:
+    try:
+        return p.stat().st_size
+    except OSError:
+        return 0  # faltante: aparece no relatório
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    install_cancel()  # sem saídas a limpar: só interrompe as threads de verificação
     raiz = Path(args.raiz).resolve()
     mani = Path(args.manifesto).resolve()
 
@@ -84,22 +183,11 @@ def main() -> int:
         print(f"[ERRO] Algoritmo não suportado: {algo}", file=sys.stderr)
         return 2
 
-    entries: list[tuple[str, str]] = []  # (digest_hex, relpath_posix)
-    with mani.open("r", encoding="utf-8") as f:
-        for ln, line in enumerate(f, 1):
-            line = line.rstrip("\n")
-            if not line or line.lstrip().startswith("#"):
-                continue
-            m = LINE_RE.match(line)
-            if not m:
-                print(f"[AVISO] Linha ignorada (não casa com '<hash><espacos><path>'): {ln}", file=sys.stderr)
-                continue
-            digest = m.group(1).lower()
-            rel = m.group(2)
-            # normaliza para POSIX no manifesto
-            rel = rel.replace("\\", "/")
-            entries.append((digest, rel))
+    entries = read_manifest(mani)  # (digest_hex, relpath_posix)
 
+    if not entries and args.resultado_json:
+        write_result(Path(args.resultado_json), algo, 0, 0, [], [])  # parte só com linhas inválidas
+        return 0
     if not entries:
         print("[ERRO] Manifesto sem entradas válidas.", file=sys.stderr)
         return 2
@@ -112,13 +200,18 @@ def main() -> int:
     missing: list[str] = []
     ok = 0
 
+    prog = Progress("verify", files_total=total)
+    if prog.enabled:
+        prog.bytes_total = sum(_size(raiz / Path(rel)) for _, rel in entries)
+    on_chunk = (lambda n: prog.advance(nbytes=n)) if prog.enabled else None
+
     def _check_one(item: tuple[str, str]) -> tuple[str, Optional[str]]:
         exp_digest, rel = item
         p = raiz / Path(rel)
         if not p.exists() or not p.is_file():
             return (rel, "MISSING")
         try:
-            d = hash_file(p, algo).lower()
+            d = hash_file(p, algo, on_chunk).lower()
             if d != exp_digest:
                 return (rel, f"MISMATCH expected={exp_digest} got={d}")
             return (rel, None)
@@ -139,51 +232,25 @@ def main() -> int:
             else:
                 mismatches.append(f"{rel} :: {err}")
             done += 1
+            prog.advance(files=1)
             if args.progress and (done % 50 == 0 or done == total):
                 print(f"[INFO] Progresso: {done}/{total}", file=sys.stderr)
 
+    if args.resultado_json:
+        prog.close()
+        write_result(Path(args.resultado_json), algo, total, ok, missing, mismatches)
+        return 0
+
     # Extras (arquivos em disco não listados)
-    extras_count = 0
-    if args.report_extras:
-        in_manifest = {Path(rel) for _, rel in entries}
-        for root, dirs, files in os.walk(raiz):
-            root_path = Path(root)
-            for name in files:
-                p = root_path / name
-                rel = p.relative_to(raiz)
-                rel_posix = rel.as_posix()
-                if Path(rel_posix) not in in_manifest:
-                    extras_count += 1
-                    print(f"[EXTRA] {rel_posix}", file=sys.stderr)
-
-    # Resumo
-    print("=== Verificação de fixidez ===")
-    print(f"Manifesto : {mani}")
-    print(f"Raiz      : {raiz}")
-    print(f"Algoritmo : {algo}")
-    print(f"Total     : {total}")
-    print(f"OK        : {ok}")
-    print(f"Faltando  : {len(missing)}")
-    print(f"Divergências: {len(mismatches)}")
+    extras_count = None
     if args.report_extras:
-        print(f"Extras    : {extras_count}")
+        prog.set_phase("extras")
+        extras_count = find_extras(raiz, entries, prog)
 
-    if missing:
-        print("\n-- Faltando --")
-        for r in missing[:200]:
-            print(r)
-        if len(missing) > 200:
-            print(f"... (+{len(missing)-200} ocultos)")
+    prog.close()
 
-    if mismatches:
-        print("\n-- Divergências --")
-        for r in mismatches[:200]:
-            print(r)
-        if len(mismatches) > 200:
-            print(f"... (+{len(mismatches)-200} ocultos)")
-
-    # Exit code: 0 se tudo ok; 1 se houve mismatch/missing
-    return 0 if (not mismatches and not missing) else 1
+    # Resumo; exit code: 0 se tudo ok; 1 se houve mismatch/missing
+    return print_report(mani, raiz, algo, total, ok, missing, mismatches, extras_count)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# tests/conftest.py
+"""Fixtures comuns: raiz do app no sys.path e um JobStore de cada backend."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+APP_ROOT = Path(__file__).resolve().parent.parent
+if str(APP_ROOT) not in sys.path:
+    sys.path.insert(0, str(APP_ROOT))
+
+from core.jobstore import JobStore  # noqa: E402
+from core.jobstore_sqlite import SqliteJobStore  # noqa: E402
+
+BACKENDS = {
+    "json": lambda d: JobStore(d / "jobs_db.json"),
+    "sqlite": lambda d: SqliteJobStore(d / "jobs_db.sqlite3"),
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    """Nome do backend ("json" ou "sqlite"); os testes que o usam rodam nos dois."""
+    return request.param
+
+
+@pytest.fixture
+def open_store(backend, tmp_path):
+    """Abre (outra instância de) o JobStore do backend na mesma base."""
+    return lambda: BACKENDS[backend](tmp_path)
+
+
+@pytest.fixture
+def store(open_store):
+    return open_store()
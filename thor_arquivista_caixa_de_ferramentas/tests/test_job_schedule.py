@@ -0,0 +1,113 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# tests/test_job_schedule.py
+"""CronExpr.next_after e Schedule.plan (catch_up e janelas)."""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.job_schedule import MAX_CATCH_UP, MISFIRE_GRACE_S, CronExpr, Schedule
+
+# 2025-03-01 foi um sábado
+SAT = datetime(2025, 3, 1, 10, 7, 30)
+
+
+@pytest.mark.parametrize("expr, after, expected", [
+    ("*/15 * * * *", SAT, datetime(2025, 3, 1, 10, 15)),
+    ("*/15 * * * *", datetime(2025, 3, 1, 10, 15), datetime(2025, 3, 1, 10, 30)),  # estritamente depois
+    ("0 2 * * 6", SAT, datetime(2025, 3, 8, 2, 0)),
+    ("0 2 * * sat", datetime(2025, 3, 1, 1, 0), datetime(2025, 3, 1, 2, 0)),
+    ("30 23 31 * *", SAT, datetime(2025, 3, 31, 23, 30)),
+    ("0 0 1 jan *", SAT, datetime(2026, 1, 1, 0, 0)),
+    ("0 0 * * 7", SAT, datetime(2025, 3, 2, 0, 0)),  # 7 = domingo
+    ("5-10/5 8 * * mon-fri", SAT, datetime(2025, 3, 3, 8, 5)),
+    ("@daily", SAT, datetime(2025, 3, 2, 0, 0)),
+    ("0 0 29 2 *", SAT, datetime(2028, 2, 29, 0, 0)),
+])
+def test_cron_next_after(expr, after, expected):
+    assert CronExpr(expr).next_after(after) == expected
+
+
+def test_cron_day_and_weekday_match_either():
+    # dia 13 ou sexta-feira, como no cron
+    cron = CronExpr("0 0 13 * fri")
+    got, t = [], datetime(2025, 3, 1)
+    for _ in range(4):
+        t = cron.next_after(t)
+        got.append(t.date().isoformat())
+    assert got == ["2025-03-07", "2025-03-13", "2025-03-14", "2025-03-21"]
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* 24 * * *", "5-1 * * * *",
+                                  "*/0 * * * *", "0 0 * foo *", "0 0 31 2 *"])
+def test_cron_rejects_invalid(expr):
+    with pytest.raises(ValueError):
+        CronExpr(expr)
+
+
+def _hourly(**kw):
+    return Schedule("VERIFY_FIXITY", {}, interval_s=3600, **kw)
+
+
+def test_plan_on_time_runs_once():
+    due = SAT
+    assert _hourly().plan(due, due + timedelta(seconds=5)) == (1, due + timedelta(hours=1))
+
+
+@pytest.mark.parametrize("catch_up, expected", [("once", 1), ("skip", 0), ("all", 4)])
+def test_plan_catch_up(catch_up, expected):
+    # worker parado por 3,5 h: perdeu 'due' e mais três ocorrências
+    due = SAT
+    now = due + timedelta(hours=3, minutes=30)
+    assert _hourly(catch_up=catch_up).plan(due, now) == (expected, due + timedelta(hours=4))
+
+
+def test_plan_skip_tolerates_small_delay():
+    due = SAT
+    now = due + timedelta(hours=1, seconds=MISFIRE_GRACE_S - 60)
+    assert _hourly(catch_up="skip").plan(due, now) == (1, due + timedelta(hours=2))
+
+
+def test_plan_all_is_capped():
+    due = SAT
+    n, _ = _hourly(catch_up="all").plan(due, due + timedelta(hours=MAX_CATCH_UP * 2))
+    assert n == MAX_CATCH_UP
+
+
+def test_next_due_is_deferred_into_window():
+    sched = Schedule("REPLICATE", {}, cron="0 * * * *", windows=[{"from": "22:00", "to": "06:00"}])
+    assert sched.next_due(SAT) == datetime(2025, 3, 1, 22, 0)
+    assert sched.next_due(datetime(2025, 3, 1, 23, 10)) == datetime(2025, 3, 2, 0, 0)
+    assert sched.next_due(datetime(2025, 3, 2, 5, 30)) == datetime(2025, 3, 2, 22, 0)
+
+
+def test_plan_next_run_respects_weekly_window():
+    # de hora em hora, mas só aos sábados das 22h às 23h: a próxima é no sábado seguinte
+    sched = Schedule("REPLICATE", {}, cron="0 * * * *", windows=[{"from": "22:00", "to": "23:00", "days": [5]}],
+                     catch_up="all")
+    due = datetime(2025, 3, 1, 22, 0)
+    assert sched.plan(due, due + timedelta(minutes=1)) == (1, datetime(2025, 3, 8, 22, 0))
+
+
+@pytest.mark.parametrize("kw", [{}, {"cron": "@hourly", "interval_s": 3600}, {"interval_s": 30},
+                                {"interval_s": 3600, "catch_up": "never"},
+                                {"interval_s": 3600, "windows": [{"from": "25:00", "to": "06:00"}]}])
+def test_schedule_rejects_invalid(kw):
+    with pytest.raises(ValueError):
+        Schedule("REPLICATE", {}, **kw)
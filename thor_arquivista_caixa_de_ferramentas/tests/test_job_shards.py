@@ -0,0 +1,112 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# tests/test_job_shards.py
+"""Divisão em partes (core.job_shards): a junção gera a mesma saída da execução inteira."""
+from __future__ import annotations
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from conftest import APP_ROOT
+from core.config import AppConfig
+from core.job_shards import ShardPolicy, merge_command, plan_shards
+from core.scripts_map import get_scripts_map
+
+SCRIPTS = APP_ROOT / "scripts"
+
+# nomes que testam a ordem do manifesto: '-' < '.' < '/' (a-b.txt, a.d/, a/)
+FILES = {
+    "solto.txt": "raiz",
+    "a-b.txt": "hífen",
+    "a.d/x.txt": "ponto",
+    "a/x.txt": "a",
+    "a/sub/y.bin": "a/sub",
+    "b/z.txt": "b",
+    "c d/espaço.txt": "espaço",
+    "ç/acento.txt": "acento",
+}
+
+
+@pytest.fixture
+def acervo(tmp_path):
+    raiz = tmp_path / "acervo"
+    for rel, text in FILES.items():
+        p = raiz / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(text * 1000, encoding="utf-8")
+    return raiz
+
+
+def _run(script, argv):
+    return subprocess.run([sys.executable, str(SCRIPTS / script), *argv], capture_output=True, text=True)
+
+
+def _run_job(job_type, params):
+    script, build = get_scripts_map()[job_type]
+    return _run(script, build(params, AppConfig()))
+
+
+def _run_sharded(job, max_shards):
+    specs, info = plan_shards(job, ShardPolicy(max_shards=max_shards, min_lines=1))
+    assert len(specs) == max_shards
+    for spec in specs:
+        assert spec["params"]["shard_of"] == job["_id"]
+        assert _run_job(spec["job_type"], spec["params"]).returncode == 0
+    script, argv = merge_command({**job, "shards": info})
+    res = _run(script, argv)
+    assert not Path(info["work"]).exists()  # --limpar
+    return res
+
+
+def _job(job_type, **params):
+    return {"_id": "0123456789abcdef", "job_type": job_type, "params": params}
+
+
+def test_merged_manifest_equals_unsharded(acervo, tmp_path):
+    inteiro, dividido = tmp_path / "inteiro.txt", tmp_path / "dividido.txt"
+    assert _run_job("HASH_MANIFEST", {"raiz": str(acervo), "saida": str(inteiro)}).returncode == 0
+
+    res = _run_sharded(_job("HASH_MANIFEST", raiz=str(acervo), saida=str(dividido)), 3)
+
+    assert res.returncode == 0, res.stderr
+    assert dividido.read_bytes() == inteiro.read_bytes()
+    assert len(inteiro.read_text(encoding="utf-8").splitlines()) == len(FILES)
+
+
+def test_merged_fixity_report_equals_unsharded(acervo, tmp_path):
+    mani = tmp_path / "manifest-sha256.txt"
+    assert _run_job("HASH_MANIFEST", {"raiz": str(acervo), "saida": str(mani)}).returncode == 0
+    (acervo / "a/x.txt").write_text("alterado", encoding="utf-8")
+    (acervo / "b/z.txt").unlink()
+    params = {"raiz": str(acervo), "manifesto": str(mani)}
+
+    inteiro = _run_job("VERIFY_FIXITY", params)
+    dividido = _run_sharded(_job("VERIFY_FIXITY", **params), 3)
+
+    assert inteiro.returncode == dividido.returncode == 1
+    assert dividido.stdout == inteiro.stdout
+    assert "Divergências: 1" in inteiro.stdout and "Faltando  : 1" in inteiro.stdout
+
+
+def test_small_jobs_and_shards_are_not_split(acervo, tmp_path):
+    job = _job("HASH_MANIFEST", raiz=str(acervo), saida=str(tmp_path / "m.txt"))
+    assert plan_shards(job, None) is None
+    assert plan_shards(job, ShardPolicy(max_shards=1)) is None
+    assert plan_shards({**job, "params": {**job["params"], "shard_of": "x"}}, ShardPolicy(max_shards=4)) is None
@@ -0,0 +1,128 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# tests/test_jobstore_claim.py
+"""claim_next, leases e vencimento de leases, nos dois backends."""
+from __future__ import annotations
+
+import multiprocessing
+import time
+
+from conftest import BACKENDS
+
+
+def test_claim_order_and_lease_fields(store):
+    low = store.add_job("HASH_MANIFEST", {"n": 1}, priority=5)
+    first = store.add_job("HASH_MANIFEST", {"n": 2}, priority=0)
+    second = store.add_job("FORMAT_IDENTIFY", {"n": 3}, priority=0)
+
+    got = [store.claim_next("w1", 60)["_id"] for _ in range(3)]
+
+    assert got == [first, second, low]
+    assert store.claim_next("w1", 60) is None
+    job = store.get_job(first)
+    assert job["status"] == "running"
+    assert job["worker_id"] == "w1"
+    assert job["attempts"] == 1
+    assert job["lease_expires_at"] > job["heartbeat_at"]
+    assert store.counts_by_status()["running"] == 3
+
+
+def test_claim_exclude_types_and_accept(store):
+    a = store.add_job("HASH_MANIFEST", {"disco": "a"})
+    b = store.add_job("HASH_MANIFEST", {"disco": "b"})
+    c = store.add_job("REPLICATE", {"disco": "c"})
+
+    assert store.claim_next("w1", 60, exclude_types=["HASH_MANIFEST"])["_id"] == c
+    job = store.claim_next("w1", 60, accept=lambda j: j["params"]["disco"] == "b")
+    assert job["_id"] == b
+    assert store.claim_next("w1", 60, accept=lambda j: False) is None
+    assert store.get_job(a)["status"] == "pending"
+
+
+def test_claim_skips_jobs_waiting_for_retry(store):
+    jid = store.add_job("HASH_MANIFEST", {})
+    store.claim_next("w1", 60)
+    assert store.retry_later(jid, 0.3, error_msg="falha transitória", worker_id="w1")
+
+    assert store.get_job(jid)["status"] == "pending"
+    assert store.claim_next("w1", 60) is None
+    time.sleep(0.4)
+    assert store.claim_next("w1", 60)["_id"] == jid
+
+
+def test_expired_lease_is_requeued_and_old_owner_loses_job(store):
+    jid = store.add_job("HASH_MANIFEST", {})
+    store.claim_next("w1", 0.2)
+    assert store.requeue_expired_leases() == 0
+    time.sleep(0.3)
+
+    assert store.requeue_expired_leases() == 1
+    assert store.get_job(jid)["status"] == "pending"
+    assert not store.renew_lease(jid, "w1", 60)
+    assert store.claim_next("w2", 60)["_id"] == jid
+    assert not store.set_status(jid, "done", worker_id="w1")
+    assert store.set_status(jid, "done", worker_id="w2")
+    assert store.get_job(jid)["attempts"] == 2
+
+
+def test_renew_lease_keeps_job(store, open_store):
+    jid = store.add_job("HASH_MANIFEST", {})
+    store.claim_next("w1", 0.2)
+    assert store.renew_lease(jid, "w1", 60)
+    time.sleep(0.3)
+
+    other = open_store()  # outro processo/instância enxerga o heartbeat
+    assert other.requeue_expired_leases() == 0
+    assert other.get_job(jid)["status"] == "running"
+    assert not store.renew_lease(jid, "w2", 60)
+
+
+def test_expired_lease_gives_up_after_max_attempts(store):
+    jid = store.add_job("HASH_MANIFEST", {})
+    store.claim_next("w1", 0.1)
+    time.sleep(0.2)
+
+    assert store.requeue_expired_leases(max_attempts=1) == 1
+    job = store.get_job(jid)
+    assert job["status"] == "error"
+    assert "lease expirado" in job["error_msg"]
+
+
+def _claim_all(backend, path, worker_id, out):
+    store = BACKENDS[backend](path)
+    got = []
+    while True:
+        job = store.claim_next(worker_id, 60)
+        if job is None:
+            break
+        got.append(job["_id"])
+    out.put(got)
+
+
+def test_concurrent_processes_never_claim_the_same_job(backend, store, tmp_path):
+    ids = store.add_jobs([{"job_type": "HASH_MANIFEST", "params": {"n": i}} for i in range(60)])
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_claim_all, args=(backend, tmp_path, f"w{i}", out)) for i in range(3)]
+    for p in procs:
+        p.start()
+    claimed = [jid for _ in procs for jid in out.get(timeout=60)]
+    for p in procs:
+        p.join()
+
+    assert sorted(claimed) == sorted(ids)
+    assert store.counts_by_status()["running"] == len(ids)
@@ -0,0 +1,95 @@
+# Thor Arquivista – Caixa de Ferramentas de Preservação Digital
+# Copyright (C) 2025  Carlos Eduardo Carvalho Amand
+#
+# Este programa é software livre: você pode redistribuí-lo e/ou modificá-lo
+# sob os termos da Licença Pública Geral GNU (GNU GPL), conforme publicada
+# pela Free Software Foundation, na versão 3 da Licença, ou (a seu critério)
+# qualquer versão posterior.
+#
+# Este programa é distribuído na esperança de que seja útil,
+# mas SEM QUALQUER GARANTIA; sem mesmo a garantia implícita de
+# COMERCIALIZAÇÃO ou ADEQUAÇÃO A UM PROPÓSITO PARTICULAR.
+# Veja a Licença Pública Geral GNU para mais detalhes.
+#
+# Você deve ter recebido uma cópia da GNU GPL junto com este programa.
+# Caso contrário, veja <https://www.gnu.org/licenses/>.
+
+# tests/test_jobstore_deps.py
+"""depends_on: _deps_state e a propagação de status entre dependências, nos dois backends."""
+from __future__ import annotations
+
+import pytest
+
+from core.jobstore import _deps_state
+
+
+@pytest.mark.parametrize("statuses, expected", [
+    ({}, ("pending", None)),
+    ({"a": "done", "b": "done"}, ("pending", None)),
+    ({"a": "done", "b": None}, ("pending", None)),  # dependência arquivada/removida
+    ({"a": "done", "b": "running"}, ("waiting", None)),
+    ({"a": "pending", "b": "waiting"}, ("waiting", None)),
+    ({"a": "running", "b": "error"}, ("canceled", "b")),
+    ({"a": "timeout", "b": "canceled"}, ("canceled", "a")),
+])
+def test_deps_state(statuses, expected):
+    assert _deps_state(list(statuses), statuses.get) == expected
+
+
+def _graph(store):
+    return store.add_jobs([
+        {"job_type": "HASH_MANIFEST", "params": {}, "ref": "a"},
+        {"job_type": "VERIFY_FIXITY", "params": {}, "ref": "b", "depends_on": ["a"]},
+        {"job_type": "REPLICATE", "params": {}, "depends_on": ["b", 0]},
+    ])
+
+
+def _status(store, *ids):
+    return [store.get_job(j)["status"] for j in ids]
+
+
+def test_dependents_wait_and_are_released_in_order(store):
+    a, b, c = _graph(store)
+    assert _status(store, a, b, c) == ["pending", "waiting", "waiting"]
+    assert store.get_job(c)["depends_on"] == [b, a]
+
+    assert store.claim_next("w1", 60)["_id"] == a
+    assert store.claim_next("w1", 60) is None
+    store.set_status(a, "done", worker_id="w1")
+    assert _status(store, b, c) == ["pending", "waiting"]
+
+    assert store.claim_next("w1", 60)["_id"] == b
+    store.set_status(b, "done", worker_id="w1")
+    assert store.claim_next("w1", 60)["_id"] == c
+
+
+def test_failure_cancels_dependents_in_cascade_and_requeue_reactivates(store):
+    a, b, c = _graph(store)
+    store.claim_next("w1", 60)
+    store.set_status(a, "error", error_msg="falhou", worker_id="w1")
+
+    assert _status(store, b, c) == ["canceled", "canceled"]
+    assert store.get_job(b)["blocked_by"] == a
+    assert store.get_job(c)["blocked_by"] in (a, b)
+    assert store.requeue_from_status("canceled") == 0  # a dependência continua em erro
+
+    assert store.requeue_from_status("error") == 1
+    assert _status(store, a, b, c) == ["pending", "waiting", "waiting"]
+    assert not store.get_job(b).get("blocked_by")
+
+
+def test_new_job_on_finished_dependencies(store):
+    done, failed = store.add_job("HASH_MANIFEST", {}), store.add_job("HASH_MANIFEST", {})
+    store.set_status(done, "done")
+    store.set_status(failed, "timeout")
+
+    assert store.get_job(store.add_job("REPLICATE", {}, depends_on=[done]))["status"] == "pending"
+    blocked = store.get_job(store.add_job("REPLICATE", {}, depends_on=[done, failed]))
+    assert blocked["status"] == "canceled"
+    assert blocked["blocked_by"] == failed
+
+
+def test_unknown_dependency_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.add_job("REPLICATE", {}, depends_on=["nao-existe"])
+    assert store.counts_by_status()["pending"] == 0
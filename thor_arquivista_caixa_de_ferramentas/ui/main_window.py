@@ -42,7 +42,7 @@ from ttkbootstrap.constants import *
 from tkinter import BOTH, X, YES
 
 from core.config import AppConfig, DEFAULTS
-from core.jobstore import JobStore
+from core.jobstore import open_jobstore
 from core.worker import Worker
 
 # painéis (cada um com create_panel(app, enqueue_cb))
@@ -74,9 +74,20 @@ class MainApp(tb.Window):
         self.geometry("1200x800")
 
         # Worker e jobstore
-        self.jobstore = JobStore(path=getattr(cfg, "jobstore_path", "./jobs_db.json"))
+        self.jobstore = open_jobstore(cfg)
         self.worker = Worker(cfg=self.cfg, jobstore=self.jobstore)
         self.worker.start()
+        self.api = None
+        start_msg = "Pronto."
+        if cfg.api_listen:
+            from core.job_api import JobApi
+            try:
+                self.api = JobApi(cfg, self.jobstore, self.worker)
+                self.api.start()
+                start_msg = f"Pronto. API da fila em {self.api.url}"
+            except (OSError, ValueError) as e:
+                self.api = None
+                start_msg = f"API HTTP não iniciada: {e}"
 
         # Style para gerenciar temas
         self._style = tb.Style()
@@ -201,7 +212,7 @@ class MainApp(tb.Window):
         # =====================
         # Rodapé (status)
         # =====================
-        self._status = ttk.Label(self, text="Pronto.", anchor="w")
+        self._status = ttk.Label(self, text=start_msg, anchor="w")
         self._status.pack(fill=X, padx=10, pady=(0, 10))
 
     # =====================
@@ -209,19 +220,35 @@ class MainApp(tb.Window):
     # =====================
     def destroy(self):
         try:
+            if self.api is not None:
+                self.api.stop()
             if self.worker and self.worker.is_alive():
                 self.worker.stop()
                 self.worker.join(timeout=2.0)
         finally:
             super().destroy()
 
-    def _enqueue(self, job_type: str, params: Dict[str, Any]):
+    def _enqueue(self, job_type: str, params: Dict[str, Any], *, depends_on=()):
         try:
-            jid = self.jobstore.add_job(job_type, params)
+            jid = self.jobstore.add_job(job_type, params, depends_on=depends_on)
             self.jobstore.add_log(jid, f"Enfileirado {job_type}")
             self._status.configure(text=f"Job enfileirado: {job_type} (id {jid})")
+            return jid
         except Exception as e:
             self._status.configure(text=f"Falha ao enfileirar: {e}")
+            return None
+
+    def _enqueue_jobs(self, specs, descricao: str = "fluxo"):
+        """Enfileira um grafo de jobs (ver core.workflows) numa única gravação."""
+        try:
+            ids = self.jobstore.add_jobs(specs)
+            self.jobstore.add_logs([(jid, f"Enfileirado {s['job_type']} ({descricao}, etapa {s.get('ref') or i + 1})")
+                                    for i, (jid, s) in enumerate(zip(ids, specs))])
+            self._status.configure(text=f"{descricao}: {len(ids)} job(s) enfileirado(s)")
+            return ids
+        except Exception as e:
+            self._status.configure(text=f"Falha ao enfileirar {descricao}: {e}")
+            return []
 
 
 def run_app(cfg: Optional[AppConfig] = None):
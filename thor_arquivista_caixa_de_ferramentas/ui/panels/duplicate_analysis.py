@@ -23,12 +23,15 @@ from tkinter import filedialog, messagebox
 import ttkbootstrap as tb
 from ttkbootstrap.constants import *
 
+from core.workflows import duplicate_workflow
+
 # -----------------------------------------------------------------------------
 # Painel: Análise de Duplicatas
 # Funcionalidades (cada uma com sua seção e botão):
 #   1) Inventariar (SHA-256)
 #   2) Detectar duplicatas
 #   3) Gerar modelo de decisão
+#   4) Fluxo completo: 1 -> 2 -> 3 como grafo de jobs (core/workflows.py)
 #
 # Integra com job_type "DUPLICATE_FINDER" (core/scripts_map.py).
 # Padrão do projeto: create_panel(parent, enqueue_cb, close_cb=None)
@@ -102,6 +105,24 @@ def create_panel(parent, enqueue_cb, close_cb=None):
     grp_mod.grid_columnconfigure(1, weight=1)
     grp_mod.grid_columnconfigure(4, weight=1)
 
+    # -------------- Seção 4: Fluxo completo (1 -> 2 -> 3) --
+    grp_flx = ttk.LabelFrame(page, text="Fluxo completo")
+    grp_flx.pack(fill="x", padx=2, pady=(6, 8))
+
+    tb.Label(
+        grp_flx,
+        text="Enfileira as três etapas de uma vez, usando os caminhos acima; cada etapa "
+             "começa quando a anterior conclui (se uma falhar, as seguintes são canceladas).",
+        wraplength=700, justify="left",
+    ).grid(row=0, column=0, sticky="w", padx=6, pady=(4, 2))
+    tb.Button(
+        grp_flx,
+        text="Executar fluxo completo",
+        bootstyle=SUCCESS,
+        command=lambda: _exec_fluxo(page, parent, raiz_inv, inventario_inv, duplicatas_dup, decisoes_mod,
+                                    mostrar_progresso),
+    ).grid(row=1, column=0, sticky="w", padx=6, pady=(8, 8))
+
     # ----------------- Rodapé -----------------
     fr_btns = tb.Frame(page)
     fr_btns.pack(fill="x", pady=8)
@@ -175,6 +196,22 @@ def _exec_modelo(page, enqueue_cb, duplicatas_var, decisoes_var):
     messagebox.showinfo("Execução iniciada", "Modelo de decisões enviado para a fila de execução.", parent=page.winfo_toplevel())
 
 
+def _exec_fluxo(page, app, raiz_var, inventario_var, duplicatas_var, decisoes_var, progresso_var):
+    raiz = (raiz_var.get() or "").strip()
+    inv = (inventario_var.get() or "").strip()
+    dup = (duplicatas_var.get() or "").strip()
+    dec = (decisoes_var.get() or "").strip()
+    if not raiz or not inv or not dup or not dec:
+        messagebox.showwarning("Campos obrigatórios",
+                               "Informe Pasta raiz e Inventário CSV (seção 1), Duplicatas CSV (seção 2) "
+                               "e Decisões CSV (seção 3).", parent=page.winfo_toplevel())
+        return
+    specs = duplicate_workflow(raiz, inv, dup, dec, mostrar_progresso=bool(progresso_var.get()))
+    if app._enqueue_jobs(specs, "Análise de duplicatas"):
+        messagebox.showinfo("Execução iniciada", "Fluxo de análise de duplicatas enviado para a fila de execução.",
+                            parent=page.winfo_toplevel())
+
+
 # -------------------------
 # Helpers de layout
 # -------------------------
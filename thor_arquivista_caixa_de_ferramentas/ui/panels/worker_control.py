@@ -19,12 +19,20 @@ from __future__ import annotations
 
 from pathlib import Path
 import json
+import time
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import BOTH, X, YES, StringVar, END, Toplevel, Text
+from tkinter import BOTH, X, YES, StringVar, END, Toplevel, Text, filedialog, messagebox
+
+from core.job_import import enqueue_from_file
+from core.scripts_map import get_scripts_map
 
 REFRESH_MS = 1000  # 1 segundo
 ROW_HEIGHT = 12
+PAGE_SIZE = 200    # jobs por página na tabela
+OUTPUT_PAGE = 2000 # linhas da saída completa carregadas por vez
+LOG_FOLLOW_MS = 1500  # atualização do modal de logs enquanto o job roda
+PROGRESS_REFRESH_S = 2.0  # releitura da página enquanto há jobs em execução (progresso)
 
 def create_panel(app, enqueue_cb):
     """
@@ -32,7 +40,7 @@ def create_panel(app, enqueue_cb):
       - Estado do worker (Executando / Pausado / Parado)
       - Iniciar, Parar, Pausar, Retomar, Reiniciar
       - Contagem por status
-      - Lista de jobs (filtro por status)
+      - Lista de jobs paginada (filtro por status e por tipo)
       - Ações de fila: Reenfileirar erros, Reenfileirar todos, Limpar pendentes, Cancelar selecionado
       - Ver logs do job selecionado (modal)
     """
@@ -69,10 +77,12 @@ def create_panel(app, enqueue_cb):
     counts_frame.pack(fill=X)
     counts_vars = {
         "pending": StringVar(value="0"),
+        "waiting": StringVar(value="0"),
         "running": StringVar(value="0"),
         "done": StringVar(value="0"),
         "error": StringVar(value="0"),
         "canceled": StringVar(value="0"),
+        "timeout": StringVar(value="0"),
     }
 
     # Adiciona os contadores lado a lado
@@ -91,7 +101,10 @@ def create_panel(app, enqueue_cb):
     ttk.Label(actions, text="Filtrar:").pack(side=LEFT, padx=(2, 6))
     filt = StringVar(value="pending")
     ttk.Combobox(actions, textvariable=filt, state="readonly",
-                 values=["pending", "error", "done", "canceled", "running", "todos"], width=12).pack(side=LEFT)
+                 values=["pending", "waiting", "error", "done", "canceled", "timeout", "running", "todos"], width=12).pack(side=LEFT)
+    tipo = StringVar(value="todos")
+    ttk.Combobox(actions, textvariable=tipo, state="readonly",
+                 values=["todos"] + sorted(get_scripts_map()), width=18).pack(side=LEFT, padx=(6, 0))
 
     ttk.Button(actions, text="Atualizar", bootstyle=SECONDARY,
                command=lambda: _refresh_jobs(app, jobs_tree, filt.get())).pack(side=LEFT, padx=6)
@@ -110,33 +123,51 @@ def create_panel(app, enqueue_cb):
                command=lambda: _do_cancel_selected(app, jobs_tree, filt)).pack(side=LEFT, padx=6)
     ttk.Button(actions, text="Ver logs", bootstyle=INFO,
                command=lambda: _show_logs_modal(app, jobs_tree)).pack(side=LEFT, padx=6)
+    ttk.Button(actions, text="Importar jobs", bootstyle=PRIMARY,
+               command=lambda: _do_import_jobs(app, jobs_tree, filt)).pack(side=LEFT, padx=6)
 
     # Tabela de jobs
-    cols = ("id", "tipo", "status", "criado", "params")
+    cols = ("id", "tipo", "status", "progresso", "criado", "params")
     jobs_tree = ttk.Treeview(page, columns=cols, show="headings", height=ROW_HEIGHT, bootstyle=INFO)
     for c, t, w in (
         ("id", "ID", 180),
         ("tipo", "Tipo", 150),
         ("status", "Status", 100),
+        ("progresso", "Progresso", 260),
         ("criado", "Criado em", 160),
-        ("params", "Parâmetros", 600),
+        ("params", "Parâmetros", 480),
     ):
         jobs_tree.heading(c, text=t)
         jobs_tree.column(c, width=w, anchor="w")
     jobs_tree.pack(fill=BOTH, expand=YES, pady=(8, 0))
 
+    # Paginação (cursor = id da última linha da página anterior)
+    pager = ttk.Frame(page); pager.pack(fill=X, pady=(4, 0))
+    prev_btn = ttk.Button(pager, text="< Anterior", bootstyle=SECONDARY,
+                          command=lambda: _refresh_jobs(app, jobs_tree, filt.get(), move=-1))
+    next_btn = ttk.Button(pager, text="Próxima >", bootstyle=SECONDARY,
+                          command=lambda: _refresh_jobs(app, jobs_tree, filt.get(), move=+1))
+    page_lbl = ttk.Label(pager, text="", bootstyle=SECONDARY)
+    prev_btn.pack(side=LEFT, padx=4); next_btn.pack(side=LEFT, padx=4); page_lbl.pack(side=LEFT, padx=8)
+    jobs_tree.page_state = {"cursors": [None], "tipo": tipo, "prev": prev_btn, "next": next_btn, "label": page_lbl}
+    tipo.trace_add("write", lambda *_: _refresh_jobs(app, jobs_tree, filt.get()))
+
     # Mensagens
     msg = ttk.Label(page, text="", bootstyle=INFO)
     msg.pack(fill=X, pady=(6, 0))
 
-    # Atualização periódica de estado/contagens
+    # Atualização periódica de estado; contagens e tabela só quando a base mudou
+    # (ou, com jobs em execução, a cada PROGRESS_REFRESH_S para o progresso)
+    seen = {"version": None, "running": 0, "at": 0.0}
+
     def _tick():
         if not page.winfo_exists():
             return
         alive = app.worker.is_alive() if app.worker else False
         paused = app.worker.is_paused() if app.worker else False
         if alive and not paused:
-            state_lbl.configure(text="Em execução", bootstyle=SUCCESS)
+            state_lbl.configure(text=f"Em execução ({app.worker.active_count()}/{app.worker.concurrency} vagas ocupadas)",
+                                bootstyle=SUCCESS)
             start_btn.configure(state=DISABLED); stop_btn.configure(state=NORMAL)
             pause_btn.configure(state=NORMAL);   resume_btn.configure(state=DISABLED)
         elif alive and paused:
@@ -148,10 +179,19 @@ def create_panel(app, enqueue_cb):
             start_btn.configure(state=NORMAL);   stop_btn.configure(state=DISABLED)
             pause_btn.configure(state=DISABLED); resume_btn.configure(state=DISABLED)
 
-        # contagens
-        counts = app.worker.counts_by_status()
-        for k, var in counts_vars.items():
-            var.set(str(counts.get(k, 0)))
+        # contagens e página atual, apenas se a versão da base avançou
+        version = app.worker.jobstore.version()
+        now = time.monotonic()
+        if version != seen["version"]:
+            counts = app.worker.counts_by_status()
+            for k, var in counts_vars.items():
+                var.set(str(counts.get(k, 0)))
+            if seen["version"] is not None:
+                _refresh_jobs(app, jobs_tree, filt.get(), keep_page=True)
+            seen.update(version=version, running=counts.get("running", 0), at=now)
+        elif seen["running"] and now - seen["at"] >= PROGRESS_REFRESH_S:
+            _refresh_jobs(app, jobs_tree, filt.get(), keep_page=True)
+            seen["at"] = now
 
         page.after(REFRESH_MS, _tick)
 
@@ -187,17 +227,105 @@ def _add_count_cell(parent, row, col, name, var):
     parent.grid_columnconfigure(col, weight=1)
 
 
-def _refresh_jobs(app, tree, status_filter):
-    tree.delete(*tree.get_children())
+def _refresh_jobs(app, tree, status_filter, move: int = 0, keep_page: bool = False):
+    """
+    Carrega uma página da tabela. move=0 volta à primeira página
+    (mudança de filtro/ações de fila); +1/-1 avança/retrocede;
+    keep_page=True recarrega a página atual (base alterada).
+    """
+    state = tree.page_state
+    cursors = state["cursors"]  # cursors[i] = after_id da página i
+    selected = tree.selection()
+    if keep_page:
+        move = None
+    elif move == 0:
+        del cursors[1:]
+    elif move < 0 and len(cursors) > 1:
+        cursors.pop()
     status = None if status_filter == "todos" else status_filter
-    jobs = app.worker.list_jobs(status=status)
+    jtype = state["tipo"].get()
+    kwargs = dict(status=status, job_type=None if jtype == "todos" else jtype, limit=PAGE_SIZE + 1)
+
+    if move is not None and move > 0:
+        last = tree.get_children()
+        if not last or state["next"].instate(["disabled"]):
+            return
+        cursors.append(last[-1])
+    jobs = app.worker.list_jobs(after_id=cursors[-1], **kwargs)
+    if not jobs and len(cursors) > 1:  # cursor removido (job limpo/arquivado) -> recomeça
+        del cursors[1:]
+        jobs = app.worker.list_jobs(**kwargs)
+
+    has_more = len(jobs) > PAGE_SIZE
+    jobs = jobs[:PAGE_SIZE]
+    state["prev"].configure(state=NORMAL if len(cursors) > 1 else DISABLED)
+    state["next"].configure(state=NORMAL if has_more else DISABLED)
+    state["label"].configure(text=f"Página {len(cursors)}")
+
+    tree.delete(*tree.get_children())
     for j in jobs:
         jid = j.get("_id", "")
         jtype = j.get("job_type", "")
         st = j.get("status", "")
         created = j.get("created_at", "")
         params = j.get("params", {})
-        tree.insert("", "end", iid=jid, values=(jid, jtype, st, created, _pretty_params(params)))
+        tree.insert("", "end", iid=jid,
+                    values=(jid, jtype, st, _pretty_progress(j.get("progress")) or _pretty_deps(j) or _pretty_retry(j)
+                            or _pretty_resources(j.get("resources")), created,
+                            _pretty_params(params)))
+    keep = [iid for iid in selected if tree.exists(iid)]
+    if keep:
+        tree.selection_set(keep)
+
+def _pretty_progress(p) -> str:
+    """Ex.: 'hash 42.0% · 85.3 MB/s · ETA 3m10s' (vazio sem progresso)."""
+    if not p:
+        return ""
+    parts = [p.get("phase") or ""]
+    if p.get("percent") is not None:
+        parts[0] = f"{parts[0]} {p['percent']:.1f}%".strip()
+    elif p.get("files_done") is not None:
+        parts[0] = f"{parts[0]} {p['files_done']} arq.".strip()
+    if p.get("bytes_per_s"):
+        parts.append(f"{p['bytes_per_s'] / 1e6:.1f} MB/s")
+    elif p.get("files_per_s"):
+        parts.append(f"{p['files_per_s']:.1f} arq/s")
+    if p.get("eta_s") is not None:
+        eta = int(p["eta_s"])
+        h, rem = divmod(eta, 3600)
+        parts.append("ETA " + (f"{h}h{rem // 60:02d}m" if h else f"{rem // 60}m{rem % 60:02d}s"))
+    return " · ".join(x for x in parts if x)
+
+def _pretty_resources(r) -> str:
+    """Uso de recursos de um job terminado (core.job_resources), ex.: '812 s · CPU 17% · 64.8 MB/s'."""
+    if not r:
+        return ""
+    parts = [f"{r['wall_s']:.0f} s" if r.get("wall_s", 0) >= 10 else f"{r.get('wall_s', 0):.1f} s"]
+    if r.get("cpu_pct") is not None:
+        parts.append(f"CPU {r['cpu_pct']:.0f}%")
+    if r.get("read_mb_s"):
+        parts.append(f"{r['read_mb_s']:.1f} MB/s")
+    return " · ".join(parts)
+
+def _pretty_deps(job: dict) -> str:
+    """Dependências (depends_on, ou partes de um job dividido) de jobs à espera ou cancelados por causa delas."""
+    shards = (job.get("shards") or {}).get("ids") or []
+    if job.get("status") == "waiting":
+        if shards:
+            return f"aguarda {len(shards)} parte(s)"
+        n = len(job.get("depends_on") or [])
+        return f"aguarda {n} dependência(s)"
+    if job.get("blocked_by"):
+        what = "parte" if job["blocked_by"] in shards else "dependência"
+        return f"{what} {str(job['blocked_by'])[:8]} falhou"
+    return ""
+
+def _pretty_retry(job: dict) -> str:
+    """Nova tentativa agendada (run_after, ver core.job_retry): 'tentativa 3 às 14:05:12 UTC'."""
+    if job.get("status") != "pending" or not job.get("run_after"):
+        return ""
+    hora = str(job["run_after"])[11:19]
+    return f"tentativa {int(job.get('attempts') or 0) + 1} às {hora} UTC"
 
 def _pretty_params(params: dict) -> str:
     try:
@@ -286,15 +414,38 @@ def _do_clear_error(app, tree, filt_var):
     _refresh_jobs(app, tree, filt_var.get())
 
 
+def _do_import_jobs(app, tree, filt_var):
+    path = filedialog.askopenfilename(
+        title="Importar jobs",
+        filetypes=[("CSV ou JSONL", "*.csv *.jsonl"), ("Todos", "*.*")],
+    )
+    if not path:
+        return
+    try:
+        ids = enqueue_from_file(app.jobstore, path, app.cfg)
+        app._status.configure(text=f"Importados {len(ids)} job(s) de {Path(path).name}.")
+    except Exception as e:
+        app._status.configure(text=f"Falha ao importar jobs: {e}")
+    _refresh_jobs(app, tree, filt_var.get())
+
+
 def _do_cancel_selected(app, tree, filt_var):
     sel = tree.selection()
     if not sel:
         app._status.configure(text="Nenhum job selecionado para cancelar.")
         return
     jid = sel[0]
-    ok = app.worker.cancel_job(jid)
-    app._status.configure(text=f"Job {jid} {'cancelado' if ok else 'não pôde ser cancelado'}.")
-    _refresh_jobs(app, tree, filt_var.get())
+    if tree.set(jid, "status") == "running":
+        if not messagebox.askyesno("Cancelar job em execução",
+                                   f"Encerrar o job {jid}? O script é interrompido e a saída parcial descartada.",
+                                   parent=tree.winfo_toplevel()):
+            return
+        ok = app.worker.cancel_running(jid)
+        app._status.configure(text=f"Job {jid}: {'cancelamento pedido' if ok else 'não está mais em execução'}.")
+    else:
+        ok = app.worker.cancel_job(jid)
+        app._status.configure(text=f"Job {jid} {'cancelado' if ok else 'não pôde ser cancelado'}.")
+    _refresh_jobs(app, tree, filt_var.get(), keep_page=True)
 
 def _show_logs_modal(app, tree):
     sel = tree.selection()
@@ -317,6 +468,8 @@ def _show_logs_modal(app, tree):
                command=lambda: _populate_logs_text(txt, app, jid)).pack(side=RIGHT, padx=4)
     ttk.Button(top, text="Copiar", bootstyle=INFO,
                command=lambda: _copy_logs_to_clipboard(app, txt)).pack(side=RIGHT, padx=4)
+    ttk.Button(top, text="Saída completa", bootstyle=PRIMARY,
+               command=lambda: _show_output_modal(app, jid)).pack(side=RIGHT, padx=4)
     ttk.Button(top, text="Fechar", bootstyle=DANGER,
                command=win.destroy).pack(side=RIGHT, padx=4)
 
@@ -325,6 +478,18 @@ def _show_logs_modal(app, tree):
 
     _populate_logs_text(txt, app, jid)
 
+    # acompanha a saída ao vivo enquanto o job roda neste worker (o log chega em lotes)
+    def _follow():
+        if not win.winfo_exists():
+            return
+        running = jid in app.worker.active_jobs()
+        _populate_logs_text(txt, app, jid)
+        if running:
+            win.after(LOG_FOLLOW_MS, _follow)
+
+    if jid in app.worker.active_jobs():
+        win.after(LOG_FOLLOW_MS, _follow)
+
 def _populate_logs_text(txt: Text, app, job_id: str):
     txt.configure(state="normal")
     txt.delete("1.0", END)
@@ -340,6 +505,43 @@ def _populate_logs_text(txt: Text, app, job_id: str):
     txt.see(END)
     txt.configure(state="disabled")
 
+def _show_output_modal(app, job_id: str):
+    """Saída completa (stdout/stderr) do job, lida do .gz em páginas de OUTPUT_PAGE linhas."""
+    output = app.worker.jobstore.output
+    if not output.exists(job_id):
+        app._status.configure(text="Este job não tem saída completa gravada.")
+        return
+
+    win = Toplevel(app)
+    win.title(f"Saída do Job {job_id}")
+    win.geometry("1000x600")
+    win.transient(app)
+
+    top = ttk.Frame(win, padding=6); top.pack(fill=X)
+    info = ttk.Label(top, text="", bootstyle=SECONDARY)
+    info.pack(side=LEFT)
+    ttk.Button(top, text="Fechar", bootstyle=DANGER, command=win.destroy).pack(side=RIGHT, padx=4)
+    more_btn = ttk.Button(top, text="Carregar mais", bootstyle=SECONDARY)
+    more_btn.pack(side=RIGHT, padx=4)
+
+    txt = Text(win, wrap="none")
+    txt.pack(fill=BOTH, expand=YES, padx=6, pady=6)
+    loaded = {"n": 0}
+
+    def _load_more():
+        lines = output.read(job_id, offset=loaded["n"], limit=OUTPUT_PAGE)
+        txt.configure(state="normal")
+        if lines:
+            txt.insert(END, "\n".join(lines) + "\n")
+        txt.configure(state="disabled")
+        loaded["n"] += len(lines)
+        info.configure(text=f"{loaded['n']} linha(s) carregada(s)")
+        if len(lines) < OUTPUT_PAGE:
+            more_btn.configure(state=DISABLED)
+
+    more_btn.configure(command=_load_more)
+    _load_more()
+
 def _copy_logs_to_clipboard(app, txt: Text):
     content = txt.get("1.0", END)
     app.clipboard_clear()